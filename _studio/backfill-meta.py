@@ -0,0 +1,26 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import photo_meta
+
+def main():
+    parser = argparse.ArgumentParser(description="MAERS 图片元数据回填 (EXIF / XMP 写入 gallery.db)")
+    parser.add_argument('--workers', type=int, default=None, help="并行进程数 (默认 CPU 核心数)")
+    parser.add_argument('--force', action='store_true', help="重新提取全部图片 (默认只处理尚未提取的)")
+    args = parser.parse_args()
+
+    print("========================================")
+    print("        MAERS 图片元数据回填")
+    print("========================================")
+    summary = photo_meta.backfill(workers=args.workers, force=args.force)
+    print(f"[+] 已提取 {summary['extracted']} 张")
+    if summary['missing']:
+        print(f"[!] 原图缺失 {summary['missing']} 张 (保持未提取，下次重试)")
+    if summary['error']:
+        print(f"[!] 提取失败 {summary['error']} 张 (详见日志)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""
+MAERS Benchmark Dataset
+按固定种子生成合成数据集 (目录结构与项目根目录一致)：
+- data/cms.db (5 个模块的多层树，笔记带 MD 文件)、data/gallery.db
+- data/space-tree.json、data/music-data.json、data/tags/cms-*-tag-categories.json
+同一组 (种子, 规模) 生成的内容完全一致，便于跨提交比较。
+
+用法: python benchmarks/dataset.py <输出目录> [--nodes 10000] [--photos 50000] [--seed 42]
+"""
+import os
+import sys
+import json
+import random
+import sqlite3
+import argparse
+import time
+
+CMS_SCHEMA = '''
+    CREATE TABLE nodes (
+        id TEXT PRIMARY KEY,
+        module TEXT NOT NULL,
+        parent_id TEXT,
+        type TEXT NOT NULL,
+        title TEXT,
+        content TEXT,
+        tags TEXT,
+        created_at REAL,
+        sort_order INTEGER DEFAULT 0,
+        coverImage TEXT
+    );
+    CREATE INDEX idx_module_parent ON nodes(module, parent_id);
+'''
+
+GALLERY_SCHEMA = '''
+    CREATE TABLE photos (
+        id TEXT PRIMARY KEY,
+        category TEXT NOT NULL,
+        name TEXT NOT NULL,
+        path TEXT NOT NULL,
+        thumb TEXT,
+        preview TEXT,
+        hash TEXT,
+        created_at REAL,
+        sort_order INTEGER DEFAULT 0,
+        tags TEXT
+    );
+    CREATE INDEX idx_category ON photos(category);
+    CREATE INDEX idx_hash ON photos(hash);
+'''
+
+# 各模块节点占比 / 带封面的模块
+MODULE_SHARES = {'notes': 0.5, 'literature': 0.15, 'record': 0.15, 'games': 0.1, 'videos': 0.1}
+COVER_MODULES = {'literature': 'literaturecovers', 'games': 'gamecovers', 'videos': 'videocovers'}
+PHOTO_CATEGORIES = ['landscape', 'portrait', 'street', 'travel', 'daily', '_notes', '_record',
+                    'literaturecovers', 'gamecovers', 'videocovers']
+
+TAG_POOL = 200
+FOLDER_RATIO = 0.12
+BASE_TIME = 1700000000.0  # 固定时间基准，避免生成结果随运行时间变化
+
+PRESETS = {
+    'small':  {'nodes': 1000,   'photos': 5000,  'space': 500,   'albums': 200},
+    'medium': {'nodes': 10000,  'photos': 20000, 'space': 2000,  'albums': 1000},
+    'large':  {'nodes': 100000, 'photos': 50000, 'space': 10000, 'albums': 5000},
+}
+
+def _tags(rng, max_count=3):
+    return [f"tag-{rng.randrange(TAG_POOL)}" for _ in range(rng.randint(0, max_count))]
+
+def _photo_ref(rng, category):
+    return f"photos/images/{category}/{rng.randrange(10**6):06d}.jpg"
+
+def _markdown(rng, title):
+    lines = [f"# {title}", ""]
+    for i in range(rng.randint(3, 12)):
+        lines.append(f"段落 {i}: " + " ".join(f"word{rng.randrange(5000)}" for _ in range(rng.randint(8, 30))))
+        if rng.random() < 0.2:
+            lines.append(f"![]({_photo_ref(rng, '_notes')})")
+        lines.append("")
+    return "\n".join(lines)
+
+def _build_tree(rng, module, count):
+    """随机多层树：每个新节点挂到已有文件夹下，文件夹占比 FOLDER_RATIO"""
+    rows = []
+    folders = ['root']
+    prefix = module[:2]
+    for i in range(count):
+        node_id = f"{prefix}_{i:06d}"
+        parent = folders[rng.randrange(len(folders))] if rng.random() < 0.9 else 'root'
+        is_folder = rng.random() < FOLDER_RATIO
+        title = f"{module.title()} {i}"
+        cover = None
+        if not is_folder and module in COVER_MODULES and rng.random() < 0.3:
+            cover = _photo_ref(rng, COVER_MODULES[module])
+        rows.append({
+            'id': node_id, 'module': module, 'parent_id': parent,
+            'type': 'folder' if is_folder else 'note', 'title': title,
+            'tags': _tags(rng), 'coverImage': cover,
+        })
+        if is_folder:
+            folders.append(node_id)
+    return rows
+
+def generate_cms(rng, root, nodes, write_md=True):
+    data_dir = os.path.join(root, 'data')
+    db_path = os.path.join(data_dir, 'cms.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript(CMS_SCHEMA)
+
+    records = []
+    for module, share in MODULE_SHARES.items():
+        module_dir = os.path.join(data_dir, module)
+        os.makedirs(module_dir, exist_ok=True)
+        for order, row in enumerate(_build_tree(rng, module, max(1, int(nodes * share)))):
+            content = ''
+            if row['type'] == 'note':
+                content = f"{module}/{row['id']}.md"
+                if write_md:
+                    with open(os.path.join(module_dir, f"{row['id']}.md"), 'w', encoding='utf-8') as f:
+                        f.write(_markdown(rng, row['title']))
+            records.append((row['id'], module, row['parent_id'], row['type'], row['title'], content,
+                            json.dumps(row['tags'], ensure_ascii=False), BASE_TIME + order, order,
+                            row['coverImage']))
+
+    conn.executemany('''
+        INSERT INTO nodes (id, module, parent_id, type, title, content, tags, created_at, sort_order, coverImage)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', records)
+    conn.commit()
+    conn.close()
+
+    # 标签分类文件 (rename_tag 会同时改写)
+    tags_dir = os.path.join(data_dir, 'tags')
+    os.makedirs(tags_dir, exist_ok=True)
+    for module in MODULE_SHARES:
+        categories = [
+            {'name': f"分类 {c}", 'tags': [f"tag-{t}" for t in range(c, TAG_POOL, 10)]}
+            for c in range(10)
+        ]
+        with open(os.path.join(tags_dir, f"cms-{module}-tag-categories.json"), 'w', encoding='utf-8') as f:
+            json.dump(categories, f, ensure_ascii=False, indent=2)
+    return len(records)
+
+def generate_gallery(rng, root, photos):
+    db_path = os.path.join(root, 'data', 'gallery.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript(GALLERY_SCHEMA)
+    records = []
+    for i in range(photos):
+        category = PHOTO_CATEGORIES[rng.randrange(len(PHOTO_CATEGORIES))]
+        name = f"20240101_{i:06d}.jpg"
+        stem = os.path.splitext(name)[0]
+        records.append((
+            f"p_{i:06d}", category, name,
+            f"photos/images/{category}/{name}",
+            f"photos/thumbnails/{category}/{stem}.webp",
+            f"photos/previews/{category}/{stem}.avif",
+            f"{rng.getrandbits(128):032x}", BASE_TIME + i, i,
+            json.dumps(_tags(rng, 2), ensure_ascii=False),
+        ))
+    conn.executemany('''
+        INSERT INTO photos (id, category, name, path, thumb, preview, hash, created_at, sort_order, tags)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', records)
+    conn.commit()
+    conn.close()
+    return len(records)
+
+def generate_space_tree(rng, root, count):
+    roots, folders = [], []
+    for i in range(count):
+        is_folder = not folders or rng.random() < FOLDER_RATIO
+        node = {'id': f"s_{i:06d}", 'title': f"Link {i}", 'tags': _tags(rng)}
+        if is_folder:
+            node['type'] = 'folder'
+            node['children'] = []
+        else:
+            node['type'] = 'link'
+            node['url'] = f"https://example.com/{i}"
+            node['icon'] = f"photos/icons/{i:06d}.png"
+        siblings = roots if not folders or rng.random() < 0.1 else folders[rng.randrange(len(folders))]['children']
+        siblings.append(node)
+        if is_folder:
+            folders.append(node)
+    with open(os.path.join(root, 'data', 'space-tree.json'), 'w', encoding='utf-8') as f:
+        json.dump({'root': roots}, f, ensure_ascii=False, indent=2)
+    return count
+
+def generate_music(rng, root, albums):
+    data = []
+    for c in range(max(1, albums // 100)):
+        data.append({'name': f"分类 {c}", 'collections': [
+            {'name': f"合集 {c}-{k}", 'albums': []} for k in range(5)
+        ]})
+    for i in range(albums):
+        total = rng.randint(1, 40)
+        category = data[rng.randrange(len(data))]
+        category['collections'][rng.randrange(5)]['albums'].append({
+            'id': f"alb_bench_{i}", 'title': f"Album {i}", 'bvid': f"BV{rng.getrandbits(40):010x}",
+            'total': total, 'bili_total': total, 'page_mapping': list(range(1, total + 1)),
+            'custom_parts': [], 'cover': _photo_ref(rng, 'default'),
+        })
+    with open(os.path.join(root, 'data', 'music-data.json'), 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return albums
+
+def generate(root, nodes=1000, photos=5000, space=500, albums=200, seed=42, write_md=True):
+    """在 root 下生成完整数据集，返回各部分的实际数量"""
+    if os.path.exists(os.path.join(root, 'data', 'cms.db')):
+        raise FileExistsError(f"Dataset already exists: {root}")
+    os.makedirs(os.path.join(root, 'data'), exist_ok=True)
+    rng = random.Random(seed)
+    return {
+        'nodes': generate_cms(rng, root, nodes, write_md),
+        'photos': generate_gallery(rng, root, photos),
+        'space': generate_space_tree(rng, root, space),
+        'albums': generate_music(rng, root, albums),
+    }
+
+def add_size_args(parser):
+    parser.add_argument('--size', choices=sorted(PRESETS), default='small', help='预设规模')
+    parser.add_argument('--nodes', type=int, help='CMS 节点数 (覆盖预设)')
+    parser.add_argument('--photos', type=int, help='相册图片数 (覆盖预设)')
+    parser.add_argument('--space', type=int, help='Space 树节点数 (覆盖预设)')
+    parser.add_argument('--albums', type=int, help='音乐专辑数 (覆盖预设)')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+
+def sizes_from_args(args):
+    sizes = dict(PRESETS[args.size])
+    for key in sizes:
+        if getattr(args, key) is not None:
+            sizes[key] = getattr(args, key)
+    return sizes
+
+def main():
+    parser = argparse.ArgumentParser(description='MAERS 基准测试数据集生成器')
+    parser.add_argument('root', help='输出目录')
+    add_size_args(parser)
+    parser.add_argument('--no-md', action='store_true', help='不写出笔记 MD 文件')
+    args = parser.parse_args()
+
+    sizes = sizes_from_args(args)
+    start = time.perf_counter()
+    try:
+        counts = generate(args.root, seed=args.seed, write_md=not args.no_md, **sizes)
+    except FileExistsError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ 数据集已生成 ({time.perf_counter() - start:.1f}s): {args.root}")
+    for key, value in counts.items():
+        print(f"   {key:<8} {value}")
+
+if __name__ == "__main__":
+    main()
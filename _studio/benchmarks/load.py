@@ -0,0 +1,350 @@
+"""
+MAERS Load Test
+在合成数据集上启动真实的 server.Handler (临时端口)，按目标速率回放混合负载：
+- 静态文件 GET、/api/cms/fetch、标签更新、图库重排序、图片上传 (权重可调)
+- 开环调度：请求按计划时间发出，延迟从计划时间起算 (服务器排队时间计入延迟)
+- 客户端统计吞吐、延迟分布直方图、错误率；服务端按路由统计 CPU 时间 (thread_time)
+
+用法:
+  python benchmarks/load.py --size small --rate 50 --duration 20
+  python benchmarks/load.py --mix static=60,fetch=30,upload=10 --concurrency 16
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import http.client
+import socketserver
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)  # _studio/
+sys.path.append(BASE_DIR)
+sys.path.append(BENCH_DIR)
+
+import dataset
+import run as bench
+import server  # 导入时会 chdir 到项目根目录，bind() 之后再切换到数据集目录
+from services import cms, photos
+
+RESULTS_DIR = bench.RESULTS_DIR
+DEFAULT_MIX = {'static': 40, 'fetch': 20, 'tags': 20, 'reorder': 10, 'upload': 10}
+# 延迟直方图桶上界 (ms)，最后一桶为溢出
+HISTOGRAM_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+STATIC_FILES = {
+    'static/index.html': 4 * 1024,
+    'static/style.css': 16 * 1024,
+    'static/app.js': 64 * 1024,
+    'static/hero.jpg': 256 * 1024,
+}
+
+# ================= 服务端 =================
+
+class ProfiledHandler(server.Handler):
+    """server.Handler + 按路由统计服务端耗时；不输出访问日志"""
+    stats = {}
+    stats_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _route_label(self, method):
+        path = urllib.parse.urlparse(self.path).path
+        if path.startswith('/api/') or path.rstrip('/') in ('/upload', '/delete', '/reorder'):
+            return f"{method} {path.rstrip('/')}"
+        return f"{method} <static>"
+
+    def _measured(self, method, handler):
+        cpu_start, wall_start = time.thread_time(), time.perf_counter()
+        try:
+            handler()
+        finally:
+            cpu = (time.thread_time() - cpu_start) * 1000
+            wall = (time.perf_counter() - wall_start) * 1000
+            route = self._route_label(method)
+            with self.stats_lock:
+                s = self.stats.setdefault(route, {'requests': 0, 'cpu_ms': 0.0, 'wall_ms': 0.0})
+                s['requests'] += 1
+                s['cpu_ms'] += cpu
+                s['wall_ms'] += wall
+
+    def do_GET(self):
+        self._measured('GET', super().do_GET)
+
+    def do_POST(self):
+        self._measured('POST', super().do_POST)
+
+def start_server():
+    """与 server.py 相同的单线程 TCPServer，监听临时端口"""
+    httpd = socketserver.TCPServer(('127.0.0.1', 0), ProfiledHandler)
+    thread = threading.Thread(target=httpd.serve_forever, name='maers-load-server', daemon=True)
+    thread.start()
+    return httpd, thread
+
+# ================= 负载 =================
+
+def write_static(root, rng):
+    for rel_path, size in STATIC_FILES.items():
+        full_path = os.path.join(root, rel_path.replace('/', os.sep))
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as f:
+            f.write(rng.randbytes(size))
+
+class Workload:
+    """预先从数据集取出请求所需的 id / 路径，生成请求时不再访问数据库"""
+    def __init__(self, rng, mix):
+        self.rng = rng
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.static_paths = list(STATIC_FILES) + ['data/space-tree.json', 'data/music-data.json']
+
+        conn = cms.get_db()
+        self.note_ids = [r[0] for r in conn.execute(
+            "SELECT id FROM nodes WHERE module=? AND type='note' ORDER BY id", (bench.BENCH_MODULE,))]
+        conn.close()
+        conn = photos.get_db()
+        self.galleries = {}
+        for category, path in conn.execute("SELECT category, path FROM photos ORDER BY sort_order"):
+            self.galleries.setdefault(category, []).append(path)
+        conn.close()
+        self.categories = sorted(self.galleries)
+        self.upload_seq = 0
+
+    def next_request(self):
+        """返回 (kind, method, url, body, content_type)"""
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        rng = self.rng
+        if kind == 'static':
+            return kind, 'GET', '/' + rng.choice(self.static_paths), None, None
+        if kind == 'fetch':
+            return kind, 'GET', f"/api/cms/fetch?module={bench.BENCH_MODULE}", None, None
+        if kind == 'tags':
+            body = {'id': rng.choice(self.note_ids),
+                    'tags': [f"tag-{rng.randrange(dataset.TAG_POOL)}" for _ in range(rng.randint(0, 3))]}
+            return kind, 'POST', f"/api/cms/update_tags?module={bench.BENCH_MODULE}", json.dumps(body), 'application/json'
+        if kind == 'reorder':
+            category = rng.choice(self.categories)
+            order = list(self.galleries[category])
+            rng.shuffle(order)
+            body = [{'path': p} for p in order]
+            return kind, 'POST', f"/reorder?category={urllib.parse.quote(category)}", json.dumps(body), 'application/json'
+        if kind == 'upload':
+            self.upload_seq += 1
+            url = f"/upload?category={bench.UPLOAD_CATEGORY}&name=load_{self.upload_seq}.jpg"
+            return kind, 'POST', url, bench.image_bytes(rng), 'application/octet-stream'
+        raise ValueError(f"Unknown request kind: {kind}")
+
+def send(port, method, url, body, content_type, timeout):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        headers = {'Content-Type': content_type} if content_type else {}
+        conn.request(method, url, body=body, headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status
+    finally:
+        conn.close()
+
+def run_load(port, workload, rate, duration, concurrency, seed, timeout):
+    """开环回放：请求间隔服从指数分布 (泊松到达)，平均速率为 rate"""
+    rng = random.Random(f"{seed}:arrivals")
+    results = []
+    results_lock = threading.Lock()
+
+    def task(kind, method, url, body, content_type, scheduled):
+        error = None
+        try:
+            status = send(port, method, url, body, content_type, timeout)
+            if status >= 400:
+                error = f"HTTP {status}"
+        except Exception as e:
+            error = type(e).__name__
+        latency = (time.perf_counter() - scheduled) * 1000
+        with results_lock:
+            results.append((kind, latency, error))
+
+    start = time.perf_counter()
+    scheduled = start
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            scheduled += rng.expovariate(rate)
+            if scheduled - start >= duration:
+                break
+            request = workload.next_request()
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(task, *request, scheduled)
+    elapsed = time.perf_counter() - start
+    return results, elapsed
+
+# ================= 统计 =================
+
+def histogram(latencies):
+    counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+    for value in latencies:
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if value < bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    labels = [f"<{b}ms" for b in HISTOGRAM_BUCKETS] + [f">={HISTOGRAM_BUCKETS[-1]}ms"]
+    return dict(zip(labels, counts))
+
+def summarize_kind(samples, elapsed):
+    latencies = sorted(lat for lat, _ in samples)
+    errors = {}
+    for _, err in samples:
+        if err:
+            errors[err] = errors.get(err, 0) + 1
+    return {
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / elapsed, 2),
+        'error_rate': round(sum(errors.values()) / len(samples), 4),
+        'errors': errors,
+        'p50_ms': round(bench.percentile(latencies, 50), 2),
+        'p95_ms': round(bench.percentile(latencies, 95), 2),
+        'p99_ms': round(bench.percentile(latencies, 99), 2),
+        'max_ms': round(latencies[-1], 2),
+        'histogram': histogram(latencies),
+    }
+
+def summarize_routes(stats):
+    return {
+        route: {
+            'requests': s['requests'],
+            'cpu_ms_total': round(s['cpu_ms'], 1),
+            'cpu_ms_mean': round(s['cpu_ms'] / s['requests'], 3),
+            'wall_ms_mean': round(s['wall_ms'] / s['requests'], 3),
+        }
+        for route, s in sorted(stats.items(), key=lambda kv: -kv[1]['cpu_ms'])
+    }
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"未知请求类型: {name} (可选: {', '.join(DEFAULT_MIX)})")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+def print_report(report):
+    print(f"\n总计 {report['requests']} 请求 / {report['elapsed_s']}s = {report['throughput_rps']} req/s "
+          f"(目标 {report['target_rps']})，错误率 {report['error_rate'] * 100:.2f}%")
+    print(f"\n{'kind':<10}{'reqs':>7}{'rps':>9}{'err%':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for kind, k in report['kinds'].items():
+        print(f"{kind:<10}{k['requests']:>7}{k['throughput_rps']:>9.2f}{k['error_rate'] * 100:>7.2f}%"
+              f"{k['p50_ms']:>10.1f}{k['p95_ms']:>10.1f}{k['p99_ms']:>10.1f}{k['max_ms']:>10.1f}")
+
+    print("\n延迟分布 | Latency histogram (all)")
+    total = report['requests'] or 1
+    for label, count in report['histogram'].items():
+        if count:
+            print(f"  {label:>9} {count:>7}  {'#' * max(1, round(count / total * 50))}")
+
+    print(f"\n{'server route':<36}{'reqs':>7}{'cpu total':>12}{'cpu mean':>11}{'wall mean':>11}")
+    for route, r in report['server_routes'].items():
+        print(f"{route:<36}{r['requests']:>7}{r['cpu_ms_total']:>10.0f}ms{r['cpu_ms_mean']:>9.2f}ms"
+              f"{r['wall_ms_mean']:>9.2f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description='MAERS HTTP 负载测试')
+    dataset.add_size_args(parser)
+    parser.add_argument('--rate', type=float, default=30, help='目标请求速率 (req/s)')
+    parser.add_argument('--duration', type=float, default=15, help='持续时间 (秒)')
+    parser.add_argument('--concurrency', type=int, default=8, help='客户端并发连接数')
+    parser.add_argument('--timeout', type=float, default=30, help='单请求超时 (秒)')
+    parser.add_argument('--mix', help='请求权重，如 static=40,fetch=20,tags=20,reorder=10,upload=10')
+    parser.add_argument('--out', help='结果 JSON 路径 (默认 cache/benchmarks/load-<提交>-<规模>.json)')
+    parser.add_argument('--keep', action='store_true', help='保留生成的数据集目录')
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix) if args.mix else dict(DEFAULT_MIX)
+    except ValueError as e:
+        parser.error(str(e))
+
+    sizes = dataset.sizes_from_args(args)
+    commit, dirty = bench.git_revision()
+    out_path = os.path.abspath(args.out) if args.out else os.path.join(RESULTS_DIR, f"load-{commit}-{args.size}.json")
+    cwd = os.getcwd()
+
+    print("========================================")
+    print(f"MAERS Load Test @ {commit}{' (dirty)' if dirty else ''}")
+    print("规模: " + ", ".join(f"{k}={v}" for k, v in sizes.items()) + f", seed={args.seed}")
+    print(f"负载: {args.rate} req/s × {args.duration}s, 并发 {args.concurrency}, 权重 {mix}")
+    print("========================================")
+
+    root = tempfile.mkdtemp(prefix='maers-load-')
+    httpd = None
+    try:
+        rng = random.Random(args.seed)
+        dataset.generate(root, seed=args.seed, **sizes)
+        write_static(root, rng)
+        bench.bind(root)
+        with redirect_stdout(io.StringIO()):
+            cms.sync_js_file(bench.BENCH_MODULE)
+            photos.sync_gallery_js()
+        workload = Workload(random.Random(f"{args.seed}:workload"), mix)
+
+        httpd, _ = start_server()
+        port = httpd.server_address[1]
+        print(f"服务器已启动 | Server listening on 127.0.0.1:{port}")
+
+        # 服务端日志在负载期间丢弃
+        with open(os.devnull, 'w', encoding='utf-8') as sink, redirect_stdout(sink):
+            results, elapsed = run_load(port, workload, args.rate, args.duration,
+                                        args.concurrency, args.seed, args.timeout)
+    finally:
+        if httpd is not None:
+            httpd.shutdown()
+            httpd.server_close()
+        os.chdir(cwd)
+        if args.keep:
+            print(f"数据集保留于: {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    by_kind = {}
+    for kind, latency, error in results:
+        by_kind.setdefault(kind, []).append((latency, error))
+    errors = sum(1 for _, _, err in results if err)
+    report = {
+        'version': bench.RESULT_VERSION,
+        'commit': commit,
+        'dirty': dirty,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seed': args.seed,
+        'size': args.size,
+        'sizes': sizes,
+        'mix': mix,
+        'target_rps': args.rate,
+        'concurrency': args.concurrency,
+        'elapsed_s': round(elapsed, 2),
+        'requests': len(results),
+        'throughput_rps': round(len(results) / elapsed, 2),
+        'error_rate': round(errors / len(results), 4) if results else 0.0,
+        'histogram': histogram([lat for _, lat, _ in results]),
+        'kinds': {kind: summarize_kind(samples, elapsed) for kind, samples in sorted(by_kind.items())},
+        'server_routes': summarize_routes(ProfiledHandler.stats),
+    }
+    print_report(report)
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 结果已写入: {out_path}")
+
+if __name__ == "__main__":
+    main()
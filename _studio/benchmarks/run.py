@@ -0,0 +1,262 @@
+"""
+MAERS Benchmarks
+在合成数据集上运行后端核心操作的计时场景，输出可跨提交比较的 JSON 结果。
+- 每个场景先预热 1 次，再计时 --repeat 次，统计 p50 / p95 / p99
+- 峰值内存 (tracemalloc) 在额外一次运行中单独测量，不影响计时
+- 服务模块的数据路径全部重定向到数据集目录，不会触碰真实数据
+
+用法:
+  python benchmarks/run.py --size medium
+  python benchmarks/run.py --size large --repeat 5 --only fetch_module_tree,sync_js_file
+  python benchmarks/run.py --size small --compare cache/benchmarks/<旧提交>-small.json
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+from contextlib import redirect_stdout
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)  # _studio/
+sys.path.append(BASE_DIR)
+sys.path.append(BENCH_DIR)
+
+import dataset
+from services import cms, cms_nodes, photos, asset_gc, ref_index, space_tree, music_library, log
+
+RESULTS_DIR = os.path.join(BASE_DIR, 'cache', 'benchmarks')
+RESULT_VERSION = 1
+BENCH_MODULE = 'notes'
+UPLOAD_CATEGORY = 'bench-upload'
+
+# ================= 数据集绑定 =================
+
+def bind(root):
+    """把各服务模块的路径常量与单例指向数据集目录"""
+    data_dir = os.path.join(root, 'data')
+    cms.PROJECT_ROOT, cms.DATA_DIR = root, data_dir
+    cms.DB_PATH = os.path.join(data_dir, 'cms.db')
+    photos.PROJECT_ROOT, photos.DATA_DIR = root, data_dir
+    photos.DB_PATH = os.path.join(data_dir, 'gallery.db')
+    photos.GALLERY_JSON_FILE = os.path.join(data_dir, 'photos-data.json')
+    asset_gc.PROJECT_ROOT, asset_gc.DATA_DIR = root, data_dir
+    asset_gc.CMS_DB = os.path.join(data_dir, 'cms.db')
+    ref_index._index = ref_index.RefIndex(os.path.join(root, 'cache', 'ref-index.db'))
+    space_tree._model = space_tree.SpaceTreeModel(os.path.join(data_dir, 'space-tree.json'))
+    music_library._library = music_library.MusicLibrary(os.path.join(data_dir, 'music-data.json'))
+    # 日志写入数据集目录，不混入真实的 cache/logs
+    log.configure(console=False, log_dir=os.path.join(root, 'logs'))
+    # photos 的图片目录为相对路径 (相对于项目根目录)
+    os.chdir(root)
+
+# ================= 场景 =================
+# 每个场景接收 (rng, count)，返回 count 个无参可调用对象；准备工作不计入耗时
+
+def _node_ids(where, params=()):
+    conn = cms.get_db()
+    rows = conn.execute(f"SELECT id FROM nodes WHERE {where} ORDER BY id", params).fetchall()
+    conn.close()
+    return [r[0] for r in rows]
+
+def scenario_fetch_module_tree(rng, count):
+    return [lambda: cms.fetch_module_tree(BENCH_MODULE)] * count
+
+def scenario_sync_js_file(rng, count):
+    return [lambda: cms.sync_js_file(BENCH_MODULE)] * count
+
+def scenario_sync_gallery_js(rng, count):
+    return [photos.sync_gallery_js] * count
+
+def scenario_delete_node(rng, count):
+    # 删除非根层的文件夹 (带子树、MD 文件与引用注销)，每次删除不同的节点
+    candidates = _node_ids("module=? AND type='folder' AND parent_id != 'root'", (BENCH_MODULE,))
+    if len(candidates) < count:
+        candidates += _node_ids("module=? AND type='note'", (BENCH_MODULE,))
+    picked = rng.sample(candidates, count)
+    return [lambda node_id=node_id: cms_nodes.delete_node(BENCH_MODULE, node_id, cms.get_context())
+            for node_id in picked]
+
+def scenario_rename_tag(rng, count):
+    tags = rng.sample(range(dataset.TAG_POOL), min(count, dataset.TAG_POOL))
+    tags = (tags * (count // len(tags) + 1))[:count]
+    return [lambda i=i, t=t: cms.rename_tag(BENCH_MODULE, f"tag-{t}", f"tag-{t}-r{i}")
+            for i, t in enumerate(tags)]
+
+def image_bytes(rng):
+    if photos.ensure_pil():
+        buf = io.BytesIO()
+        color = tuple(rng.randrange(256) for _ in range(3))
+        photos.Image.new('RGB', (640, 480), color).save(buf, 'JPEG', quality=85)
+        return buf.getvalue()
+    return rng.randbytes(64 * 1024)
+
+def scenario_handle_upload(rng, count):
+    query = {'category': [UPLOAD_CATEGORY], 'name': ['bench.jpg']}
+    payloads = [image_bytes(rng) for _ in range(count)]
+    return [lambda data=data: photos.handle_upload(query, data) for data in payloads]
+
+SCENARIOS = {
+    'fetch_module_tree': scenario_fetch_module_tree,
+    'sync_js_file': scenario_sync_js_file,
+    'sync_gallery_js': scenario_sync_gallery_js,
+    'delete_node': scenario_delete_node,
+    'rename_tag': scenario_rename_tag,
+    'handle_upload': scenario_handle_upload,
+}
+
+# ================= 计时与统计 =================
+
+def percentile(sorted_samples, q):
+    """线性插值百分位 (q 取 0-100)"""
+    if not sorted_samples:
+        return None
+    pos = (len(sorted_samples) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_samples) - 1)
+    return sorted_samples[lo] + (sorted_samples[hi] - sorted_samples[lo]) * (pos - lo)
+
+def summarize(samples_ms, peak_bytes):
+    s = sorted(samples_ms)
+    return {
+        'n': len(s),
+        'mean_ms': round(sum(s) / len(s), 3),
+        'min_ms': round(s[0], 3),
+        'p50_ms': round(percentile(s, 50), 3),
+        'p95_ms': round(percentile(s, 95), 3),
+        'p99_ms': round(percentile(s, 99), 3),
+        'max_ms': round(s[-1], 3),
+        'peak_kb': round(peak_bytes / 1024, 1),
+    }
+
+def run_scenario(name, repeat, seed):
+    # 场景输出大量日志，计时期间丢弃
+    rng = random.Random(f"{seed}:{name}")
+    with redirect_stdout(io.StringIO()):
+        calls = SCENARIOS[name](rng, repeat + 2)
+    warmup, timed, measured = calls[0], calls[1:-1], calls[-1]
+
+    sink = open(os.devnull, 'w', encoding='utf-8')
+    try:
+        with redirect_stdout(sink):
+            warmup()
+            samples = []
+            for call in timed:
+                start = time.perf_counter()
+                call()
+                samples.append((time.perf_counter() - start) * 1000)
+
+            tracemalloc.start()
+            measured()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    finally:
+        sink.close()
+    return summarize(samples, peak)
+
+# ================= 结果 =================
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BASE_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+def compare(current, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\n对比基线 | Baseline: {baseline.get('commit')} ({os.path.basename(baseline_path)})")
+    if baseline.get('sizes') != current['sizes'] or baseline.get('seed') != current['seed']:
+        print("⚠️  数据集规模或种子不同，结果仅供参考")
+    print(f"{'scenario':<20}{'base p50':>12}{'p50':>12}{'Δ':>9}{'base p95':>12}{'p95':>12}{'Δ':>9}")
+    for name, res in current['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            print(f"{name:<20}{'-':>12}{res['p50_ms']:>12.2f}")
+            continue
+        d50 = (res['p50_ms'] / base['p50_ms'] - 1) * 100 if base['p50_ms'] else 0.0
+        d95 = (res['p95_ms'] / base['p95_ms'] - 1) * 100 if base['p95_ms'] else 0.0
+        print(f"{name:<20}{base['p50_ms']:>12.2f}{res['p50_ms']:>12.2f}{d50:>+8.1f}%"
+              f"{base['p95_ms']:>12.2f}{res['p95_ms']:>12.2f}{d95:>+8.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description='MAERS 后端基准测试')
+    dataset.add_size_args(parser)
+    parser.add_argument('--repeat', type=int, default=10, help='每个场景的计时次数')
+    parser.add_argument('--only', help='仅运行指定场景 (逗号分隔)')
+    parser.add_argument('--out', help='结果 JSON 路径 (默认 cache/benchmarks/<提交>-<规模>.json)')
+    parser.add_argument('--compare', help='与之前的结果 JSON 对比')
+    parser.add_argument('--keep', action='store_true', help='保留生成的数据集目录')
+    args = parser.parse_args()
+
+    names = args.only.split(',') if args.only else list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景: {', '.join(unknown)} (可选: {', '.join(SCENARIOS)})")
+
+    sizes = dataset.sizes_from_args(args)
+    commit, dirty = git_revision()
+    out_path = os.path.abspath(args.out) if args.out else os.path.join(RESULTS_DIR, f"{commit}-{args.size}.json")
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    cwd = os.getcwd()
+
+    print("========================================")
+    print(f"MAERS Benchmarks @ {commit}{' (dirty)' if dirty else ''}")
+    print("规模: " + ", ".join(f"{k}={v}" for k, v in sizes.items()) + f", seed={args.seed}")
+    print("========================================")
+
+    root = tempfile.mkdtemp(prefix='maers-bench-')
+    try:
+        start = time.perf_counter()
+        dataset.generate(root, seed=args.seed, **sizes)
+        print(f"数据集生成 {time.perf_counter() - start:.1f}s: {root}")
+        bind(root)
+
+        results = {}
+        for name in names:
+            results[name] = run_scenario(name, args.repeat, args.seed)
+            r = results[name]
+            print(f"  {name:<20} p50 {r['p50_ms']:>10.2f} ms   p95 {r['p95_ms']:>10.2f} ms   "
+                  f"p99 {r['p99_ms']:>10.2f} ms   peak {r['peak_kb']:>10.1f} KB")
+    finally:
+        os.chdir(cwd)
+        if args.keep:
+            print(f"数据集保留于: {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        'version': RESULT_VERSION,
+        'commit': commit,
+        'dirty': dirty,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pil': photos.ensure_pil(),
+        'seed': args.seed,
+        'size': args.size,
+        'sizes': sizes,
+        'repeat': args.repeat,
+        'scenarios': results,
+    }
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 结果已写入: {out_path}")
+
+    if baseline_path:
+        compare(report, baseline_path)
+
+if __name__ == "__main__":
+    main()
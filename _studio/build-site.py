@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import site_build
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size} B" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def main():
+    parser = argparse.ArgumentParser(description="MAERS 静态站点构建 (内容哈希 + 预压缩 + 增量)")
+    parser.add_argument('--out', default=site_build.DEFAULT_OUT_DIR, help="输出目录 (默认 项目根目录/dist)")
+    parser.add_argument('--force', action='store_true', help="忽略清单，全量重建")
+    parser.add_argument('--no-compress', action='store_true', help="不输出 .gz / .br 预压缩文件")
+    args = parser.parse_args()
+
+    print("========================================")
+    print("        MAERS 静态站点构建")
+    print("========================================")
+    start = time.perf_counter()
+    builder = site_build.build_site(os.path.abspath(args.out), compress=not args.no_compress, force=args.force)
+    stats = builder.stats
+
+    print(f"[*] 输出目录: {builder.out_dir}")
+    print(f"[*] 文件 {stats['files']} 个，读取 {stats['read']} 个 (其余沿用清单)")
+    print(f"[*] 带哈希资源 {stats['hashed']} 个，预压缩 {stats['compressed']} 个"
+          f"{'' if site_build.HAS_BROTLI else ' (未安装 brotli，仅 gzip)'}")
+    print(f"[+] 写入 {stats['written']} 个 ({format_bytes(stats['bytes_written'])})，"
+          f"未变化跳过 {stats['skipped']} 个，清理旧文件 {stats['removed']} 个")
+    print("[*] 阶段耗时: " + ", ".join(f"{name} {sec * 1000:.0f}ms" for name, sec in builder.phase_times))
+    print(f"[+] 完成，用时 {time.perf_counter() - start:.2f}s")
+
+if __name__ == '__main__':
+    main()
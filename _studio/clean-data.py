@@ -1,10 +1,18 @@
 import os
+import sys
+import time
 import sqlite3
-import re
 import json
 import shutil
+import argparse
+from contextlib import contextmanager
 from typing import Set
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
 import config
+from services import ref_index, image_variants, blob_store
+from services.fs_snapshot import FsSnapshot, DEFAULT_MANIFEST
 
 # ================= 1. 助手函数 =================
 
@@ -18,11 +26,25 @@ def normalize_path(path: str) -> str:
     if not path: return ""
     return path.replace('\\', '/')
 
+def format_bytes(size: int) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size} B" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
 class MaersJanitor:
-    def __init__(self):
+    def __init__(self, dry_run: bool = False, full_scan: bool = False, workers: int = None, use_manifest: bool = False):
+        self.dry_run = dry_run
+        self.full_scan = full_scan
+        self.workers = workers
         self.used_files: Set[str] = set()
+        # 所有存在性检查共用一份目录快照 (每个目录只列举一次)；删除时同步更新
+        self.fs = FsSnapshot(config.PROJECT_ROOT, DEFAULT_MANIFEST if use_manifest else None)
         self.deleted_files_count = 0
+        self.reclaimable_bytes = 0
         self.db_fixes_count = 0
+        self.phase_times = []
 
     def log(self, msg: str):
         print(f"[*] {msg}")
@@ -33,6 +55,25 @@ class MaersJanitor:
     def warn(self, msg: str):
         print(f"[!] {msg}")
 
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_times.append((name, time.perf_counter() - start))
+
+    def remove_file(self, rel_path: str):
+        """删除文件 (相对项目根目录)；dry-run 模式下只统计可回收空间"""
+        full_path = os.path.join(config.PROJECT_ROOT, rel_path.replace('/', os.sep))
+        try: size = os.path.getsize(full_path)
+        except OSError: size = 0
+        if not self.dry_run:
+            os.remove(full_path)
+        self.fs.discard(rel_path)
+        self.deleted_files_count += 1
+        self.reclaimable_bytes += size
+
     def collect_from_cms(self):
         """从 cms.db 收集所有被引用的图片"""
         if not os.path.exists(config.CMS_DB):
@@ -44,83 +85,46 @@ class MaersJanitor:
             conn = sqlite3.connect(config.CMS_DB)
             cursor = conn.cursor()
             
-            # 1. 扫描封面图
+            # 1. 扫描封面图 (含缩略图 / 预览图的各扩展名形式)
             cursor.execute("SELECT coverImage FROM nodes WHERE coverImage IS NOT NULL AND coverImage != ''")
             for row in cursor.fetchall():
-                path = normalize_path(row[0])
-                self.used_files.add(path)
-                
-                # Enhanced: Handle thumbnails/previews with extension change
-                if path.startswith('photos/images/'):
-                     # 1. Standard same-extension check (legacy)
-                     self.used_files.add(path.replace('photos/images/', 'photos/thumbnails/'))
-                     self.used_files.add(path.replace('photos/images/', 'photos/previews/'))
-                     
-                     # 2. Smart Extension Swap (for .webp/.avif generated files)
-                     base_path_no_ext = os.path.splitext(path)[0]
-                     
-                     # Thumb -> .webp
-                     thumb_path = base_path_no_ext.replace('photos/images/', 'photos/thumbnails/') + '.webp'
-                     self.used_files.add(thumb_path)
-                     
-                     # Preview -> .avif
-                     prev_path = base_path_no_ext.replace('photos/images/', 'photos/previews/') + '.avif'
-                     self.used_files.add(prev_path)
+                self.used_files |= ref_index.expand_ref(normalize_path(row[0]))
 
             # 2. 扫描正文图片
+            md_sources = {}
             cursor.execute("SELECT content FROM nodes WHERE content IS NOT NULL AND content != ''")
             for row in cursor.fetchall():
                 content = row[0]
-                
-                # New Logic: Handle MD files by reading their content
+
+                # MD 正文交给持久化引用索引，只重新扫描有变化的文件
                 if str(content).endswith('.md'):
                     # Add the MD file itself to whitelist
                     self.used_files.add(normalize_path(content))
-                    
-                    # Try to locate the MD file
+
                     # DB usually stores relative path like 'literature/foo.md'
-                    full_md_path = os.path.join(config.DATA_DIR, content)
-                    if not os.path.exists(full_md_path):
-                        full_md_path = os.path.join(config.PROJECT_ROOT, content)
-                        
-                    if os.path.exists(full_md_path):
-                        try:
-                            with open(full_md_path, 'r', encoding='utf-8') as f:
-                                file_content = f.read()
-                                # recursively scan content of the MD file
-                                matches = re.findall(r'photos/[^"\'\s)]+\.[\w]+', file_content)
-                                for m in matches:
-                                    path = normalize_path(m)
-                                    self.used_files.add(path)
-                                    if path.startswith('photos/images/'):
-                                        # 1. Standard same-extension
-                                        self.used_files.add(path.replace('photos/images/', 'photos/thumbnails/'))
-                                        self.used_files.add(path.replace('photos/images/', 'photos/previews/'))
-                                        # 2. Smart Extension Swap (.webp/.avif)
-                                        base = os.path.splitext(path)[0]
-                                        self.used_files.add(base.replace('photos/images/', 'photos/thumbnails/') + '.webp')
-                                        self.used_files.add(base.replace('photos/images/', 'photos/previews/') + '.avif')
-                        except Exception as e:
-                            self.warn(f"Failed to parse MD file {content}: {e}")
+                    if self.fs.exists(f"data/{content}"):
+                        md_sources[content] = os.path.join(config.DATA_DIR, content)
+                    elif self.fs.exists(content):
+                        md_sources[content] = os.path.join(config.PROJECT_ROOT, content)
                     continue
 
                 # Standard text content scanning (for non-MD content nodes)
-                matches = re.findall(r'photos/[^"\'\s)]+\.[\w]+', content)
-                for m in matches:
-                    path = normalize_path(m)
-                    self.used_files.add(path)
-                    if path.startswith('photos/images/'):
-                        self.used_files.add(path.replace('photos/images/', 'photos/thumbnails/'))
-                        self.used_files.add(path.replace('photos/images/', 'photos/previews/'))
-                        # Smart Extension Swap for inline content too
-                        base = os.path.splitext(path)[0]
-                        self.used_files.add(base.replace('photos/images/', 'photos/thumbnails/') + '.webp')
-                        self.used_files.add(base.replace('photos/images/', 'photos/previews/') + '.avif')
-            
+                self.used_files |= ref_index.extract_refs(content)
+
+            index = ref_index.get_index()
+            stats = index.refresh(md_sources, workers=self.workers, full=self.full_scan)
+            self.log(f"引用索引: 重新扫描 {stats['scanned']}，未变化 {stats['unchanged']}，移除 {stats['removed']}")
+            self.used_files |= index.targets()
+
             conn.close()
         except Exception as e:
             self.warn(f"读取 cms.db 出错: {e}")
 
+    def protect_derivatives(self, *paths):
+        """衍生图的全部编码 (含按 Accept 按需生成的) 一并保护"""
+        for path in paths:
+            self.used_files.update(image_variants.sibling_paths(path))
+
     def collect_from_gallery(self):
         """从 gallery.db 收集所有相册图片"""
         if not os.path.exists(config.GALLERY_DB):
@@ -155,14 +159,12 @@ class MaersJanitor:
                     
                     # If referenced, protect ALL variants
                     self.used_files.add(path)
-                    self.used_files.add(thumb)
-                    self.used_files.add(preview)
+                    self.protect_derivatives(thumb, preview)
                 else:
                     # For other categories (e.g. Photography, Life, Covers), 
                     # we treat Gallery DB as the source of truth (Standalone Album)
                     self.used_files.add(path)
-                    self.used_files.add(thumb)
-                    self.used_files.add(preview)
+                    self.protect_derivatives(thumb, preview)
             
             conn.close()
         except Exception as e:
@@ -176,11 +178,8 @@ class MaersJanitor:
         self.log("正在扫描 music-data.json...")
         try:
             with open(config.MUSIC_DATA, 'r', encoding='utf-8') as f:
-                content = f.read()
-                matches = re.findall(r'photos/[^"\'\s)]+\.[\w]+', content)
-                for m in matches:
-                    path = normalize_path(m)
-                    self.used_files.add(path)
+                for m in ref_index.REF_PATTERN.findall(f.read()):
+                    self.used_files.add(normalize_path(m))
         except Exception as e:
             self.warn(f"读取 music-data.json 出错: {e}")
 
@@ -194,10 +193,17 @@ class MaersJanitor:
             with open(config.SPACE_DATA, 'r', encoding='utf-8') as f:
                 data = json.load(f)
                 
+            def protect_sprite(folder_id):
+                # 图标镜像生成的文件夹雪碧图 (photos/icons/sprites/<folder>.webp|css|json)
+                for ext in ('webp', 'css', 'json'):
+                    self.used_files.add(f"photos/icons/sprites/{folder_id}.{ext}")
+
             def scan_nodes(nodes):
                 if not nodes:
                     return
                 for node in nodes:
+                    if node.get('type') == 'folder' or node.get('children'):
+                        protect_sprite(node.get('id'))
                     # 扫描图标字段
                     if 'icon' in node and node['icon']:
                         icon_path = node['icon']
@@ -215,6 +221,7 @@ class MaersJanitor:
                         scan_nodes(node['children'])
             
             if 'root' in data:
+                protect_sprite('root')
                 scan_nodes(data['root'])
                 
         except Exception as e:
@@ -223,33 +230,43 @@ class MaersJanitor:
     def clean_physical_files(self):
         """遍历 photos 目录及其子目录，删除未被引用的文件"""
         self.log("正在清理物理文件 (photos/)...")
-        if not os.path.exists(config.PHOTOS_ROOT): return
+        photos_rel = to_rel_path(config.PHOTOS_ROOT)
+        if not self.fs.isdir(photos_rel): return
 
-        image_dirs = ['images', 'thumbnails', 'previews']
-        for root, dirs, files in os.walk(config.PHOTOS_ROOT):
-            for file in files:
-                if file.startswith('.'): continue
-                
-                full_path = os.path.join(root, file)
-                rel_path = to_rel_path(full_path)
-                
-                if rel_path not in self.used_files:
-                    is_core_asset = any(sub in rel_path for sub in image_dirs)
-                    
-                    if is_core_asset:
-                        try:
-                            os.remove(full_path)
-                            self.deleted_files_count += 1
-                        except Exception as e:
-                            self.warn(f"删除失败: {rel_path} ({e})")
+        # icons: Space 图标镜像 (photos/icons/)，未被 space-tree.json 引用即视为孤儿
+        image_dirs = ['images', 'thumbnails', 'previews', 'icons']
+        for rel_path in list(self.fs.walk_files(photos_rel)):
+            # 点文件与点目录 (如旧版内容寻址存储 photos/.blobs/) 不是相册文件，不参与判定
+            if any(part.startswith('.') for part in rel_path.split('/')): continue
+
+            if rel_path not in self.used_files:
+                is_core_asset = any(sub in rel_path for sub in image_dirs)
+
+                if is_core_asset:
+                    try:
+                        self.remove_file(rel_path)
+                    except Exception as e:
+                        self.warn(f"删除失败: {rel_path} ({e})")
 
         # 新增: 正在清理物理 MD 文件 (data/模块/*.md)...
         self.log("正在清理物理 MD 文档 (data/模块/*.md)...")
-        if os.path.exists(config.DATA_DIR):
-            for item in os.listdir(config.DATA_DIR):
+        data_rel = to_rel_path(config.DATA_DIR)
+        if self.fs.isdir(data_rel):
+            for item in self.fs.listdir(data_rel):
                 sub_dir = os.path.join(config.DATA_DIR, item)
-                if os.path.isdir(sub_dir):
-                    for file in os.listdir(sub_dir):
+                if self.fs.isdir(f"{data_rel}/{item}"):
+                    for file in self.fs.listdir(f"{data_rel}/{item}"):
+                        # 预渲染产物 (xxx.md.render.json) 随源文档一起判定
+                        if file.endswith('.md.render.json'):
+                            source_ref = to_rel_path(os.path.join(sub_dir, file[:-len('.render.json')]))
+                            source_ref = source_ref.replace('data/', '', 1) if source_ref.startswith('data/') else source_ref
+                            if source_ref not in self.used_files:
+                                try:
+                                    self.remove_file(to_rel_path(os.path.join(sub_dir, file)))
+                                except Exception as e:
+                                    self.warn(f"删除渲染产物失败: {file} ({e})")
+                            continue
+
                         if file.endswith('.md'):
                             full_path = os.path.join(sub_dir, file)
                             # 转换成相对于 PROJECT_ROOT 的路径，例如 'data/notes/xxx.md'
@@ -264,9 +281,8 @@ class MaersJanitor:
 
                             if db_ref_path not in self.used_files:
                                 try:
-                                    os.remove(full_path)
-                                    self.log(f"已删除孤立文档: {db_ref_path}")
-                                    self.deleted_files_count += 1
+                                    self.remove_file(rel_path)
+                                    self.log(f"{'[dry-run] 将删除' if self.dry_run else '已删除'}孤立文档: {db_ref_path}")
                                 except Exception as e:
                                     self.warn(f"删除文档失败: {db_ref_path} ({e})")
 
@@ -283,14 +299,13 @@ class MaersJanitor:
                 ghosts = []
                 for row in cursor.fetchall():
                     pid, path = row[0], row[1]
-                    if not os.path.exists(os.path.join(config.PROJECT_ROOT, path.replace('/', os.sep))):
+                    if not self.fs.exists(path):
                         ghosts.append(pid)
-                
-                for gid in ghosts:
-                    cursor.execute("DELETE FROM photos WHERE id=?", (gid,))
-                    self.db_fixes_count += 1
-                
-                conn.commit()
+
+                self.db_fixes_count += len(ghosts)
+                if not self.dry_run:
+                    cursor.executemany("DELETE FROM photos WHERE id=?", [(gid,) for gid in ghosts])
+                    conn.commit()
                 conn.close()
             except Exception as e:
                 self.warn(f"修复 gallery.db 出错: {e}")
@@ -304,48 +319,72 @@ class MaersJanitor:
                 ghosts = []
                 for row in cursor.fetchall():
                     nid, cover = row[0], row[1]
-                    if not os.path.exists(os.path.join(config.PROJECT_ROOT, cover.replace('/', os.sep))):
+                    if not self.fs.exists(cover):
                         ghosts.append(nid)
-                
-                for nid in ghosts:
-                    cursor.execute("UPDATE nodes SET coverImage = NULL WHERE id=?", (nid,))
-                    self.db_fixes_count += 1
+
+                self.db_fixes_count += len(ghosts)
+                if not self.dry_run:
+                    cursor.executemany("UPDATE nodes SET coverImage = NULL WHERE id=?", [(nid,) for nid in ghosts])
                 
                 # 新增: 检查 MD 文件
                 cursor.execute("SELECT id, content FROM nodes WHERE content LIKE '%.md'")
                 missing_docs = []
                 for row in cursor.fetchall():
                     nid, rel_path = row[0], row[1]
-                    abs_path = os.path.join(config.DATA_DIR, rel_path.replace('/', os.sep))
-                    if not os.path.exists(abs_path):
+                    if not self.fs.exists(f"{to_rel_path(config.DATA_DIR)}/{rel_path}"):
                         missing_docs.append(nid)
                 
-                for nid in missing_docs:
-                    cursor.execute("UPDATE nodes SET content = '' WHERE id=?", (nid,))
-                    self.db_fixes_count += 1
-                
-                conn.commit()
+                self.db_fixes_count += len(missing_docs)
+                if not self.dry_run:
+                    cursor.executemany("UPDATE nodes SET content = '' WHERE id=?", [(nid,) for nid in missing_docs])
+                    conn.commit()
                 conn.close()
             except Exception as e:
                 self.warn(f"修复 cms.db 出错: {e}")
 
+    def prune_blobs(self):
+        """删除内容寻址存储中已无 gallery.db 记录引用的 blob"""
+        if not os.path.exists(config.GALLERY_DB):
+            return
+        try:
+            conn = sqlite3.connect(config.GALLERY_DB)
+            known = {r[0] for r in conn.execute("SELECT DISTINCT hash FROM photos WHERE hash IS NOT NULL")}
+            conn.close()
+        except Exception as e:
+            self.warn(f"读取 gallery.db 出错: {e}")
+            return
+
+        for rel_path, file_hash in blob_store.iter_blobs(config.PROJECT_ROOT):
+            if file_hash not in known:
+                try:
+                    self.remove_file(rel_path)
+                    self.log(f"{'[dry-run] 将删除' if self.dry_run else '已删除'}无引用 blob: {rel_path}")
+                except Exception as e:
+                    self.warn(f"删除 blob 失败: {rel_path} ({e})")
+
     def remove_empty_dirs(self):
         """删除空的分类目录"""
         image_dirs = ['images', 'thumbnails', 'previews']
+        photos_rel = to_rel_path(config.PHOTOS_ROOT)
         for sub in image_dirs:
             base = os.path.join(config.PHOTOS_ROOT, sub)
-            if not os.path.exists(base): continue
-            
-            for folder in os.listdir(base):
+            if not self.fs.isdir(f"{photos_rel}/{sub}"): continue
+
+            for folder in self.fs.listdir(f"{photos_rel}/{sub}"):
                 if folder in ['_notes', '_games', '_literature', '_record', 'default', '_videos', 'videocovers']:
                     continue
-                
+
                 folder_path = os.path.join(base, folder)
-                if not os.path.isdir(folder_path): continue
-                
-                if not os.listdir(folder_path):
+                folder_rel = f"{photos_rel}/{sub}/{folder}"
+                if not self.fs.isdir(folder_rel): continue
+
+                if not self.fs.listdir(folder_rel):
+                    if self.dry_run:
+                        self.log(f"[dry-run] 将移除空目录: {to_rel_path(folder_path)}")
+                        continue
                     try:
                         os.rmdir(folder_path)
+                        self.fs.discard(folder_rel)
                         self.log(f"移除了空目录: {to_rel_path(folder_path)}")
                     except:
                         pass
@@ -353,27 +392,55 @@ class MaersJanitor:
     def run(self):
         print("========================================")
         print("        扫 MAERS 全量垃圾清理工具")
+        if self.dry_run:
+            print("        [dry-run] 仅统计，不做任何修改")
         print("========================================")
-        
-        self.collect_from_cms()
-        self.collect_from_gallery()
-        self.collect_from_music()
-        self.collect_from_space()
+
+        with self.phase("collect:cms"):
+            self.collect_from_cms()
+        with self.phase("collect:gallery"):
+            self.collect_from_gallery()
+        with self.phase("collect:music"):
+            self.collect_from_music()
+        with self.phase("collect:space"):
+            self.collect_from_space()
         # self.collect_from_games() # Removed: now covered by gallery/cms scanner
-        
+
         total_refs = len(self.used_files)
         self.success(f"白名单构建完成，共计引用 {total_refs} 个有效路径")
-        
-        self.clean_physical_files()
-        self.sanitize_databases()
-        self.remove_empty_dirs()
-        
+
+        with self.phase("clean:files"):
+            self.clean_physical_files()
+        with self.phase("sanitize:db"):
+            self.sanitize_databases()
+        with self.phase("clean:blobs"):
+            self.prune_blobs()
+        with self.phase("clean:dirs"):
+            self.remove_empty_dirs()
+
+        print("----------------------------------------")
+        for name, seconds in self.phase_times:
+            self.log(f"{name:<16} {seconds * 1000:8.1f} ms")
+        self.log(self.fs.report())
+        self.fs.save_manifest()
         print("----------------------------------------")
-        self.success(f"清理完成！")
-        self.success(f"物理文件删除数量: {self.deleted_files_count}")
-        self.success(f"数据库记录修正数: {self.db_fixes_count}")
+        if self.dry_run:
+            self.success(f"[dry-run] 可删除文件数量: {self.deleted_files_count}")
+            self.success(f"[dry-run] 可回收空间: {format_bytes(self.reclaimable_bytes)}")
+            self.success(f"[dry-run] 待修正数据库记录: {self.db_fixes_count}")
+        else:
+            self.success(f"清理完成！")
+            self.success(f"物理文件删除数量: {self.deleted_files_count} ({format_bytes(self.reclaimable_bytes)})")
+            self.success(f"数据库记录修正数: {self.db_fixes_count}")
         print("========================================")
 
 if __name__ == '__main__':
-    janitor = MaersJanitor()
+    parser = argparse.ArgumentParser(description="MAERS 全量垃圾数据清理")
+    parser.add_argument('--dry-run', action='store_true', help="只统计可删除文件与可回收空间，不做任何修改")
+    parser.add_argument('--full', action='store_true', help="忽略引用索引中的文件状态，重新扫描全部 MD")
+    parser.add_argument('--workers', type=int, default=None, help="MD 扫描进程数 (默认 CPU 核数)")
+    parser.add_argument('--manifest', action='store_true', help="复用上次的目录清单 (按目录 mtime 校验，适合网络挂载)")
+    args = parser.parse_args()
+
+    janitor = MaersJanitor(dry_run=args.dry_run, full_scan=args.full, workers=args.workers, use_manifest=args.manifest)
     janitor.run()
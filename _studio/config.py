@@ -16,3 +16,6 @@ CMS_DB      = os.path.join(DATA_DIR, 'cms.db')
 GALLERY_DB  = os.path.join(DATA_DIR, 'gallery.db')
 MUSIC_DATA  = os.path.join(DATA_DIR, 'music-data.json')
 SPACE_DATA  = os.path.join(DATA_DIR, 'space-tree.json')
+
+# 本地缓存 (不随站点发布) (Local caches, not published)
+CACHE_DIR   = os.path.join(BASE_DIR, 'cache')
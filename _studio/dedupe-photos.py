@@ -0,0 +1,39 @@
+import argparse
+import os
+import sys
+import sqlite3
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from services import blob_store
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size} B" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def main():
+    parser = argparse.ArgumentParser(description="MAERS 图片去重 (存量图片收入内容寻址存储，重复文件改为硬链接)")
+    parser.add_argument('--dry-run', action='store_true', help="只统计可节省的空间，不做任何修改")
+    args = parser.parse_args()
+
+    print("========================================")
+    print("        MAERS 图片去重")
+    if args.dry_run:
+        print("        [dry-run] 仅统计，不做任何修改")
+    print("========================================")
+    conn = sqlite3.connect(config.GALLERY_DB)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("SELECT hash, path, thumb, preview FROM photos WHERE hash IS NOT NULL ORDER BY created_at").fetchall()
+    conn.close()
+
+    summary = blob_store.dedupe(rows, root=config.PROJECT_ROOT, dry_run=args.dry_run)
+    prefix = "[dry-run] " if args.dry_run else ""
+    print(f"[+] {prefix}收入存储: {summary['adopted']} 个文件")
+    print(f"[+] {prefix}重复文件改为硬链接: {summary['linked']} 个 (节省 {format_bytes(summary['saved_bytes'])})")
+
+if __name__ == '__main__':
+    main()
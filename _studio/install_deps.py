@@ -6,6 +6,7 @@ MAERS 项目 - 所需第三方库安装脚本
 
   1. Pillow          —— 图片处理（缩略图、WebP 生成、EXIF 读取）
   2. pillow-avif-plugin  —— Pillow 的 AVIF 格式支持插件（用于转换为 .avif 格式）
+  3. Markdown        —— 笔记正文服务端预渲染（可选，缺失时跳过预渲染）
 
 其余均为 Python 内置标准库，无需安装。
 """
@@ -17,6 +18,7 @@ import importlib.util
 PACKAGES = [
     ("Pillow",             "PIL"),
     ("pillow-avif-plugin", "pillow_avif"),
+    ("Markdown",           "markdown"),
 ]
 
 def is_installed(import_name):
@@ -0,0 +1,21 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import space_icons
+
+def main():
+    parser = argparse.ArgumentParser(description="MAERS Space 图标镜像工具 (远程图标 → 本地 WebP)")
+    parser.add_argument('--sprites', action='store_true', help="同时为每个文件夹生成雪碧图及 CSS/JSON 索引")
+    parser.add_argument('--workers', type=int, default=space_icons.MAX_WORKERS, help="并发下载数")
+    args = parser.parse_args()
+
+    print("========================================")
+    print("        MAERS Space 图标镜像")
+    print("========================================")
+    space_icons.mirror_icons(build_sprites=args.sprites, max_workers=args.workers)
+
+if __name__ == '__main__':
+    main()
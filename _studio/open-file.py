@@ -1,36 +1,24 @@
 
 import os
 import sys
-import subprocess
+import time
 
-def get_project_root():
-    """
-    Assumes this script is in `_studio`, so project root is one level up.
-    """
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    return os.path.dirname(current_dir)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import file_index
 
-def index_files(root_path):
+def load_index():
     """
-    Walks the directory tree and returns a list of (filename, full_path).
-    Skips common ignore directories like .git, node_modules, etc.
+    加载持久化索引 (_studio/cache/file-index.json)，仅重新列举 mtime 变化的目录。
     """
-    file_list = []
-    ignore_dirs = {'.git', 'node_modules', '__pycache__', 'venv', '.idea', '.vscode', 'photos', 'data', 'ui', '说明', 'plugins'}
-    
-    print(f"正在索引文件: {root_path} ...")
-    print(f"已忽略目录: {', '.join(sorted(ignore_dirs))}")
-    
-    for root, dirs, files in os.walk(root_path):
-        # Filter out ignored directories
-        dirs[:] = [d for d in dirs if d not in ignore_dirs]
-        
-        for file in files:
-            full_path = os.path.join(root, file)
-            file_list.append((file, full_path, os.path.relpath(full_path, root_path)))
-            
-    print(f"索引完成，共找到 {len(file_list)} 个文件。")
-    return file_list
+    start = time.perf_counter()
+    index = file_index.FileIndex().load()
+    stats = index.refresh()
+
+    print(f"已忽略目录: {', '.join(sorted(index.ignore_dirs))}")
+    print(f"索引就绪，共 {stats['files']} 个文件 "
+          f"(检查 {stats['dirs']} 个目录，重新列举 {stats['rescanned']} 个，{(time.perf_counter() - start) * 1000:.0f} ms)")
+    return index
 
 def open_file(path):
     """
@@ -43,10 +31,9 @@ def open_file(path):
         print(f"❌ 无法打开文件: {e}")
 
 def main():
-    root_path = get_project_root()
-    all_files = index_files(root_path)
+    index = load_index()
     
-    print("\n💡 输入文件名（或部分）进行搜索。输入 'q' 或 'exit' 退出。")
+    print("\n💡 输入文件名（或部分，支持跳字模糊匹配，如 cmsnd → cms_nodes.py）进行搜索。输入 'q' 或 'exit' 退出。")
     print("--------------------------------------------------")
 
     while True:
@@ -62,37 +49,32 @@ def main():
         if query.lower() in ('q', 'exit'):
             break
             
-        # Search logic: simple substring match, case-insensitive
-        matches = []
-        for name, full_path, rel_path in all_files:
-            if query.lower() in name.lower():
-                matches.append((name, full_path, rel_path))
+        # 每次查询前增量刷新 (未变化时只做目录 stat)
+        index.refresh_if_stale()
+        display_limit = 20
+        start = time.perf_counter()
+        matches = index.search(query, limit=display_limit)
+        elapsed = (time.perf_counter() - start) * 1000
         
         if len(matches) == 0:
             print("❌ 未找到匹配文件。")
-        elif len(matches) == 1:
-            # Exact match found
+        elif len(matches) == 1 or (matches[0]['tier'] == file_index.TIER_EXACT and matches[1]['tier'] != file_index.TIER_EXACT):
+            # 唯一结果或唯一的完全匹配
             target = matches[0]
-            print(f"🎯 找到: {target[2]}")
-            open_file(target[1])
+            print(f"🎯 找到: {target['path']}")
+            open_file(os.path.join(index.root, target['path']))
         else:
-            # Multiple matches
-            print(f"found {len(matches)} matches:")
-            
-            # Limit display to 10
-            display_limit = 20
-            for i, (name, _, rel_path) in enumerate(matches[:display_limit]):
-                print(f" [{i+1}] {rel_path}")
-            
-            if len(matches) > display_limit:
-                print(f" ... (还有 {len(matches) - display_limit} 个结果)")
+            # Multiple matches (已按匹配程度排序)
+            print(f"found {len(matches)} matches ({elapsed:.1f} ms):")
+            for i, match in enumerate(matches):
+                print(f" [{i+1}] {match['path']}")
                 
-            choice = input(f"输入序号打开 (1-{min(len(matches), display_limit)})，或回车取消: ").strip()
+            choice = input(f"输入序号打开 (1-{len(matches)})，或回车取消: ").strip()
             
             if choice.isdigit():
                 idx = int(choice) - 1
                 if 0 <= idx < len(matches):
-                    open_file(matches[idx][1])
+                    open_file(os.path.join(index.root, matches[idx]['path']))
                 else:
                     print("无效序号。")
 
@@ -0,0 +1,36 @@
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import module_graph
+
+def main():
+    parser = argparse.ArgumentParser(description="MAERS 模块预加载生成 (为页面写入完整模块图的 modulepreload 列表)")
+    parser.add_argument('pages', nargs='*', help="仅处理指定页面 (默认项目根目录下全部 *.html)")
+    parser.add_argument('--check', action='store_true', help="只检查是否需要更新，需要时退出码为 1 (不写入)")
+    args = parser.parse_args()
+
+    print("========================================")
+    print("        MAERS 模块预加载生成")
+    print("========================================")
+    report = module_graph.update_pages(pages=args.pages or None, write=not args.check)
+
+    for item in report:
+        if not item['modules'] and not item['changed']:
+            continue
+        mark = '*' if item['changed'] else ' '
+        print(f"[{mark}] {item['page']:<22} 模块 {len(item['modules']):>3} 个   发现轮次 {item['depth']} → 1")
+
+    changed = [item['page'] for item in report if item['changed']]
+    if not changed:
+        print("[+] 全部页面已是最新")
+    elif args.check:
+        print(f"[!] {len(changed)} 个页面需要更新 (运行 preload-modules.py 写入)")
+        sys.exit(1)
+    else:
+        print(f"[+] 已更新 {len(changed)} 个页面")
+
+if __name__ == '__main__':
+    main()
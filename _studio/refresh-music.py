@@ -0,0 +1,21 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import music
+
+def main():
+    parser = argparse.ArgumentParser(description="MAERS 音乐库 B站元数据批量刷新")
+    parser.add_argument('--force', action='store_true', help="忽略缓存，全部重新请求")
+    parser.add_argument('--workers', type=int, default=music.REFRESH_WORKERS, help="并发请求数")
+    args = parser.parse_args()
+
+    print("========================================")
+    print("        MAERS 音乐元数据刷新")
+    print("========================================")
+    music.refresh_library(force=args.force, max_workers=args.workers)
+
+if __name__ == '__main__':
+    main()
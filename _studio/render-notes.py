@@ -0,0 +1,21 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from services import cms_render
+
+def main():
+    parser = argparse.ArgumentParser(description="MAERS Markdown 预渲染工具 (全量重建 HTML 产物)")
+    parser.add_argument('--workers', type=int, default=None, help="并行进程数 (默认 CPU 核心数)")
+    args = parser.parse_args()
+
+    print("========================================")
+    print("        MAERS Markdown 预渲染")
+    print("========================================")
+    cms_render.rebuild_all(config.CMS_DB, config.DATA_DIR, workers=args.workers)
+
+if __name__ == '__main__':
+    main()
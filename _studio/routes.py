@@ -1,12 +1,42 @@
 import os
+import sys
 import urllib.parse
 import json
+import importlib.util
 
 # Services
-from services import cms, photos, music, album, space, music_api
+from services import metrics, profiling, log
 
 import config
 
+def _lazy(name):
+    """延迟导入服务模块：首次访问其属性时才真正执行模块代码 (缩短服务器启动时间)"""
+    fullname = f"services.{name}"
+    if fullname in sys.modules:
+        return sys.modules[fullname]
+    spec = importlib.util.find_spec(fullname)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[fullname] = module
+    setattr(sys.modules['services'], name, module)
+    loader.exec_module(module)
+    return module
+
+cms = _lazy('cms')
+photos = _lazy('photos')
+music = _lazy('music')
+album = _lazy('album')
+space = _lazy('space')
+music_api = _lazy('music_api')
+space_icons = _lazy('space_icons')
+file_index = _lazy('file_index')
+module_graph = _lazy('module_graph')
+image_variants = _lazy('image_variants')
+photo_query = _lazy('photo_query')
+
+logger = log.get_logger('PAGE')
+
 PAGE_TEMPLATE = """<!DOCTYPE html>
 <html lang="zh-CN" class="fixed-layout-page">
 <head>
@@ -42,7 +72,7 @@ PAGE_TEMPLATE = """<!DOCTYPE html>
 </body>
 </html>"""
 
-def dispatch_get(path, query_params):
+def dispatch_get(path, query_params, headers=None):
     parsed_path = path
 
     # 0. CMS Tags (Special Case)
@@ -52,7 +82,7 @@ def dispatch_get(path, query_params):
     
     # 1. CMS
     if parsed_path.startswith('/api/cms/'):
-        return cms.handle_request(parsed_path, 'GET', query_params, None)
+        return cms.handle_request(parsed_path, 'GET', query_params, None, headers)
     
     # 2. General Modules
     if parsed_path == '/api/modules' or parsed_path == '/api/save_modules':
@@ -62,13 +92,14 @@ def dispatch_get(path, query_params):
     # 3. Bilibili
     if parsed_path == '/api/get_bili_info':
         bvid = query_params.get('bvid', [None])[0]
-        return music_api.get_video_info(bvid)
+        force = query_params.get('force', [''])[0] == '1'
+        return music_api.get_video_info(bvid, force=force)
 
     
     
     # 4. Music - 获取音乐数据 API
     if parsed_path == '/api/music_data':
-        data = cms.load_json('data/music-data.json', 'data/music-data.js')
+        data = music.load_music_data()
         if data is not None:
             return 200, data
         return 404, {"error": "Music data not found"}
@@ -83,6 +114,35 @@ def dispatch_get(path, query_params):
         data = space.load_collections()
         return 200, data
 
+    # 6. 项目文件模糊搜索 (与 open-file.py 共用索引)
+    if parsed_path == '/api/files/search':
+        query = query_params.get('q', [''])[0]
+        try:
+            limit = min(max(int(query_params.get('limit', [file_index.DEFAULT_LIMIT])[0]), 1), 200)
+        except ValueError:
+            return 400, {"error": "Invalid limit"}
+        return 200, {"query": query, "results": file_index.search(query, limit)}
+
+    # 6.1 相册分页查询 (游标分页 + 标签 / 拍摄时间过滤)
+    if parsed_path == '/api/photos/query':
+        return photo_query.handle_query(query_params)
+
+    # 7. 请求指标 (?format=prometheus 输出文本格式)
+    if parsed_path == '/api/_metrics':
+        if query_params.get('format', [''])[0] == 'prometheus':
+            return 200, metrics.render_prometheus(), {'Content-Type': metrics.PROMETHEUS_CONTENT_TYPE}
+        return 200, metrics.snapshot()
+
+    # 8. 请求剖析结果 (?name= 返回折叠栈文本，可直接用于火焰图)
+    if parsed_path == '/api/_profiles':
+        name = query_params.get('name', [None])[0]
+        if not name:
+            return 200, {"profiles": profiling.list_profiles()}
+        text = profiling.read_folded(name)
+        if text is None:
+            return 404, {"error": "Profile not found"}
+        return 200, text, {'Content-Type': 'text/plain; charset=utf-8'}
+
     return 404, None  # 返回 None 让 SimpleHTTPRequestHandler 处理静态文件
 
 def dispatch_post(path, query_params, body_data, file_data=None):
@@ -186,12 +246,32 @@ def dispatch_post(path, query_params, body_data, file_data=None):
         return 200, {}
     
     if path == '/api/delete_track':
-        music.delete_track(body_data)
-        return 200, {}
+        try:
+            return 200, music.delete_track(body_data)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except (IndexError, KeyError) as e:
+            return 404, {"error": str(e)}
 
     if path == '/api/reset_tracks':
-        music.reset_tracks(body_data)
-        return 200, {}
+        try:
+            return 200, music.reset_tracks(body_data)
+        except (IndexError, KeyError) as e:
+            return 404, {"error": str(e)}
+
+    if path == '/api/music/patch':
+        try:
+            return 200, music.apply_patch(body_data.get('ops', []))
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except KeyError as e:
+            return 404, {"error": str(e)}
+
+    if path == '/api/music/refresh_bili':
+        try:
+            return 200, music.refresh_library(force=bool(body_data.get('force')))
+        except Exception as e:
+            return 500, {"error": str(e)}
 
     # 4. Modules & Albums (Categories)
     if path == '/api/save_modules':
@@ -222,7 +302,9 @@ def dispatch_post(path, query_params, body_data, file_data=None):
         try:
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write(PAGE_TEMPLATE.format(title=title))
-            print(f"  [ PAGE ] ✨ 页面自动创建 | New page created: {filename}")
+            # 新页面同样写入完整模块图的 modulepreload 列表
+            module_graph.update_pages(os.getcwd(), pages=[filename])
+            logger.info(f"✨ 页面自动创建 | New page created: {filename}")
             return 200, {"status": "created", "message": f"Created new page: {filename}"}
         except Exception as e:
             return 500, {"error": str(e)}
@@ -238,7 +320,7 @@ def dispatch_post(path, query_params, body_data, file_data=None):
         if os.path.exists(file_path):
             try:
                 os.remove(file_path)
-                print(f"  [ PAGE ] 🗑️  页面物理删除 | Physical page deleted: {filename}")
+                logger.info(f"🗑️  页面物理删除 | Physical page deleted: {filename}")
                 return 200, {"status": "deleted", "message": f"Deleted page: {filename}"}
             except Exception as e:
                 return 500, {"error": str(e)}
@@ -253,7 +335,7 @@ def dispatch_post(path, query_params, body_data, file_data=None):
     # 6. Space Management APIs
     if path == '/api/space/fetch_meta':
         url = body_data.get('url')
-        if not url:
+        if not isinstance(url, str) or not url.strip():
             return 400, {"error": "URL is required"}
         try:
             meta = space.fetch_url_metadata(url)
@@ -261,6 +343,27 @@ def dispatch_post(path, query_params, body_data, file_data=None):
         except Exception as e:
             return 500, {"error": str(e)}
     
+    if path == '/api/space/fetch_meta_batch':
+        urls = body_data.get('urls')
+        if not isinstance(urls, list) or not urls:
+            return 400, {"error": "urls must be a non-empty list"}
+        if len(urls) > 500:
+            return 400, {"error": "Too many urls (max 500)"}
+        try:
+            results = space.fetch_url_metadata_batch(urls, force=bool(body_data.get('force')))
+            return 200, {"results": results}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+    if path == '/api/space/mirror_icons':
+        try:
+            result = space_icons.mirror_icons(build_sprites=bool(body_data.get('sprites')))
+            return (200 if result.get('success') else 500), result
+        except Exception as e:
+            return 500, {"error": str(e)}
+
     if path == '/api/space/add':
         try:
             space.add_collection(body_data)
@@ -305,14 +408,10 @@ def dispatch_post(path, query_params, body_data, file_data=None):
 
     # 6.5 Space Tree Save (New)
     if path == '/api/space/save_tree':
-        # Direct file write to space-tree.json
-        try:
-            space_tree_path = os.path.join(config.DATA_DIR, 'space-tree.json')
-            cms.save_json(space_tree_path, body_data)
+        # 经常驻模型写入 space-tree.json (同时刷新索引)
+        if space.save_tree(body_data):
             return 200, {"status": "success", "message": "Space tree saved"}
-        except Exception as e:
-            print(f"Error saving space tree: {e}")
-            return 500, {"error": str(e)}
+        return 500, {"error": "Failed to save space tree"}
 
     # 6.6 Space Tag Update (Granular)
     if path == '/api/space/update_tags':
@@ -1,10 +1,15 @@
+import time
+_BOOT_START = time.perf_counter()  # 启动分阶段计时的起点 (在其余导入之前)
+
 import http.server
 import socketserver
 import os
 import json
 import urllib.parse
 import sys
+import threading
 import routes
+from services import metrics, profiling, log
 
 # ================= 1. 根目录锚定逻辑 =================
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -14,36 +19,112 @@ sys.path.append(project_root)
 
 # ================= 2. 配置 =================
 PORT = 8000
+logger = log.get_logger('SERVER')
 
 # ================= 3. 请求处理 =================
 
+class _CountingWriter:
+    """包装 wfile，累计写出字节数 (响应头 + 正文)"""
+    def __init__(self, raw):
+        self.raw = raw
+        self.written = 0
+
+    def write(self, data):
+        self.written += len(data)
+        return self.raw.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
 class Handler(http.server.SimpleHTTPRequestHandler):
 
+    def setup(self):
+        super().setup()
+        self.wfile = _CountingWriter(self.wfile)
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def _begin_metrics(self):
+        metrics.begin()
+        self._status = None
+        self._route = None
+        self._written_start = self.wfile.written
+
+    def _finish_metrics(self, method):
+        route = self._route or urllib.parse.urlparse(self.path).path.rstrip('/') or '/'
+        try:
+            bytes_in = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            bytes_in = 0
+        metrics.finish(f"{method} {route}", self._status or 0, bytes_in,
+                       self.wfile.written - self._written_start)
+
     def end_headers(self):
         self.send_header('Access-Control-Allow-Origin', '*')
-        # 🔥 Disable Caching
-        self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate, max-age=0')
-        self.send_header('Pragma', 'no-cache')
-        self.send_header('Expires', '0')
+        extra_headers = getattr(self, '_extra_headers', None) or {}
+        for key, value in extra_headers.items():
+            self.send_header(key, value)
+        # 🔥 Disable Caching (路由显式声明缓存策略时除外，如 ETag 协商)
+        if 'Cache-Control' not in extra_headers:
+            self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate, max-age=0')
+            self.send_header('Pragma', 'no-cache')
+            self.send_header('Expires', '0')
         super().end_headers()
 
+    def _dispatch(self, method, handler):
+        self._begin_metrics()
+        parsed = urllib.parse.urlparse(self.path)
+        # 该请求线程内的日志记录自动带上 route 字段
+        token = log.set_route(f"{method} {parsed.path}")
+        try:
+            # 按需剖析 (X-Maers-Profile: 1 或 ?_profile=1)
+            if profiling.requested(urllib.parse.parse_qs(parsed.query), self.headers):
+                profiling.profile(f"{method} {parsed.path}", handler)
+            else:
+                handler()
+        finally:
+            self._finish_metrics(method)
+            log.reset_route(token)
+
     def do_GET(self):
+        self._dispatch('GET', self._handle_get)
+
+    def do_POST(self):
+        self._dispatch('POST', self._handle_post)
+
+    def _handle_get(self):
         parsed = urllib.parse.urlparse(self.path)
         query = urllib.parse.parse_qs(parsed.query)
 
-        # 委托给 Dispatcher
-        code, data = routes.dispatch_get(parsed.path, query)
+        # 委托给 Dispatcher (可选第三项为附加响应头)
+        code, data, *extra = routes.dispatch_get(parsed.path, query, self.headers)
+        headers = extra[0] if extra else None
+        
+        if code == 304:
+            self._send_not_modified(headers)
+            return
         
         if code != 404 or (data is not None):
             # 注意: 404 有时候也是 API 返回的明确错误，带有 error msg
             # 如果 data 是 None，才说明 API 没接管，交给 super() 查静态文件
             if data is not None:
-                self._send_json(code, data)
+                self._send_json(code, data, headers)
                 return
 
+        # 静态文件统一归为一个路由，避免统计随文件路径膨胀
+        self._route = metrics.STATIC_ROUTE
+
+        # 缩略图 / 预览图按 Accept 协商编码 (缺失的编码按需生成)
+        if routes.image_variants.is_variant_path(parsed.path):
+            variant = routes.image_variants.negotiate(parsed.path, self.headers.get('Accept'))
+            if variant:
+                self._send_file(*variant, headers={'Vary': 'Accept'})
+                return
         super().do_GET()
 
-    def do_POST(self):
+    def _handle_post(self):
         parsed = urllib.parse.urlparse(self.path)
         query = urllib.parse.parse_qs(parsed.query)
         
@@ -67,29 +148,88 @@ class Handler(http.server.SimpleHTTPRequestHandler):
             self._send_json(code, data)
             
         except Exception as e:
-            print(f"❌ Error: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"❌ Error: {e}")
             self.send_error(500, str(e))
 
     # --- 辅助方法 ---
 
-    def _send_json(self, code, data):
+    def _send_json(self, code, data, headers=None):
+        self._extra_headers = headers
         self.send_response(code)
+        # 路由显式声明 Content-Type 时 (如 Prometheus 文本) 原样输出字符串
+        if headers and 'Content-Type' in headers and isinstance(data, str):
+            self.end_headers()
+            self.wfile.write(data.encode('utf-8'))
+            return
         self.send_header('Content-type', 'application/json')
         self.end_headers()
         self.wfile.write(json.dumps(data).encode('utf-8'))
 
-if __name__ == '__main__':
-    socketserver.TCPServer.allow_reuse_address = True
-    print(f"🚀 服务器已启动: http://localhost:{PORT}")
-    
-    # Init Data Sync
+    def _send_file(self, path, content_type, headers=None):
+        with open(path, 'rb') as f:
+            content = f.read()
+        self._extra_headers = headers
+        self.send_response(200)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _send_not_modified(self, headers=None):
+        self._extra_headers = headers
+        self.send_response(304)
+        self.end_headers()
+
+class _StartupTimer:
+    """记录启动各阶段耗时 (毫秒)"""
+    def __init__(self, start):
+        self.phases = []
+        self._last = start
+        self._start = start
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, (now - self._last) * 1000))
+        self._last = now
+
+    def total(self):
+        return (self._last - self._start) * 1000
+
+    def summary(self):
+        return ', '.join(f"{name} {ms:.0f}ms" for name, ms in self.phases)
+
+def _deferred_startup():
+    """端口绑定后于后台执行：图库 JSON 过期检查与资源回收线程 (photos / asset_gc 依赖较重，导入不计入启动耗时)"""
+    start = time.perf_counter()
+    # 图库 JSON 仅在 gallery.db 更新过时于后台同步
     try:
-        print("🔄 [Server] Syncing Gallery Data...")
-        routes.photos.sync_gallery_js()
+        routes.photos.start_background_sync()
     except Exception as e:
-        print(f"⚠️ [Server] Init Sync Failed: {e}")
-        
-    try: httpd = socketserver.TCPServer(("", PORT), Handler); httpd.serve_forever()
+        logger.warning(f"⚠️  Init Sync Failed: {e}")
+
+    # 引用计数归零的资源由后台线程低频回收
+    try:
+        from services import asset_gc
+        asset_gc.start_collector()
+    except Exception as e:
+        logger.warning(f"⚠️  Asset collector failed to start: {e}")
+    logger.info("⏱️  后台初始化完成 | Deferred startup done", ms=round((time.perf_counter() - start) * 1000, 1))
+
+if __name__ == '__main__':
+    timer = _StartupTimer(_BOOT_START)
+    timer.mark('imports')
+
+    # 先绑定端口，服务模块在首次请求时才加载 (routes 延迟导入)
+    socketserver.TCPServer.allow_reuse_address = True
+    httpd = socketserver.TCPServer(("", PORT), Handler)
+    timer.mark('bind')
+
+    threading.Thread(target=_deferred_startup, name='deferred-startup', daemon=True).start()
+    timer.mark('deferred')
+
+    print(f"🚀 服务器已启动: http://localhost:{PORT} ({timer.total():.0f}ms)")
+    logger.info(f"⏱️  启动耗时 | Startup phases: {timer.summary()}", ms=round(timer.total(), 1),
+                phases={name: round(ms, 1) for name, ms in timer.phases})
+
+    try: httpd.serve_forever()
     except KeyboardInterrupt: pass
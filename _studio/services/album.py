@@ -9,6 +9,10 @@ from . import cms
 import config
 import shutil # Import shutil at top level
 
+from . import log
+
+logger = log.get_logger('ALBUM')
+
 def ensure_category_resources(category_id):
     """确保分类关联的物理目录和标签文件存在"""
     if not category_id:
@@ -27,7 +31,7 @@ def ensure_category_resources(category_id):
             if not os.path.exists(target_dir):
                 os.makedirs(target_dir, exist_ok=True)
                 dirs_created = True
-                print(f"  [ ALBUM ] 📂 创建目录 | Created: {target_dir}")
+                logger.info(f"📂 创建目录 | Created: {target_dir}")
             else:
                 exists_count += 1
         if exists_count > 0:
@@ -47,19 +51,19 @@ def ensure_category_resources(category_id):
             
             if os.path.exists(base_tag_file):
                 shutil.copy2(base_tag_file, target_tag_file)
-                print(f"  [ ALBUM ] 🏷️  从模板创建标签 | Created from template: {target_tag_file}")
+                logger.info(f"🏷️  从模板创建标签 | Created from template: {target_tag_file}")
                 tag_file_created = True
             else:
                 with open(target_tag_file, 'w', encoding='utf-8') as f:
                     f.write('[]')
-                print(f"  [ ALBUM ] 🏷️  创建空标签文件 | Created empty tag file: {target_tag_file}")
+                logger.info(f"🏷️  创建空标签文件 | Created empty tag file: {target_tag_file}")
                 tag_file_created = True
         else:
             tag_file_existed = True
-            print(f"  [ ALBUM ] 🏷️  标签文件已存在 | Tag file exists: {target_tag_file}")
+            logger.info(f"🏷️  标签文件已存在 | Tag file exists: {target_tag_file}")
 
     except Exception as e:
-        print(f"  [ ALBUM ] ⚠️ 资源初始化异常 | Resource init error: {e}")
+        logger.warning(f"⚠️ 资源初始化异常 | Resource init error: {e}")
 
     return {
         "dirs_created": dirs_created,
@@ -74,7 +78,7 @@ def handle_ops(path, body):
     changed = False
     
     if path == '/api/reorder_category':
-        print(f"  [ ALBUM ] 📂 分类排序中 | Reordering categories...")
+        logger.info(f"📂 分类排序中 | Reordering categories...")
         old_map = {x['id']:x for x in conf}
         # body 是 id 列表
         new_conf = []
@@ -102,7 +106,7 @@ def handle_ops(path, body):
         if not any(c['id'] == new_id for c in conf): 
             conf.append(body)
             changed = True
-            print(f"  [ ALBUM ] 📝 已写入配置 | Added to album-config.json: {new_id}")
+            logger.info(f"📝 已写入配置 | Added to album-config.json: {new_id}")
             
         if changed:
             cms.save_json(config.ALBUM_CONFIG_JSON, conf)
@@ -113,7 +117,7 @@ def handle_ops(path, body):
         # body 是 {id: '...', delete_physical: bool}
         target_id = body.get('id')
         delete_physical = body.get('delete_physical', False)
-        print(f"  [ ALBUM ] 🗑️  移除分类 | Removing category: {target_id} (物理删除 | Physical: {delete_physical})")
+        logger.info(f"🗑️  移除分类 | Removing category: {target_id} (物理删除 | Physical: {delete_physical})")
         
         initial_len = len(conf)
         conf = [c for c in conf if c['id'] != target_id]
@@ -130,18 +134,18 @@ def handle_ops(path, body):
                         target_dir = os.path.join(config.PROJECT_ROOT, 'photos', sub, target_id)
                         if os.path.exists(target_dir):
                             shutil.rmtree(target_dir)
-                    print(f"  [ ALBUM ] 💥 物理目录已粉碎 | Physical folders purged: {target_id}")
+                    logger.info(f"💥 物理目录已粉碎 | Physical folders purged: {target_id}")
 
                     # 同时删除标签配置文件
                     tags_dir = os.path.join(config.DATA_DIR, 'tags')
                     tag_file = os.path.join(tags_dir, f'photos-{target_id}-tag-categories.json')
                     if os.path.exists(tag_file):
                         os.remove(tag_file)
-                        print(f"  [ ALBUM ] 🗑️  标签配置已清理 | Tag config removed: {os.path.basename(tag_file)}")
+                        logger.info(f"🗑️  标签配置已清理 | Tag config removed: {os.path.basename(tag_file)}")
                         tag_file_deleted = True
                         
                 except Exception as e:
-                    print(f"  [ ALBUM ] ⚠️ 物理粉碎失败 | Physical purge failed: {e}")
+                    logger.warning(f"⚠️ 物理粉碎失败 | Physical purge failed: {e}")
 
             if changed:
                 cms.save_json(config.ALBUM_CONFIG_JSON, conf)
@@ -150,7 +154,7 @@ def handle_ops(path, body):
 
     elif path == '/api/update_category':
         target_id = body.get('id')
-        print(f"  [ ALBUM ] ✎  元数据同步 | Updating metadata: {target_id}")
+        logger.info(f"✎  元数据同步 | Updating metadata: {target_id}")
         
         # 更新时一并确保资源齐全
         res_info = ensure_category_resources(target_id)
@@ -0,0 +1,193 @@
+"""
+MAERS Asset Collector
+基于 ref_index 引用计数的资源回收：
+- 写入路径 (CMS 封面 / 正文、Space 树、音乐数据) 登记与注销引用
+- 引用归零的资源进入 pending 队列，宽限期过后由低优先级后台线程分批回收
+- 相册 (gallery.db) 中非附件分类的图片以相册为准，永不回收
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from . import ref_index
+from . import space_tree
+from . import music_library
+from . import log
+
+logger = log.get_logger('GC')
+
+# ================= 配置 =================
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
+CMS_DB = os.path.join(DATA_DIR, 'cms.db')
+
+# 与 clean-data.py 一致：这些分类视为“附件目录”，无引用即可回收
+ATTACHMENT_CATEGORIES = {'_notes', '_games', '_literature', '_record', 'default', '_videos'}
+# CMS 封面上传分类：原先在换封面 / 删节点时立即删除，现改为引用归零后回收
+COVER_CATEGORIES = {'literaturecovers', 'gamecovers', 'videocovers'}
+RECLAIMABLE_DIRS = ('photos/images/', 'photos/thumbnails/', 'photos/previews/', 'photos/icons/')
+
+GRACE_PERIOD = 10 * 60   # 引用归零后保留时间 (撤销 / 重新插入同一图片时不会误删)
+INTERVAL = 60            # 后台轮询间隔
+BATCH_SIZE = 20          # 每轮最多处理数量
+ITEM_PAUSE = 0.05        # 单项之间让出 CPU / IO
+
+# ================= 引用登记 =================
+
+def track_cover(node_id, cover_path):
+    """CMS 节点封面 (cover_path 为空表示移除)"""
+    index = ref_index.get_index()
+    if cover_path:
+        index.set_refs(f"cover:{node_id}", ref_index.expand_ref(cover_path))
+    else:
+        index.remove_source(f"cover:{node_id}")
+
+def track_text(source, text):
+    """内联在数据库中的非 MD 正文"""
+    ref_index.get_index().set_refs(source, ref_index.extract_refs(text))
+
+def _space_icon_refs(nodes, refs):
+    for node in nodes or []:
+        icon = node.get('icon')
+        if icon and not icon.startswith(('http://', 'https://', '//')):
+            refs |= ref_index.expand_ref(icon)
+        _space_icon_refs(node.get('children'), refs)
+    return refs
+
+def track_space_tree(tree):
+    ref_index.get_index().set_refs('space-tree', _space_icon_refs((tree or {}).get('root'), set()))
+
+def track_music(data):
+    ref_index.get_index().set_refs('music-data', ref_index.extract_refs(json.dumps(data, ensure_ascii=False)))
+
+def _cms_rows():
+    if not os.path.exists(CMS_DB):
+        return []
+    conn = sqlite3.connect(CMS_DB)
+    rows = conn.execute("SELECT id, coverImage, content FROM nodes").fetchall()
+    conn.close()
+    return rows
+
+def _md_sources():
+    sources = {}
+    for _, _, content in _cms_rows():
+        if content and str(content).endswith('.md'):
+            full_path = os.path.join(DATA_DIR, content)
+            if os.path.exists(full_path):
+                sources[content] = full_path
+    return sources
+
+def seed():
+    """
+    从现有数据登记全部引用 (启动时执行一次)。
+    MD 走增量刷新，其余引用方为单次查询 / 内存模型，开销很小。
+    """
+    index = ref_index.get_index()
+    for node_id, cover, content in _cms_rows():
+        if cover:
+            index.set_refs(f"cover:{node_id}", ref_index.expand_ref(cover))
+        if content and not str(content).endswith('.md'):
+            track_text(f"node:{node_id}", content)
+    index.refresh(_md_sources())
+
+    track_space_tree(space_tree.get_model().get_tree())
+    track_music(music_library.get_library().get_data())
+
+# ================= 回收 =================
+
+def _gallery_row(target):
+    from . import photos
+    if not os.path.exists(photos.DB_PATH):
+        return None
+    conn = photos.get_db()
+    row = conn.execute("SELECT * FROM photos WHERE path=? OR thumb=? OR preview=?",
+                       (target, target, target)).fetchone()
+    conn.close()
+    return row
+
+def reclaim(target):
+    """
+    回收单个引用归零的资源，返回处理结果:
+    'referenced' / 'protected' / 'reclaimed' / 'missing'
+    """
+    from . import photos
+
+    index = ref_index.get_index()
+    if not target.startswith(RECLAIMABLE_DIRS):
+        return 'protected'
+
+    row = _gallery_row(target)
+    if row is not None:
+        if row['category'] not in ATTACHMENT_CATEGORIES | COVER_CATEGORIES:
+            return 'protected'
+        # 原图 / 缩略图 / 预览图任一仍被引用则整组保留
+        variants = {row['path'], row['thumb'], row['preview']} - {None, ''}
+        if any(index.refcount(v) for v in variants):
+            return 'referenced'
+        photos.handle_delete({'path': row['path']})
+        return 'reclaimed'
+
+    if any(index.refcount(v) for v in ref_index.expand_ref(target)):
+        return 'referenced'
+    full_path = os.path.join(PROJECT_ROOT, target.replace('/', os.sep))
+    if not os.path.exists(full_path):
+        return 'missing'
+    os.remove(full_path)
+    return 'reclaimed'
+
+def collect_once(grace=GRACE_PERIOD, limit=BATCH_SIZE):
+    index = ref_index.get_index()
+    due = index.due(time.time() - grace, limit)
+    summary = {}
+    if not due:
+        return summary
+
+    # 服务器之外编辑过的 MD (仅 stat，未变化的文件不重读)
+    index.refresh(_md_sources())
+    for target in due:
+        try:
+            status = reclaim(target)
+        except Exception as e:
+            logger.warning(f"⚠️  回收失败 | Reclaim failed: {target} ({e})")
+            continue
+        summary[status] = summary.get(status, 0) + 1
+        if status == 'reclaimed':
+            logger.info(f"🧹 已回收无引用资源 | Reclaimed: {target}")
+        index.discard_pending([target])
+        time.sleep(ITEM_PAUSE)
+    return summary
+
+class AssetCollector(threading.Thread):
+    def __init__(self, interval=INTERVAL):
+        super().__init__(name='maers-asset-gc', daemon=True)
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def run(self):
+        try:
+            seed()
+        except Exception as e:
+            # 引用未登记完整时回收不安全，直接退出
+            logger.error(f"❌ 引用登记失败，后台回收已停用 | Seeding failed, collector disabled: {e}")
+            return
+        while not self.stop_event.wait(self.interval):
+            try:
+                collect_once()
+            except Exception as e:
+                logger.warning(f"⚠️  回收轮次出错 | Collect pass failed: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+
+_collector = None
+
+def start_collector(interval=INTERVAL):
+    global _collector
+    if _collector is None:
+        _collector = AssetCollector(interval)
+        _collector.start()
+    return _collector
@@ -0,0 +1,120 @@
+"""
+MAERS Asset References
+从 HTML / CSS / JS (ESM) 源码中提取对站内静态资源的引用，并解析为相对项目根目录的路径：
+- HTML: src / href 属性，以及内联 <script type="module"> 中的 import
+- CSS: url(...) 与 @import
+- JS: 静态 import / export ... from 与字面量 import('...')
+只处理相对路径 (./ ../ 或同目录文件名) 与站内绝对路径 (/...)；外链、data: URI、模板字符串一律跳过。
+"""
+import re
+import posixpath
+import urllib.parse
+
+HTML_EXTS = {'.html', '.htm'}
+CSS_EXTS = {'.css'}
+JS_EXTS = {'.js', '.mjs'}
+
+_HTML_ATTR_RE = re.compile(r'''\b(?:src|href)\s*=\s*(["'])([^"'<>]+?)\1''', re.I)
+_CSS_URL_RE = re.compile(r'''url\(\s*(["']?)([^"')\s]+)\1\s*\)''', re.I)
+_CSS_IMPORT_RE = re.compile(r'''@import\s+(["'])([^"']+)\1''', re.I)
+# import x from '...' / export { x } from '...' (可跨行) / import '...' / import('...')
+_JS_FROM_RE = re.compile(r'''\b(?:import|export)\b[^'"`;()]*?\bfrom\s*(["'])([^"'\n]+)\1''')
+_JS_BARE_RE = re.compile(r'''\bimport\s*(["'])([^"'\n]+)\1''')
+_JS_DYNAMIC_RE = re.compile(r'''\bimport\s*\(\s*(["'])([^"'\n]+)\1\s*\)''')
+
+_PATTERNS = {
+    'html': (_HTML_ATTR_RE, _JS_FROM_RE, _JS_BARE_RE, _JS_DYNAMIC_RE),
+    'css': (_CSS_URL_RE, _CSS_IMPORT_RE),
+    'js': (_JS_FROM_RE, _JS_BARE_RE, _JS_DYNAMIC_RE),
+}
+# 仅静态 import (模块图：动态 import 本就是按需加载，不计入)
+_STATIC_IMPORT_PATTERNS = (_JS_FROM_RE, _JS_BARE_RE)
+
+def kind_of(rel_path):
+    ext = posixpath.splitext(rel_path)[1].lower()
+    if ext in HTML_EXTS:
+        return 'html'
+    if ext in CSS_EXTS:
+        return 'css'
+    if ext in JS_EXTS:
+        return 'js'
+    return None
+
+def split_spec(spec):
+    """'a/b.js?v=1#x' -> ('a/b.js', '?v=1#x')"""
+    cut = len(spec)
+    for mark in ('?', '#'):
+        pos = spec.find(mark)
+        if pos != -1:
+            cut = min(cut, pos)
+    return spec[:cut], spec[cut:]
+
+def _is_local(spec):
+    if not spec or spec[0] in '#?' or spec.startswith('//'):
+        return False
+    if '${' in spec or '{{' in spec or '<' in spec:
+        return False
+    return not re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*:', spec)
+
+def resolve(from_rel, spec, kind=None):
+    """把 from_rel 中出现的引用解析为项目内相对路径；非站内引用返回 None"""
+    if not _is_local(spec):
+        return None
+    # CSS / HTML 中的路径可能经过 URL 编码 (如 %20)
+    path = urllib.parse.unquote(split_spec(spec)[0])
+    if not path or not _is_local(path):
+        return None
+    kind = kind or kind_of(from_rel)
+    # ESM 的裸模块名 (如 'vue') 不是路径；HTML / CSS 中的裸文件名相对于当前目录
+    if kind == 'js' and not path.startswith(('./', '../', '/')):
+        return None
+    if path.startswith('/'):
+        joined = path.lstrip('/')
+    else:
+        joined = posixpath.join(posixpath.dirname(from_rel), path)
+    resolved = posixpath.normpath(joined)
+    if resolved.startswith('../') or resolved in ('.', '..'):
+        return None
+    return resolved
+
+def find_refs(rel_path, text, static_imports=False):
+    """返回 [(start, end, spec), ...]：spec 在 text 中的位置 (按出现顺序，已去重重叠)
+    static_imports=True 时只提取静态 import / export from (text 视为 JS 源码)"""
+    kind = 'js' if static_imports else kind_of(rel_path)
+    if kind is None:
+        return []
+    found = {}
+    for pattern in (_STATIC_IMPORT_PATTERNS if static_imports else _PATTERNS[kind]):
+        for m in pattern.finditer(text):
+            start, end = m.span(2)
+            found.setdefault(start, (start, end, m.group(2)))
+    return [found[k] for k in sorted(found)]
+
+def find_deps(rel_path, text, static_imports=False):
+    """返回 text 引用到的站内路径 (去重，保持出现顺序)"""
+    deps = []
+    for _, _, spec in find_refs(rel_path, text, static_imports):
+        target = resolve(rel_path, spec, 'js' if static_imports else None)
+        if target and target not in deps:
+            deps.append(target)
+    return deps
+
+def rewrite(rel_path, text, mapping):
+    """把引用到 mapping 中路径的 spec 改写为对应的新文件名 (目录部分与查询串保持不变)"""
+    refs = find_refs(rel_path, text)
+    if not refs:
+        return text
+    parts = []
+    last = 0
+    for start, end, spec in refs:
+        target = resolve(rel_path, spec)
+        new_name = mapping.get(target) if target else None
+        if new_name is None:
+            continue
+        path, suffix = split_spec(spec)
+        head = path[:path.rfind('/') + 1]
+        parts.append(text[last:start])
+        parts.append(head + urllib.parse.quote(posixpath.basename(new_name)) + suffix)
+        last = end
+    parts.append(text[last:])
+    return ''.join(parts)
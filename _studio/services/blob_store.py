@@ -0,0 +1,114 @@
+"""
+MAERS Blob Store
+按内容哈希寻址的图片存储 (_studio/cache/blobs/<哈希前两位>/<哈希><后缀>)：
+- 同一张图片 (上传字节的 md5 相同) 无论上传到哪个分类，原图 / 缩略图 / 预览图只编码、只存储一次
+- 各分类下的路径是指向 blob 的硬链接 (文件系统不支持时退化为复制，仍可省去编码)，前端与静态托管照常按路径访问
+- 存储目录位于已忽略的 _studio/cache/ 下，不进入仓库与部署 (git / 静态托管不保留硬链接，放在 photos/ 内会存两份)；
+  需与 photos/ 处于同一文件系统才能硬链接
+- blob 在最后一条引用该哈希的记录删除时一并删除
+"""
+import os
+import shutil
+import filecmp
+
+BLOB_DIR = '_studio/cache/blobs'  # 相对项目根目录 (与 photos 的图片目录一致)
+
+# 各类文件在 blob 名中的后缀前缀 (后接扩展名)
+KINDS = {'path': '', 'thumb': '.thumb', 'preview': '.preview'}
+
+def suffix_for(kind, rel_path):
+    return KINDS[kind] + os.path.splitext(rel_path)[1].lower()
+
+def blob_path(file_hash, suffix, root=''):
+    return os.path.join(root, BLOB_DIR, file_hash[:2], file_hash + suffix)
+
+def _link(src, dst):
+    """硬链接 (不支持时复制)；先写临时名再替换，不会改写 dst 原 inode 上其他链接的内容"""
+    temp_path = dst + '.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    try:
+        os.link(src, temp_path)
+    except OSError:
+        shutil.copyfile(src, temp_path)
+    os.replace(temp_path, dst)
+
+def materialize(file_hash, targets, root=''):
+    """
+    targets: [(后缀, 目标路径), ...]
+    全部 blob 均已存在时链接到各目标路径并返回 True；否则不做任何改动，返回 False
+    """
+    if not file_hash or not all(os.path.exists(blob_path(file_hash, s, root)) for s, _ in targets):
+        return False
+    for suffix, dest in targets:
+        _link(blob_path(file_hash, suffix, root), dest)
+    return True
+
+def adopt(file_hash, sources, root=''):
+    """把新生成的文件收入存储 (同名 blob 已存在时保留原 blob)"""
+    if not file_hash:
+        return
+    for suffix, src in sources:
+        blob = blob_path(file_hash, suffix, root)
+        if os.path.exists(blob) or not os.path.exists(src):
+            continue
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        _link(src, blob)
+
+def remove(file_hash, root=''):
+    """删除该哈希的全部 blob (调用方需确认已没有记录引用)"""
+    folder = os.path.dirname(blob_path(file_hash, '', root))
+    try:
+        names = os.listdir(folder)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.startswith(file_hash + '.'):
+            os.remove(os.path.join(folder, name))
+
+def iter_blobs(root=''):
+    """产出 (相对项目根目录的路径, 哈希)"""
+    base = os.path.join(root, BLOB_DIR)
+    if not os.path.isdir(base):
+        return
+    for prefix in sorted(os.listdir(base)):
+        folder = os.path.join(base, prefix)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith('.tmp'):
+                yield f"{BLOB_DIR}/{prefix}/{name}", name.split('.', 1)[0]
+
+def dedupe(rows, root='', dry_run=False):
+    """
+    存量图片收入存储：rows 为 photos 表记录 (需含 hash / path / thumb / preview)。
+    blob 不存在时收入存储；已存在且内容完全相同的文件替换为指向 blob 的硬链接。
+    返回 {'adopted', 'linked', 'saved_bytes'}
+    """
+    summary = {'adopted': 0, 'linked': 0, 'saved_bytes': 0}
+    for row in rows:
+        file_hash = row['hash']
+        if not file_hash:
+            continue
+        seen = set()
+        for kind in KINDS:
+            rel = row[kind]
+            # 无衍生图时 thumb / preview 直接指向原图，只处理一次
+            if not rel or rel in seen:
+                continue
+            seen.add(rel)
+            full_path = os.path.join(root, rel.replace('/', os.sep))
+            if not os.path.exists(full_path):
+                continue
+            suffix = suffix_for(kind if rel != row['path'] else 'path', rel)
+            blob = blob_path(file_hash, suffix, root)
+            if not os.path.exists(blob):
+                if not dry_run:
+                    adopt(file_hash, [(suffix, full_path)], root)
+                summary['adopted'] += 1
+            elif not os.path.samefile(blob, full_path) and filecmp.cmp(blob, full_path, shallow=False):
+                summary['saved_bytes'] += os.path.getsize(full_path)
+                if not dry_run:
+                    _link(blob, full_path)
+                summary['linked'] += 1
+    return summary
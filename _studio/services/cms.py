@@ -8,6 +8,11 @@ import shutil
 from . import cms_nodes
 from . import cms_tags
 from . import cms_other_tags
+from . import cms_content
+from . import metrics
+from . import log
+
+logger = log.get_logger('CMS')
 
 # ================= 配置 =================
 
@@ -30,7 +35,7 @@ JS_SYNC_MAP = {
 # ================= 数据库操作 / 基础设施 =================
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = metrics.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -88,11 +93,13 @@ def fetch_module_tree(module):
 
     return {"root": root_nodes}
 
+@metrics.timed_sync
 def sync_js_file(module):
     """生成静态 JSON 文件供前端读取"""
     js_rel_path = JS_SYNC_MAP.get(module)
     if not js_rel_path: return
 
+    start = time.perf_counter()
     data = fetch_module_tree(module)
     js_path = os.path.join(PROJECT_ROOT, js_rel_path)
     
@@ -106,9 +113,10 @@ def sync_js_file(module):
             os.remove(js_path)
         os.rename(temp_path, js_path)
         
-        print(f"  [ CMS ] 📂 同步完成 | Sync complete: {js_rel_path}")
+        logger.debug(f"📂 同步完成 | Sync complete: {js_rel_path}", module=module, path=js_rel_path,
+                     ms=round((time.perf_counter() - start) * 1000, 2))
     except Exception as e:
-        print(f"  [ CMS ] ❌ 同步失败 | Sync failed: {e}")
+        logger.error(f"❌ 同步失败 | Sync failed: {e}", module=module, path=js_rel_path)
         if os.path.exists(temp_path):
             try: os.remove(temp_path)
             except: pass
@@ -149,12 +157,12 @@ def save_json(filepath, data, js_path=None, var_name=None):
             js_content = f"window.{var_name} = {json.dumps(data, ensure_ascii=False, indent=2)};\n"
             with open(js_full_path, 'w', encoding='utf-8') as f:
                 f.write(js_content)
-            print(f"  [ CMS ] ✅ 静态 JS 已同步 | Static JS synced: {js_path}")
+            logger.info(f"✅ 静态 JS 已同步 | Static JS synced: {js_path}")
         
-        print(f"  [ CMS ] 💾 配置已保存 | Config saved: {os.path.basename(filepath)}")
+        logger.info(f"💾 配置已保存 | Config saved: {os.path.basename(filepath)}")
         return True
     except Exception as e:
-        print(f"  [ CMS ] ❌ 保存失败 | Save failed: {e}")
+        logger.error(f"❌ 保存失败 | Save failed: {e}")
         return False
 
 # ================= 标签操作封装 (Wrapper) =================
@@ -180,16 +188,16 @@ def cleanup_unused_tags(module):
     
     strategy = get_strategy(module, get_context())
     try:
-        print(f"  [ CMS ] 🔍 开始标签清理 | Starting cleanup for module: {module}")
+        logger.info(f"🔍 开始标签清理 | Starting cleanup for module: {module}")
         
         # 1. Collect used tags
         used_tags = strategy.cleanup_tags(module)
-        print(f"  [ CMS ] 🏷️  使用中的标签: {sorted(used_tags)}")
+        logger.info(f"🏷️  使用中的标签: {sorted(used_tags)}")
         
         # 2. Get categories
         categories = strategy.get_categories(module)
         if not categories:
-            print(f"  [ CMS ] ℹ️  没有标签分类")
+            logger.info(f"ℹ️  没有标签分类")
             return {"success": True, "removed_count": 0, "removed_tags": [], "empty_categories": []}
         
         # 3. Cleanup logic
@@ -212,9 +220,9 @@ def cleanup_unused_tags(module):
         # 4. Save
         if removed_tags:
             strategy.save_categories(cleaned_categories, module)
-            print(f"  [ CMS ] ✅ 清理了 {len(removed_tags)} 个标签: {removed_tags}")
+            logger.info(f"✅ 清理了 {len(removed_tags)} 个标签: {removed_tags}")
         else:
-            print(f"  [ CMS ] ✨ 无需清理")
+            logger.info(f"✨ 无需清理")
         
         return {
             "success": True,
@@ -223,14 +231,12 @@ def cleanup_unused_tags(module):
             "empty_categories": empty_categories
         }
     except Exception as e:
-        print(f"  [ CMS ] ❌ 标签清理失败: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ 标签清理失败: {e}", module=module)
         return {"success": False, "error": str(e)}
 
 def rename_tag(module, old_name, new_name):
     try:
-        print(f"  [ CMS ] ✎ 重命名标签 | Renaming tag: {old_name} → {new_name} (module: {module})")
+        logger.info(f"✎ 重命名标签 | Renaming tag: {old_name} → {new_name} (module: {module})")
         if not new_name or not new_name.strip(): return {"success": False, "error": "新标签名不能为空"}
         new_name = new_name.strip()
         if old_name == new_name: return {"success": True, "updated_count": 0}
@@ -259,18 +265,18 @@ def rename_tag(module, old_name, new_name):
             
             if changed_cats:
                 strategy.save_categories(categories, module)
-                print(f"  [ CMS ] ✅ 标签分类文件已更新")
+                logger.info(f"✅ 标签分类文件已更新")
         
-        print(f"  [ CMS ] ✅ 标签重命名完成")
+        logger.info(f"✅ 标签重命名完成")
         return {"success": True, "updated_count": updated_count}
 
     except Exception as e:
-        print(f"  [ CMS ] ❌ 标签重命名失败: {e}")
+        logger.error(f"❌ 标签重命名失败: {e}")
         return {"success": False, "error": str(e)}
 
 def delete_tag(module, tag_name):
     try:
-        print(f"  [ CMS ] ✕ 删除标签 | Deleting tag: {tag_name} (module: {module})")
+        logger.info(f"✕ 删除标签 | Deleting tag: {tag_name} (module: {module})")
         
         strategy = get_strategy(module, get_context())
         
@@ -288,21 +294,143 @@ def delete_tag(module, tag_name):
             
             if changed_cats:
                 strategy.save_categories(categories, module)
-                print(f"  [ CMS ] ✅ 标签分类文件已更新")
+                logger.info(f"✅ 标签分类文件已更新")
         
-        print(f"  [ CMS ] ✅ 标签删除完成")
+        logger.info(f"✅ 标签删除完成")
         return {"success": True, "updated_count": updated_count}
     except Exception as e:
-        print(f"  [ CMS ] ❌ 标签删除失败: {e}")
+        logger.error(f"❌ 标签删除失败: {e}")
         return {"success": False, "error": str(e)}
 
 
 def update_node_tags(module, node_id, tags):
     return cms_nodes.update_node_tags(module, node_id, tags, get_context())
 
+# ================= 批量操作 (Batch) =================
+
+NODE_ACTIONS = {
+    'move':    lambda m, b, ctx: cms_nodes.move_node(m, b.get('id'), b.get('targetParentId'), ctx),
+    'add':     lambda m, b, ctx: cms_nodes.add_node(m, b.get('parentId'), b.get('type'), b.get('title'), ctx),
+    'delete':  lambda m, b, ctx: cms_nodes.delete_node(m, b.get('id'), ctx),
+    'update':  lambda m, b, ctx: cms_nodes.update_node(m, b.get('id'), b.get('data'), ctx),
+    'reorder': lambda m, b, ctx: cms_nodes.reorder_nodes(m, b.get('ids', []), ctx),
+}
+
+def apply_node_action(module, action, body, context):
+    """执行单个节点动作 (供 /node 与 /batch 共用)"""
+    handler = NODE_ACTIONS.get(action)
+    if not handler:
+        raise ValueError(f"Unknown action: {action}")
+    return handler(module, body or {}, context)
+
+class _BatchConnection:
+    """
+    共享连接代理：吞掉各动作内部的 commit/close，由批处理统一提交。
+    提交后回调 (引用登记) 排队到整体提交后执行；已发生的文件改动登记撤销动作，回滚时逆序执行。
+    """
+    def __init__(self, conn):
+        self._conn = conn
+        self.pending = []
+        self.undo = []
+
+    def after_commit(self, fn):
+        self.pending.append(fn)
+
+    def on_rollback(self, fn):
+        self.undo.append(fn)
+
+    def cursor(self):
+        return self._conn.cursor()
+
+    def execute(self, *args):
+        return self._conn.execute(*args)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def rollback(self):
+        self._conn.rollback()
+
+def apply_batch(module, ops):
+    """
+    在单个事务中按顺序执行多个节点动作，结束后只同步一次 JSON。
+    ops: [{ "action": "move", "id": ..., "targetParentId": ... }, ...]
+    任一动作失败则整体回滚：数据库回滚，已发生的 .md 文件改名/删除/写入按撤销记录恢复。
+    """
+    conn = get_db()
+    shared = _BatchConnection(conn)
+    dirty_modules = set()
+
+    context = get_context()
+    context['get_db'] = lambda: shared
+    context['sync_js_file'] = dirty_modules.add
+
+    results = []
+    try:
+        for idx, op in enumerate(ops):
+            action = op.get('action') if isinstance(op, dict) else None
+            result = apply_node_action(module, action, op, context)
+            if not result:
+                raise ValueError(f"Op #{idx} ({action}) made no changes")
+            entry = {"index": idx, "action": action, "status": "success"}
+            if action == 'add':
+                entry["id"] = result
+            results.append(entry)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        for undo in reversed(shared.undo):
+            try:
+                undo()
+            except Exception as undo_error:
+                logger.error(f"❌ 文件改动撤销失败 | Failed to undo file change: {undo_error}")
+        failed = len(results)
+        logger.error(f"❌ 批量操作已回滚 | Batch rolled back at op #{failed}: {e}")
+        code = 400 if isinstance(e, ValueError) else 500
+        results.append({"index": failed, "status": "error", "error": str(e)})
+        return code, {"status": "error", "failed_index": failed, "results": results}
+
+    conn.close()
+    for fn in shared.pending:
+        fn()
+    logger.info(f"📦 批量操作完成 | Batch applied: {len(ops)} ops ({module})")
+
+    for m in dirty_modules:
+        sync_js_file(m)
+
+    return 200, {"status": "success", "results": results}
+
 # ================= 入口分发 =================
 
-def handle_request(path, method, query_params, body_data):
+def fetch_node_content(module, node_id, if_none_match=None):
+    """读取节点 Markdown 正文 (经内容缓存)，支持 ETag 协商"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("SELECT content FROM nodes WHERE id=? AND module=?", (node_id, module))
+    row = cursor.fetchone()
+    conn.close()
+
+    if not row:
+        return 404, {"error": "Node not found"}
+    rel_path = row['content']
+    if not rel_path or not str(rel_path).endswith('.md'):
+        return 404, {"error": "Node has no content file"}
+
+    result = cms_content.read_content(os.path.join(DATA_DIR, rel_path))
+    if result is None:
+        return 404, {"error": f"Content file not found: {rel_path}"}
+
+    text, etag = result
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+    if if_none_match and if_none_match.strip() == headers['ETag']:
+        return 304, None, headers
+    return 200, {"id": node_id, "path": rel_path, "content": text, "etag": etag}, headers
+
+def handle_request(path, method, query_params, body_data, headers=None):
     try:
         # Tag APIs (Before Module Validation)
         if method == 'GET' and path.endswith('/get_categories'):
@@ -321,40 +449,39 @@ def handle_request(path, method, query_params, body_data):
         if method == 'GET' and path.endswith('/fetch'):
             return 200, fetch_module_tree(module)
 
+        if method == 'GET' and path.endswith('/content'):
+            node_id = query_params.get('id', [None])[0]
+            if not node_id:
+                return 400, {"error": "Node ID is required"}
+            if_none_match = headers.get('If-None-Match') if headers else None
+            return fetch_node_content(module, node_id, if_none_match)
+
         if method == 'POST' and path.endswith('/node'):
             action = query_params.get('action', [''])[0]
             context = get_context()
             
             changed = False
             try:
-                if action == 'move':
-                    changed = cms_nodes.move_node(module, body_data.get('id'), body_data.get('targetParentId'), context)
-                elif action == 'add':
-                    changed = cms_nodes.add_node(module, body_data.get('parentId'), body_data.get('type'), body_data.get('title'), context)
-                elif action == 'delete':
-                    changed = cms_nodes.delete_node(module, body_data.get('id'), context)
-                elif action == 'update':
-                    changed = cms_nodes.update_node(module, body_data.get('id'), body_data.get('data'), context)
-                elif action == 'reorder':
-                    changed = cms_nodes.reorder_nodes(module, body_data.get('ids', []), context)
-                else:
-                    return 400, {"error": "Unknown action"}
+                changed = apply_node_action(module, action, body_data, context)
             except ValueError as ve:
-                print(f"❌ Logic Error: {ve}")
+                logger.warning(f"❌ Logic Error: {ve}", module=module, action=action)
                 return 400, {"error": str(ve)}
             except Exception as e:
-                print(f"❌ Operation Error: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception(f"❌ Operation Error: {e}", module=module, action=action)
                 return 500, {"error": str(e)}
 
             if changed:
                 return 200, {"status": "success"}
             return 400, {"error": "No changes made"}
 
+        if method == 'POST' and path.endswith('/batch'):
+            ops = (body_data or {}).get('ops')
+            if not isinstance(ops, list) or not ops:
+                return 400, {"error": "ops must be a non-empty list"}
+            return apply_batch(module, ops)
+
         return 404, {"error": "Not found"}
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ 请求处理失败 | Request failed: {e}", path=path)
         return 500, {"error": str(e)}
@@ -0,0 +1,121 @@
+"""
+MAERS CMS Content Layer
+Markdown 正文的内容寻址层：按内容哈希判定变更，跳过无效写入，
+并在内存中维护最近读写正文的 LRU 缓存 (以文件 mtime/size 校验新鲜度)。
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+# ================= 配置 =================
+
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+_cache = OrderedDict()   # abs_path -> (stat_key, etag, text, UTF-8 字节数)
+_cache_bytes = 0
+_lock = threading.Lock()
+
+# ================= 工具函数 =================
+
+def content_hash(text):
+    """正文内容哈希 (同时作为 ETag)"""
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+def _put(key, stat_key, etag, text):
+    global _cache_bytes
+    with _lock:
+        old = _cache.pop(key, None)
+        if old:
+            _cache_bytes -= old[3]
+        size = len(text.encode('utf-8'))  # 预算按字节计 (中文正文每字 3 字节)
+        _cache[key] = (stat_key, etag, text, size)
+        _cache_bytes += size
+        while _cache and (len(_cache) > CACHE_MAX_ENTRIES or _cache_bytes > CACHE_MAX_BYTES):
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= evicted[3]
+
+def _get(key, stat_key):
+    with _lock:
+        entry = _cache.get(key)
+        if not entry:
+            return None
+        if entry[0] != stat_key:
+            return None
+        _cache.move_to_end(key)
+        return entry
+
+# ================= 对外接口 =================
+
+def read_content(path):
+    """读取正文，返回 (text, etag)；文件不存在时返回 None"""
+    key = _key(path)
+    stat_key = _stat_key(path)
+    if stat_key is None:
+        discard(path)
+        return None
+
+    entry = _get(key, stat_key)
+    if entry:
+        return entry[2], entry[1]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    etag = content_hash(text)
+    _put(key, stat_key, etag, text)
+    return text, etag
+
+def write_content(path, text):
+    """
+    写入正文。内容未变化时跳过写盘并返回 False，否则原子写入并返回 True。
+    """
+    new_etag = content_hash(text)
+    current = read_content(path) if os.path.exists(path) else None
+    if current and current[1] == new_etag:
+        return False
+
+    temp_path = path + '.tmp'
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            try: os.remove(temp_path)
+            except: pass
+        raise
+
+    _put(_key(path), _stat_key(path), new_etag, text)
+    return True
+
+def rename(old_path, new_path):
+    """文件重命名后迁移缓存条目"""
+    old_key = _key(old_path)
+    with _lock:
+        entry = _cache.get(old_key)
+    discard(old_path)
+    if entry:
+        _put(_key(new_path), _stat_key(new_path), entry[1], entry[2])
+
+def discard(path):
+    """移除缓存条目 (文件删除时调用)"""
+    global _cache_bytes
+    with _lock:
+        entry = _cache.pop(_key(path), None)
+        if entry:
+            _cache_bytes -= entry[3]
+
+def stats():
+    with _lock:
+        return {"entries": len(_cache), "bytes": _cache_bytes}
@@ -3,14 +3,83 @@ import json
 import time
 import re
 
+from . import cms_content
+from . import cms_render
+from . import ref_index
+from . import asset_gc
+from . import log
+
+logger = log.get_logger('CMS')
+
 # ================= 业务动作 (节点管理) =================
 
+def _after_commit(conn, fn):
+    """引用登记须晚于数据库提交：批处理连接 (cms._BatchConnection) 排队到整体提交后执行，普通连接立即执行"""
+    defer = getattr(conn, 'after_commit', None)
+    if defer:
+        defer(fn)
+    else:
+        fn()
+
+def _on_rollback(conn, fn):
+    """批处理回滚时撤销已发生的文件改动：批处理连接逆序执行登记的撤销动作，普通连接无需登记"""
+    undo = getattr(conn, 'on_rollback', None)
+    if undo:
+        undo(fn)
+
+def _undo_rename(old_path, new_path):
+    os.rename(new_path, old_path)
+    cms_content.rename(new_path, old_path)
+    cms_render.move_artifact(new_path, old_path)
+
+def _snapshot_files(conn, paths):
+    """改写/删除文件前记录原始字节 (不存在记为 None)，批处理回滚时原样恢复"""
+    if getattr(conn, 'on_rollback', None) is None:
+        return
+    saved = []
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                saved.append((path, f.read()))
+        except FileNotFoundError:
+            saved.append((path, None))
+
+    def restore():
+        for path, data in saved:
+            cms_content.discard(path)
+            if data is None:
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+    conn.on_rollback(restore)
+
+def _release_node_refs(nodes):
+    """nodes: [(node_id, 是否有封面, 是否为内联正文)]"""
+    for node_id, has_cover, inline in nodes:
+        try:
+            if has_cover:
+                asset_gc.track_cover(node_id, None)
+            if inline:
+                ref_index.get_index().remove_source(f"node:{node_id}")
+        except Exception as e:
+            logger.warning(f"⚠️  引用注销失败 | Failed to release refs for node {node_id}: {e}")
+
+def _track_cover(node_id, cover):
+    try:
+        asset_gc.track_cover(node_id, cover)
+    except Exception as e:
+        logger.warning(f"⚠️  封面引用登记失败 | Cover ref tracking failed: {e}")
+
 def sanitize_filename(title):
     # Remove invalid chars
     return re.sub(r'[\\/*?:"<>|]', "", title).strip() or "Untitled"
 
 def add_node(module, parent_id, node_type, title, context):
-    """添加新节点"""
+    """添加新节点，返回新节点 ID"""
     get_db = context['get_db']
     DATA_DIR = context['DATA_DIR']
     
@@ -18,6 +87,14 @@ def add_node(module, parent_id, node_type, title, context):
     cursor = conn.cursor()
     
     new_id = f"{node_type[0]}_{int(time.time()*1000)}"
+    # 同一毫秒内的连续添加 (如批量操作) 需要避免主键冲突
+    cursor.execute("SELECT 1 FROM nodes WHERE id=?", (new_id,))
+    suffix = 1
+    base_id = new_id
+    while cursor.fetchone():
+        new_id = f"{base_id}_{suffix}"
+        suffix += 1
+        cursor.execute("SELECT 1 FROM nodes WHERE id=?", (new_id,))
     created_at = time.time()
     
     # 新节点通常插入在最前面 (sort_order = -1 或重排)
@@ -47,6 +124,7 @@ def add_node(module, parent_id, node_type, title, context):
                 counter += 1
                 
             filepath = os.path.join(file_dir, filename)
+            _snapshot_files(conn, [filepath])
             with open(filepath, 'w', encoding='utf-8') as f:
                 f.write("")
                 
@@ -54,17 +132,17 @@ def add_node(module, parent_id, node_type, title, context):
             rel_path = f"{module}/{filename}"
             cursor.execute("UPDATE nodes SET content=? WHERE id=?", (rel_path, new_id))
         except Exception as e:
-            print(f"  [ CMS ] ⚠️ Failed to create MD file: {e}")
+            logger.warning(f"⚠️ Failed to create MD file: {e}")
 
     conn.commit()
     conn.close()
-    print(f"  [ CMS ] 🆕 节点已添加 | Node added: {title} ({module})")
+    logger.info(f"🆕 节点已添加 | Node added: {title} ({module})")
     
     # Sync JS
     if context.get('sync_js_file'):
         context['sync_js_file'](module)
         
-    return True
+    return new_id
 
 def delete_node(module, node_id, context):
     """删除节点及其子树"""
@@ -87,27 +165,21 @@ def delete_node(module, node_id, context):
             break
         ids_to_delete.extend(children)
 
-    # 2. Delete cover images for all nodes before deleting the nodes
-    # Import photos module for cover deletion
-    try:
-        from . import photos
-        photo_handler = photos
-    except ImportError:
-        photo_handler = None
-    
-    if photo_handler:
-        for del_id in ids_to_delete:
-            cursor.execute("SELECT coverImage FROM nodes WHERE id=?", (del_id,))
-            row = cursor.fetchone()
-            if row and row['coverImage']:
-                cover_path = row['coverImage']
-                print(f"  [ CMS ] 🗑️  正在删除封面图 | Deleting cover image for node {del_id}: {cover_path}")
-                try:
-                    photo_handler.handle_delete({'path': cover_path})
-                except Exception as e:
-                    print(f"  [ CMS ] ⚠️  封面图删除失败 | Failed to delete cover {cover_path}: {e}")
+    # 2. Release cover images (提交后注销引用，归零后由 asset_gc 后台回收，其他节点共用的封面不受影响)
+    released = []
+    for del_id in ids_to_delete:
+        cursor.execute("SELECT coverImage, content FROM nodes WHERE id=?", (del_id,))
+        row = cursor.fetchone()
+        if not row:
+            continue
+        inline = bool(row['content']) and not str(row['content']).endswith('.md')
+        if row['coverImage']:
+            logger.info(f"🗑️  释放封面引用 | Releasing cover for node {del_id}: {row['coverImage']}")
+        if row['coverImage'] or inline:
+            released.append((del_id, bool(row['coverImage']), inline))
 
-    # 3. Delete MD files for all nodes
+    # 3. Delete MD files for all nodes (批处理回滚时由快照恢复)
+    removed_sources = []
     for del_id in ids_to_delete:
         cursor.execute("SELECT content FROM nodes WHERE id=?", (del_id,))
         row = cursor.fetchone()
@@ -115,18 +187,26 @@ def delete_node(module, node_id, context):
             md_path = os.path.join(PROJECT_ROOT, 'data', row['content'])
             if os.path.exists(md_path):
                 try:
+                    _snapshot_files(conn, [md_path, cms_render.artifact_path(md_path)])
                     os.remove(md_path)
-                    print(f"  [ CMS ] 🗑️  Deleted MD file: {md_path}")
+                    cms_content.discard(md_path)
+                    cms_render.remove_artifact(md_path)
+                    removed_sources.append(row['content'])
+                    logger.info(f"🗑️  Deleted MD file: {md_path}")
                 except Exception as e:
-                    print(f"  [ CMS ] ⚠️ Failed to delete MD file: {e}")
+                    logger.warning(f"⚠️ Failed to delete MD file: {e}")
 
     # 4. Execute deletion from DB
     placeholders = ','.join('?' for _ in ids_to_delete)
     cursor.execute(f"DELETE FROM nodes WHERE id IN ({placeholders})", ids_to_delete)
     
     conn.commit()
+    if released:
+        _after_commit(conn, lambda: _release_node_refs(released))
+    for rel_path in removed_sources:
+        _after_commit(conn, lambda rel_path=rel_path: ref_index.get_index().remove_source(rel_path))
     conn.close()
-    print(f"  [ CMS ] 🗑️  节点及子树已删除 | Node & sub-tree deleted: {node_id}")
+    logger.info(f"🗑️  节点及子树已删除 | Node & sub-tree deleted: {node_id}")
     
     # Sync JS
     if context.get('sync_js_file'):
@@ -143,28 +223,15 @@ def update_node(module, node_id, update_data, context):
     cursor = conn.cursor()
     
     allowed_fields = {'title', 'content', 'tags', 'coverImage'}
+    renamed_sources = []  # 正文引用索引的改动在提交后登记
+    written_sources = []
     updates = []
     params = []
     
-    try:
-        from . import photos
-        photo_handler = photos
-    except ImportError:
-        photo_handler = None
-
     for k, v in update_data.items():
         if k in allowed_fields:
             if k == 'tags': v = json.dumps(v, ensure_ascii=False)
-            
-            # Special Logic: Use Photos Module for Cover Deletion
-            if k == 'coverImage' and v is None and photo_handler:
-                # 1. Fetch old value
-                cursor.execute("SELECT coverImage FROM nodes WHERE id=?", (node_id,))
-                row = cursor.fetchone()
-                if row and row['coverImage']:
-                    old_path = row['coverImage']
-                    print(f"  [ CMS ] 🗑️  正在清理旧封面 | Purging old cover: {old_path}")
-                    photo_handler.handle_delete({'path': old_path})
+
 
             # Handle Title Rename (Rename File)
             if k == 'title':
@@ -201,12 +268,16 @@ def update_node(module, node_id, update_data, context):
                             # Only rename if paths differ
                             if norm_new.lower() != norm_old.lower():
                                 os.rename(old_full_path, new_full_path)
+                                cms_content.rename(old_full_path, new_full_path)
+                                cms_render.move_artifact(old_full_path, new_full_path)
+                                _on_rollback(conn, lambda src=old_full_path, dst=new_full_path: _undo_rename(src, dst))
                                 # Update content path in DB
                                 new_rel_path = f"{module}/{new_filename}" 
                                 cursor.execute("UPDATE nodes SET content=? WHERE id=?", (new_rel_path, node_id))
-                                print(f"  [ CMS ] 📛 Renamed file: {old_rel_path} -> {new_rel_path}")
+                                renamed_sources.append((old_rel_path, new_rel_path))
+                                logger.info(f"📛 Renamed file: {old_rel_path} -> {new_rel_path}")
                         except Exception as e:
-                            print(f"  [ CMS ] ⚠️ Failed to rename file: {e}")
+                            logger.warning(f"⚠️ Failed to rename file: {e}")
 
             updates.append(f"{k}=?")
             params.append(v)
@@ -215,11 +286,16 @@ def update_node(module, node_id, update_data, context):
     # We should NOT update the 'content' column in DB with this text.
     
     content_to_write = None
+    new_cover = None  # (封面,) 仅在封面确实变化时设置
     
     # Reset updates/params for SQL
     sql_updates = []
     sql_params = []
     
+    # 与当前值相同的字段不再写库 (编辑器自动保存会重复提交 title)
+    cursor.execute("SELECT * FROM nodes WHERE id=?", (node_id,))
+    current = cursor.fetchone()
+    
     for k, v in update_data.items():
         if k == 'content':
             content_to_write = v
@@ -227,6 +303,10 @@ def update_node(module, node_id, update_data, context):
             
         if k in allowed_fields:
             if k == 'tags': v = json.dumps(v, ensure_ascii=False)
+            if current is not None and k in current.keys() and current[k] == v:
+                continue
+            if k == 'coverImage':
+                new_cover = (v,)
             sql_updates.append(f"{k}=?")
             sql_params.append(v)
 
@@ -236,24 +316,39 @@ def update_node(module, node_id, update_data, context):
         row = cursor.fetchone()
         if row and row['content'] and str(row['content']).endswith('.md'):
              md_path = os.path.join(PROJECT_ROOT, 'data', row['content'])
+             _snapshot_files(conn, [md_path, cms_render.artifact_path(md_path)])
+             try:
+                 if cms_content.write_content(md_path, content_to_write):
+                     logger.info(f"📝 Content written to {md_path}")
+                     written_sources.append((row['content'], md_path, content_to_write))
+                 else:
+                     logger.info(f"⏭️  内容未变化，跳过写入 | Content unchanged, write skipped: {row['content']}")
+             except Exception as e:
+                 logger.error(f"❌ Failed to write content: {e}")
              try:
-                 with open(md_path, 'w', encoding='utf-8') as f:
-                     f.write(content_to_write)
-                 print(f"  [ CMS ] 📝 Content written to {md_path}")
+                 if cms_render.render_note(md_path, content_to_write) == 'rendered':
+                     logger.info(f"🖨️  HTML 已预渲染 | HTML pre-rendered: {row['content']}")
              except Exception as e:
-                 print(f"  [ CMS ] ❌ Failed to write content: {e}")
+                 logger.warning(f"⚠️ 预渲染失败 | Pre-render failed: {e}")
 
     if sql_updates:
         sql_params.append(node_id)
         sql = f"UPDATE nodes SET {', '.join(sql_updates)} WHERE id=?"
         cursor.execute(sql, sql_params)
         conn.commit()
-        print(f"  [ CMS ] ✎  节点已更新 | Node updated: {node_id}")
-        
+        logger.info(f"✎  节点已更新 | Node updated: {node_id}")
+        # 封面引用计数：旧封面不再立即删除，引用归零后由 asset_gc 回收 (节点不存在时不登记)
+        if new_cover is not None and cursor.rowcount > 0:
+            _after_commit(conn, lambda: _track_cover(node_id, new_cover[0]))
+    for old_rel_path, new_rel_path in renamed_sources:
+        _after_commit(conn, lambda a=old_rel_path, b=new_rel_path: ref_index.get_index().rename_source(a, b))
+    for source in written_sources:
+        _after_commit(conn, lambda source=source: ref_index.get_index().update_source(*source))
+
     conn.close()
     
-    # Sync JS
-    if context.get('sync_js_file'):
+    # Sync JS (正文不在树快照中，仅元数据变化时需要同步)
+    if sql_updates and context.get('sync_js_file'):
         context['sync_js_file'](module)
         
     return True
@@ -274,7 +369,7 @@ def reorder_nodes(module, ids, context):
         raise
     finally:
         conn.close()
-    print(f"  [ CMS ] ↕️  节点重排序完成 | Nodes reordered ({module})")
+    logger.info(f"↕️  节点重排序完成 | Nodes reordered ({module})")
     
     # Sync JS
     if context.get('sync_js_file'):
@@ -312,7 +407,7 @@ def move_node(module, node_id, target_parent_id, context):
     
     conn.commit()
     conn.close()
-    print(f"  [ CMS ] 🚚 节点已跨级移动 | Node moved: {node_id} -> {target_parent_id}")
+    logger.info(f"🚚 节点已跨级移动 | Node moved: {node_id} -> {target_parent_id}")
     
     # Sync JS
     if context.get('sync_js_file'):
@@ -337,7 +432,7 @@ def update_node_tags(module, node_id, tags, context):
         conn.commit()
         conn.close()
         
-        print(f"  [ CMS ] 🏷️  Tags Updated: {node_id} -> {tags}")
+        logger.debug(f"🏷️  Tags Updated: {node_id} -> {tags}", module=module, id=node_id, tags=len(tags))
         
         # Sync JS
         if context.get('sync_js_file'):
@@ -345,6 +440,6 @@ def update_node_tags(module, node_id, tags, context):
             
         return True
     except Exception as e:
-        print(f"  [ CMS ] ❌ Tag update failed: {e}")
+        logger.error(f"❌ Tag update failed: {e}", module=module, id=node_id)
         conn.close()
         return False
@@ -2,6 +2,10 @@ import os
 import json
 import sqlite3
 from .cms_tags import TagStrategy
+from . import space_tree
+from . import log
+
+logger = log.get_logger('CMS')
 
 # ================= 特殊模块策略 (Photos, Space) =================
 
@@ -78,7 +82,7 @@ class PhotosTagStrategy(TagStrategy):
                     with open(cats_file, 'w', encoding='utf-8') as f:
                         json.dump(categories, f, ensure_ascii=False, indent=2)
             except Exception as e:
-                print(f"  [ CMS ] ⚠️ Failed to update tag categories file on rename: {e}")
+                logger.warning(f"⚠️ Failed to update tag categories file on rename: {e}")
         
         from . import photos
         photos.sync_gallery_js()
@@ -116,7 +120,7 @@ class PhotosTagStrategy(TagStrategy):
     def cleanup_tags(self, module):
         category = module.replace('photos-', '')
         gallery_db_path = os.path.join(self.context['DATA_DIR'], 'gallery.db')
-        print(f"  [ CMS ] 📸 连接 gallery.db, category={category}")
+        logger.info(f"📸 连接 gallery.db, category={category}")
         
         used_tags = set()
         if not os.path.exists(gallery_db_path):
@@ -158,75 +162,11 @@ class SpaceTagStrategy(TagStrategy):
         except: return False
 
     def rename_tag(self, module, old_name, new_name):
-        space_path = os.path.join(self.context['PROJECT_ROOT'], 'data', 'space-tree.json')
-        if not os.path.exists(space_path): return 0
-        
-        with open(space_path, 'r', encoding='utf-8') as f:
-            space_data = json.load(f)
-        
-        updated_count = 0
-        def rename_in_nodes(nodes):
-            nonlocal updated_count
-            for node in nodes:
-                if node.get('tags') and old_name in node['tags']:
-                    # Replace then deduplicate (handles case where node has both old and new tag)
-                    renamed = [new_name if t == old_name else t for t in node['tags']]
-                    seen = set()
-                    deduped = []
-                    for t in renamed:
-                        if t not in seen:
-                            seen.add(t)
-                            deduped.append(t)
-                    node['tags'] = deduped
-                    updated_count += 1
-                if node.get('children'):
-                    rename_in_nodes(node['children'])
-        
-        rename_in_nodes(space_data.get('root', []))
-        
-        with open(space_path, 'w', encoding='utf-8') as f:
-            json.dump(space_data, f, ensure_ascii=False, indent=2)
-        return updated_count
+        return space_tree.get_model().rename_tag(old_name, new_name)
 
     def delete_tag(self, module, tag_name):
-        space_path = os.path.join(self.context['PROJECT_ROOT'], 'data', 'space-tree.json')
-        if not os.path.exists(space_path): return 0
-        
-        with open(space_path, 'r', encoding='utf-8') as f:
-            space_data = json.load(f)
-        
-        updated_count = 0
-        def delete_in_nodes(nodes):
-            nonlocal updated_count
-            for node in nodes:
-                if node.get('tags') and tag_name in node['tags']:
-                    node['tags'] = [t for t in node['tags'] if t != tag_name]
-                    updated_count += 1
-                if node.get('children'):
-                    delete_in_nodes(node['children'])
-        
-        delete_in_nodes(space_data.get('root', []))
-        
-        with open(space_path, 'w', encoding='utf-8') as f:
-            json.dump(space_data, f, ensure_ascii=False, indent=2)
-        return updated_count
+        return space_tree.get_model().delete_tag(tag_name)
 
     def cleanup_tags(self, module):
-        space_path = os.path.join(self.context['PROJECT_ROOT'], 'data', 'space-tree.json')
-        print(f"  [ CMS ] 🌐 读取 space-tree.json")
-        used_tags = set()
-        
-        if not os.path.exists(space_path): return used_tags
-        
-        with open(space_path, 'r', encoding='utf-8') as f:
-            space_data = json.load(f)
-            
-        def collect_space_tags(nodes):
-            for node in nodes:
-                if node.get('tags'):
-                    used_tags.update(node['tags'])
-                if node.get('children'):
-                    collect_space_tags(node['children'])
-        
-        collect_space_tags(space_data.get('root', []))
-        return used_tags
+        logger.info(f"🌐 读取 space-tree.json")
+        return space_tree.get_model().used_tags()
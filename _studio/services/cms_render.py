@@ -0,0 +1,230 @@
+"""
+MAERS CMS Render Stage
+Markdown 正文的服务端预渲染：生成经白名单清洗的 HTML，并提取标题大纲与图片引用。
+产物以 `<name>.md.render.json` 形式存放在源文件旁，按内容哈希判定是否需要重新渲染。
+"""
+import os
+import re
+import json
+import sqlite3
+from html import escape, unescape
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor
+
+from . import cms_content
+from . import log
+
+logger = log.get_logger('CMS')
+
+try:
+    import markdown
+    HAS_MARKDOWN = True
+except ImportError:
+    HAS_MARKDOWN = False
+    logger.warning("⚠️  未检测到 Markdown 库，服务端预渲染已禁用 | Markdown library missing, pre-rendering disabled")
+
+# 渲染器版本号，变更渲染规则时递增以使全部产物失效
+RENDERER_VERSION = 2
+ARTIFACT_SUFFIX = '.render.json'
+MD_EXTENSIONS = ['extra', 'sane_lists', 'toc']
+
+# 代码块 (高亮 / 图表) 与数学公式只有前台 Vditor.preview 能完整呈现，产物标记 rich 后前台退回客户端渲染
+RICH_PATTERN = re.compile(r'^\s*(?:```|~~~)|\$\$|(?<![\\$\w])\$[^\s$][^$\n]*\$', re.M)
+
+# ================= HTML 白名单清洗 =================
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'dd', 'del', 'details', 'div', 'dl', 'dt',
+    'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'ins', 'kbd', 'li', 'mark',
+    'ol', 'p', 'pre', 's', 'span', 'strong', 'sub', 'summary', 'sup', 'table', 'tbody',
+    'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'noscript', 'template'}
+ALLOWED_ATTRS = {
+    '*': {'class', 'id', 'title', 'align'},
+    'a': {'href', 'name'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+    'ol': {'start'},
+}
+URL_ATTRS = {'href', 'src'}
+SAFE_SCHEMES = ('http:', 'https:', 'mailto:', '#', '/', './', '../')
+
+def _is_safe_url(value):
+    v = value.strip().lower()
+    if ':' not in v.split('/', 1)[0]:
+        return True  # 相对路径
+    return v.startswith(SAFE_SCHEMES)
+
+class SanitizingParser(HTMLParser):
+    """单遍清洗 HTML，同时收集标题大纲与图片引用"""
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.out = []
+        self.outline = []
+        self.images = []
+        self._drop_depth = 0
+        self._heading = None
+
+    def _attrs(self, tag, attrs):
+        allowed = ALLOWED_ATTRS['*'] | ALLOWED_ATTRS.get(tag, set())
+        parts = []
+        for name, value in attrs:
+            name = name.lower()
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRS and not _is_safe_url(value):
+                continue
+            parts.append(f' {name}="{escape(value, quote=True)}"')
+        return ''.join(parts)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self._drop_depth += 1
+            return
+        if self._drop_depth or tag not in ALLOWED_TAGS:
+            return
+        if tag == 'img':
+            src = dict(attrs).get('src')
+            if src and _is_safe_url(src):
+                self.images.append(src)
+        if tag in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+            self._heading = {"level": int(tag[1]), "id": dict(attrs).get('id', ''), "text": ''}
+        self.out.append(f"<{tag}{self._attrs(tag, attrs)}>")
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self._drop_depth = max(0, self._drop_depth - 1)
+            return
+        if self._drop_depth or tag not in ALLOWED_TAGS or tag in VOID_TAGS:
+            return
+        if self._heading and tag == f"h{self._heading['level']}":
+            self._heading['text'] = self._heading['text'].strip()
+            self.outline.append(self._heading)
+            self._heading = None
+        self.out.append(f"</{tag}>")
+
+    def handle_data(self, data):
+        if self._drop_depth:
+            return
+        if self._heading is not None:
+            self._heading['text'] += data
+        self.out.append(escape(data, quote=False))
+
+    def handle_entityref(self, name):
+        self._handle_ref(f"&{name};")
+
+    def handle_charref(self, name):
+        self._handle_ref(f"&#{name};")
+
+    def _handle_ref(self, ref):
+        if self._drop_depth:
+            return
+        if self._heading is not None:
+            self._heading['text'] += unescape(ref)
+        self.out.append(ref)
+
+def sanitize_html(html):
+    """返回 (clean_html, outline, images)"""
+    parser = SanitizingParser()
+    parser.feed(html)
+    parser.close()
+    return ''.join(parser.out), parser.outline, parser.images
+
+# ================= 渲染与产物 =================
+
+def artifact_path(md_path):
+    return md_path + ARTIFACT_SUFFIX
+
+def source_hash(text):
+    return f"v{RENDERER_VERSION}-{cms_content.content_hash(text)}"
+
+def render_markdown(text):
+    raw_html = markdown.markdown(text, extensions=MD_EXTENSIONS, output_format='html')
+    return sanitize_html(raw_html)
+
+def _read_artifact_hash(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('hash')
+    except (OSError, ValueError):
+        return None
+
+def render_note(md_path, text=None):
+    """
+    渲染单个 .md 文件到旁路产物。
+    返回 'rendered' / 'unchanged' / 'skipped'
+    """
+    if not HAS_MARKDOWN:
+        return 'skipped'
+    if text is None:
+        result = cms_content.read_content(md_path)
+        if result is None:
+            return 'skipped'
+        text = result[0]
+
+    target = artifact_path(md_path)
+    digest = source_hash(text)
+    if _read_artifact_hash(target) == digest:
+        return 'unchanged'
+
+    html, outline, images = render_markdown(text)
+    payload = {"hash": digest, "html": html, "outline": outline, "images": images,
+               "rich": bool(RICH_PATTERN.search(text))}
+
+    temp_path = target + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(temp_path, target)
+    return 'rendered'
+
+def move_artifact(old_md_path, new_md_path):
+    old_target = artifact_path(old_md_path)
+    if os.path.exists(old_target):
+        os.replace(old_target, artifact_path(new_md_path))
+
+def remove_artifact(md_path):
+    target = artifact_path(md_path)
+    if os.path.exists(target):
+        os.remove(target)
+
+# ================= 全量重建 =================
+
+def _render_worker(md_path):
+    try:
+        return md_path, render_note(md_path), None
+    except Exception as e:
+        return md_path, 'error', str(e)
+
+def collect_note_paths(db_path, data_dir):
+    """从 nodes.content 收集所有 .md 源文件路径"""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT content FROM nodes WHERE content LIKE '%.md'").fetchall()
+    conn.close()
+    paths = [os.path.join(data_dir, r[0]) for r in rows if r[0]]
+    return [p for p in paths if os.path.exists(p)]
+
+def rebuild_all(db_path, data_dir, workers=None):
+    """多进程并行重建全部产物，未变化的笔记直接跳过"""
+    if not HAS_MARKDOWN:
+        logger.warning("⚠️  缺少 Markdown 库，跳过预渲染 | Markdown library missing, render skipped")
+        return {}
+
+    paths = collect_note_paths(db_path, data_dir)
+    summary = {'rendered': 0, 'unchanged': 0, 'skipped': 0, 'error': 0}
+    if not paths:
+        return summary
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for md_path, status, err in pool.map(_render_worker, paths, chunksize=16):
+            summary[status] += 1
+            if err:
+                logger.error(f"❌ 渲染失败 | Render failed: {md_path} ({err})")
+
+    logger.info(f"🖨️  预渲染完成 | Render complete: {summary}")
+    return summary
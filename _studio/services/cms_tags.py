@@ -2,6 +2,10 @@ import os
 import json
 import sqlite3
 
+from . import log
+
+logger = log.get_logger('CMS')
+
 # ================= 策略基类 =================
 
 class TagStrategy:
@@ -41,7 +45,7 @@ class CmsTagStrategy(TagStrategy):
             with open(filepath, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except Exception as e:
-            print(f"Error reading tag categories for {module}: {e}")
+            logger.error(f"❌ 标签分类读取失败 | Error reading tag categories for {module}: {e}")
             return []
 
     def save_categories(self, data, module):
@@ -51,7 +55,7 @@ class CmsTagStrategy(TagStrategy):
                 json.dump(data, f, ensure_ascii=False, indent=2)
             return True
         except Exception as e:
-            print(f"Error saving tag categories for {module}: {e}")
+            logger.error(f"❌ 标签分类保存失败 | Error saving tag categories for {module}: {e}")
             return False
 
     def rename_tag(self, module, old_name, new_name):
@@ -115,7 +119,7 @@ class CmsTagStrategy(TagStrategy):
 
     def cleanup_tags(self, module):
         used_tags = set()
-        print(f"  [ CMS ] 📝 查询 cms.db, module={module}")
+        logger.debug(f"📝 查询 cms.db, module={module}")
         conn = self.context['get_db']()
         cursor = conn.cursor()
         cursor.execute("SELECT tags FROM nodes WHERE module=?", (module,))
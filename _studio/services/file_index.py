@@ -0,0 +1,271 @@
+"""
+MAERS File Index
+项目文件的持久化索引 + 模糊搜索 (open-file.py 与管理后台共用)：
+- 索引按目录存储于 cache/file-index.json；刷新时逐目录比较 mtime，只重新列举发生变化的目录
+- 查询在拼接后的小写语料上用正则一次扫描 (C 层实现)，按 完全匹配 > 前缀 > 子串 > 子序列 分级排序
+- 子序列 (模糊) 级别先用字符索引筛出包含查询全部字符的行，只在候选行拼成的子语料上扫描
+"""
+import os
+import re
+import json
+import time
+import bisect
+import operator
+import threading
+from itertools import accumulate, repeat
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+INDEX_PATH = os.path.join(CACHE_DIR, 'file-index.json')
+
+IGNORE_DIRS = {'.git', 'node_modules', '__pycache__', 'venv', '.idea', '.vscode', 'photos', 'data', 'ui', '说明', 'plugins', 'cache'}
+INDEX_VERSION = 1
+DEFAULT_LIMIT = 20
+REFRESH_INTERVAL = 2.0   # 服务器端查询时两次刷新的最小间隔 (秒)
+MAX_CANDIDATES = 2000    # 单级匹配数上限 (极短查询时避免对全部文件逐个排序)
+PREFILTER_RATIO = 4      # 字符索引筛出的候选超过全部行的 1/4 时，直接扫描整份语料更快
+
+# 排序分级 (越小越靠前)
+TIER_EXACT, TIER_PREFIX, TIER_NAME, TIER_PATH, TIER_FUZZY_NAME, TIER_FUZZY_PATH = range(6)
+
+class FileIndex:
+    def __init__(self, root=PROJECT_ROOT, index_path=INDEX_PATH, ignore_dirs=IGNORE_DIRS):
+        self.root = root
+        self.index_path = index_path
+        self.ignore_dirs = set(ignore_dirs)
+        self.lock = threading.Lock()
+        self.dirs = {}          # rel_dir -> {'mtime_ns': int, 'files': [...], 'dirs': [...]}
+        self.paths = []         # 扁平化的相对路径 (以 / 分隔)
+        self._name_corpus = ''
+        self._path_corpus = ''
+        self._name_starts = []
+        self._path_starts = []
+        self._name_lines = []
+        self._path_lines = []
+        self._name_chars = {}   # 字符 -> 每行一字节 (0/1) 的位图 (转为 int 以便按位与)，查询时按需建立
+        self._path_chars = {}
+        self._last_refresh = 0.0
+        self.last_stats = {}
+
+    # ---------- 持久化 ----------
+
+    def load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION and data.get('root') == self.root:
+                self.dirs = data.get('dirs', {})
+        except (OSError, ValueError):
+            self.dirs = {}
+        return self
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'root': self.root, 'dirs': self.dirs}, f,
+                      ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, self.index_path)
+
+    # ---------- 增量刷新 ----------
+
+    def _abs(self, rel_dir):
+        return os.path.join(self.root, rel_dir.replace('/', os.sep)) if rel_dir else self.root
+
+    def refresh(self):
+        """逐目录比较 mtime：未变化的目录沿用缓存 (1 次 stat)，变化的目录重新 scandir"""
+        with self.lock:
+            start = time.perf_counter()
+            stats = {'dirs': 0, 'rescanned': 0}
+            fresh = {}
+            stack = ['']
+            while stack:
+                rel_dir = stack.pop()
+                full_path = self._abs(rel_dir)
+                try:
+                    mtime_ns = os.stat(full_path).st_mtime_ns
+                except OSError:
+                    continue
+                stats['dirs'] += 1
+                entry = self.dirs.get(rel_dir)
+                if entry is None or entry['mtime_ns'] != mtime_ns:
+                    files, subdirs = [], []
+                    try:
+                        with os.scandir(full_path) as it:
+                            for e in it:
+                                if e.is_dir(follow_symlinks=False):
+                                    if e.name not in self.ignore_dirs:
+                                        subdirs.append(e.name)
+                                else:
+                                    files.append(e.name)
+                    except OSError:
+                        continue
+                    entry = {'mtime_ns': mtime_ns, 'files': sorted(files), 'dirs': sorted(subdirs)}
+                    stats['rescanned'] += 1
+                fresh[rel_dir] = entry
+                prefix = rel_dir + '/' if rel_dir else ''
+                stack.extend(prefix + d for d in entry['dirs'])
+
+            changed = stats['rescanned'] > 0 or len(fresh) != len(self.dirs)
+            self.dirs = fresh
+            if changed or not self.paths:
+                self._rebuild()
+            self._last_refresh = time.time()
+            stats['files'] = len(self.paths)
+            stats['changed'] = changed
+            stats['ms'] = round((time.perf_counter() - start) * 1000, 1)
+            self.last_stats = stats
+        if changed:
+            self.save()
+        return stats
+
+    def refresh_if_stale(self, interval=REFRESH_INTERVAL):
+        if time.time() - self._last_refresh >= interval:
+            self.refresh()
+
+    def _rebuild(self):
+        paths, names = [], []
+        for rel_dir in sorted(self.dirs):
+            files = self.dirs[rel_dir]['files']
+            prefix = rel_dir + '/' if rel_dir else ''
+            paths.extend(prefix + name for name in files)
+            names.extend(files)
+        self.paths = paths
+        self._name_corpus, self._name_starts = self._corpus(names)
+        self._path_corpus, self._path_starts = self._corpus(paths)
+        self._name_lines = self._name_corpus.split('\n') if names else []
+        self._path_lines = self._path_corpus.split('\n') if paths else []
+        self._name_chars, self._path_chars = {}, {}
+
+    @staticmethod
+    def _corpus(lines):
+        """
+        小写后以换行拼接，并记录每行起始偏移 (用于把匹配位置映射回文件序号)。
+        整体 lower() 与偏移计算都在 C 层完成；极少数大小写转换会改变长度的字符时退回逐行处理。
+        """
+        corpus = '\n'.join(lines)
+        lowered = corpus.lower()
+        if len(lowered) != len(corpus):
+            lines = [line.lower() for line in lines]
+            lowered = '\n'.join(lines)
+        starts = list(accumulate(map((1).__add__, map(len, lines)), initial=0))
+        starts.pop()
+        return lowered, starts
+
+    # ---------- 查询 ----------
+
+    @staticmethod
+    def _fuzzy_pattern(query):
+        """子序列匹配：每个字符前用排除该字符的字符类，找到即停，不会回溯"""
+        parts = [re.escape(query[0])]
+        for c in query[1:]:
+            parts.append(f"[^\\n{re.escape(c)}]*{re.escape(c)}")
+        return re.compile(''.join(parts))
+
+    @staticmethod
+    def _prefilter(query, lines, chars):
+        """
+        返回 (子语料, 行起始偏移, 原行号列表)；候选过多时返回 None (调用方改为扫描整份语料)。
+        chars 缓存每个字符的行位图：0/1 字节序列转为 int 后按位与即是逐行求交 (均在 C 层完成)。
+        """
+        mask = None
+        for c in set(query):
+            bits = chars.get(c)
+            if bits is None:
+                bits = chars[c] = int.from_bytes(bytes(map(operator.contains, lines, repeat(c))), 'little')
+            mask = bits if mask is None else mask & bits
+        flags = mask.to_bytes(len(lines), 'little')
+        if flags.count(1) * PREFILTER_RATIO > len(lines):
+            return None
+        ids = [m.start() for m in re.finditer(b'\x01', flags)]
+        sub_lines = [lines[i] for i in ids]
+        starts = list(accumulate(map((1).__add__, map(len, sub_lines)), initial=0))
+        starts.pop()
+        return '\n'.join(sub_lines), starts, ids
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        返回 [{ 'path', 'name', 'tier' }]，按 分级 > 子序列跨度 > 路径长度 排序。
+        每一级做一次正则扫描 (模糊级别只扫描字符索引筛出的候选行)；前面的级别凑满 limit 后不再继续。
+        """
+        q = (query or '').strip().lower().replace('\\', '/')
+        if not q:
+            return []
+
+        with self.lock:
+            paths = self.paths
+            name_corpus, name_starts = self._name_corpus, self._name_starts
+            path_corpus, path_starts = self._path_corpus, self._path_starts
+            name_lines, path_lines = self._name_lines, self._path_lines
+            name_chars, path_chars = self._name_chars, self._path_chars
+        if not paths:
+            return []
+
+        seen = {}
+
+        def collect(pattern, corpus, starts, classify, ids=None):
+            found = 0
+            for m in pattern.finditer(corpus):
+                idx = bisect.bisect_right(starts, m.start()) - 1
+                if ids is not None:
+                    idx = ids[idx]
+                if idx not in seen:
+                    seen[idx] = (classify(idx, m), m.end() - m.start())
+                    found += 1
+                    if found >= MAX_CANDIDATES:
+                        break
+
+        def name_tier(idx, m):
+            line_start = name_starts[idx]
+            line_end = name_starts[idx + 1] - 1 if idx + 1 < len(name_starts) else len(name_corpus)
+            if m.start() == line_start:
+                return TIER_EXACT if m.end() == line_end else TIER_PREFIX
+            return TIER_NAME
+
+        def fuzzy(lines, chars, corpus, starts, tier):
+            subset = self._prefilter(q, lines, chars)
+            if subset is None:
+                collect(pattern, corpus, starts, lambda i, m: tier)
+            elif subset[2]:
+                collect(pattern, subset[0], subset[1], lambda i, m: tier, ids=subset[2])
+
+        literal = re.compile(re.escape(q))
+        pattern = self._fuzzy_pattern(q)
+        passes = []
+        if '/' not in q:
+            passes.append(lambda: collect(literal, name_corpus, name_starts, name_tier))
+        passes.append(lambda: collect(literal, path_corpus, path_starts, lambda i, m: TIER_PATH))
+        if len(q) > 1:
+            if '/' not in q:
+                passes.append(lambda: fuzzy(name_lines, name_chars, name_corpus, name_starts, TIER_FUZZY_NAME))
+            passes.append(lambda: fuzzy(path_lines, path_chars, path_corpus, path_starts, TIER_FUZZY_PATH))
+
+        for run_pass in passes:
+            run_pass()
+            if len(seen) >= limit:
+                break
+
+        ranked = sorted(seen.items(), key=lambda kv: (kv[1], len(paths[kv[0]]), paths[kv[0]]))
+        return [
+            {'path': paths[idx], 'name': paths[idx].rsplit('/', 1)[-1], 'tier': tier}
+            for idx, (tier, _) in ranked[:limit]
+        ]
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """进程内单例 (首次调用时加载磁盘索引并刷新)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FileIndex().load()
+            _index.refresh()
+        return _index
+
+def search(query, limit=DEFAULT_LIMIT):
+    index = get_index()
+    index.refresh_if_stale()
+    return index.search(query, limit)
@@ -0,0 +1,176 @@
+"""
+MAERS Filesystem Snapshot
+以目录为单位的存在性快照：每个目录只用 os.scandir 列举一次，
+之后的 exists 查询全部命中内存集合，替代逐个路径的 os.path.exists (stat)。
+- 可选地持久化为清单 (manifest)，下次按目录 mtime 校验后直接复用
+- 统计快照实际发起的 scandir / stat 调用数，并与逐个 stat 的估算值 (每次查询一次 stat，未实测) 对比
+"""
+import os
+import json
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+DEFAULT_MANIFEST = os.path.join(CACHE_DIR, 'fs-manifest.json')
+
+# Windows 文件系统大小写不敏感，与 os.path.exists 的行为保持一致
+CASE_INSENSITIVE = os.name == 'nt'
+
+def _key(name):
+    return name.lower() if CASE_INSENSITIVE else name
+
+class FsSnapshot:
+    def __init__(self, base=PROJECT_ROOT, manifest_path=None):
+        self.base = base
+        self.manifest_path = manifest_path
+        self.dirs = {}        # rel_dir -> {'files': {key: name}, 'dirs': {key: name}, 'mtime_ns': int}
+        self.lookups = 0      # exists 查询次数 (逐个 stat 时约等于 stat 调用数，仅为估算)
+        self.scandir_calls = 0
+        self.stat_calls = 0
+        self._manifest = self._load_manifest() if manifest_path else {}
+
+    # ---------- 清单 ----------
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if data.get('base') == self.base else {}
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self):
+        if not self.manifest_path:
+            return
+        dirs = {
+            rel: {'mtime_ns': d['mtime_ns'], 'files': sorted(d['files'].values()), 'dirs': sorted(d['dirs'].values())}
+            for rel, d in self.dirs.items() if d is not None
+        }
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'base': self.base, 'dirs': dirs}, f, ensure_ascii=False)
+        os.replace(temp_path, self.manifest_path)
+
+    # ---------- 目录列举 ----------
+
+    @staticmethod
+    def _norm(rel_path):
+        rel_path = (rel_path or '').replace('\\', '/').strip('/')
+        return '' if rel_path == '.' else rel_path
+
+    def _abs(self, rel_dir):
+        return os.path.join(self.base, rel_dir.replace('/', os.sep)) if rel_dir else self.base
+
+    def _listing(self, rel_dir):
+        """返回目录列举结果 (不存在时为 None)，每个目录至多列举一次"""
+        if rel_dir in self.dirs:
+            return self.dirs[rel_dir]
+
+        full_path = self._abs(rel_dir)
+        cached = self._manifest.get('dirs', {}).get(rel_dir)
+        if cached is not None:
+            self.stat_calls += 1
+            try:
+                mtime_ns = os.stat(full_path).st_mtime_ns
+            except OSError:
+                mtime_ns = None
+            if mtime_ns is not None and mtime_ns == cached['mtime_ns']:
+                listing = {
+                    'mtime_ns': mtime_ns,
+                    'files': {_key(n): n for n in cached['files']},
+                    'dirs': {_key(n): n for n in cached['dirs']},
+                }
+                self.dirs[rel_dir] = listing
+                return listing
+
+        self.scandir_calls += 1
+        listing = {'mtime_ns': None, 'files': {}, 'dirs': {}}
+        try:
+            with os.scandir(full_path) as it:
+                for entry in it:
+                    bucket = 'dirs' if entry.is_dir() else 'files'
+                    listing[bucket][_key(entry.name)] = entry.name
+            if self.manifest_path:
+                self.stat_calls += 1
+                listing['mtime_ns'] = os.stat(full_path).st_mtime_ns
+        except OSError:
+            listing = None
+        self.dirs[rel_dir] = listing
+        return listing
+
+    # ---------- 查询 ----------
+
+    def exists(self, rel_path):
+        """等价于 os.path.exists(base/rel_path)"""
+        self.lookups += 1
+        rel_path = self._norm(rel_path)
+        if not rel_path:
+            return os.path.isdir(self.base)
+        parent, _, name = rel_path.rpartition('/')
+        listing = self._listing(parent)
+        if listing is None:
+            return False
+        key = _key(name)
+        return key in listing['files'] or key in listing['dirs']
+
+    def isdir(self, rel_path):
+        self.lookups += 1
+        rel_path = self._norm(rel_path)
+        parent, _, name = rel_path.rpartition('/')
+        listing = self._listing(parent)
+        return listing is not None and _key(name) in listing['dirs']
+
+    def listdir(self, rel_dir):
+        listing = self._listing(self._norm(rel_dir))
+        if listing is None:
+            return []
+        return list(listing['dirs'].values()) + list(listing['files'].values())
+
+    def walk_files(self, rel_root):
+        """递归列出 rel_root 下全部文件的相对路径 (以 / 分隔)"""
+        rel_root = self._norm(rel_root)
+        listing = self._listing(rel_root)
+        if listing is None:
+            return
+        prefix = rel_root + '/' if rel_root else ''
+        for name in listing['files'].values():
+            yield prefix + name
+        for name in list(listing['dirs'].values()):
+            yield from self.walk_files(prefix + name)
+
+    # ---------- 变更同步 ----------
+
+    def add(self, rel_path, is_dir=False):
+        rel_path = self._norm(rel_path)
+        parent, _, name = rel_path.rpartition('/')
+        listing = self.dirs.get(parent)
+        if listing is not None:
+            listing['dirs' if is_dir else 'files'][_key(name)] = name
+            listing['mtime_ns'] = None
+
+    def discard(self, rel_path):
+        rel_path = self._norm(rel_path)
+        parent, _, name = rel_path.rpartition('/')
+        listing = self.dirs.get(parent)
+        if listing is not None:
+            listing['files'].pop(_key(name), None)
+            listing['dirs'].pop(_key(name), None)
+            listing['mtime_ns'] = None
+
+    # ---------- 统计 ----------
+
+    def stats(self):
+        return {
+            'lookups': self.lookups,
+            'naive_stat_estimate': self.lookups,
+            'scandir_calls': self.scandir_calls,
+            'stat_calls': self.stat_calls,
+            'syscalls': self.scandir_calls + self.stat_calls,
+        }
+
+    def report(self):
+        s = self.stats()
+        return (f"存在性检查 {s['lookups']} 次: 逐个 stat 估算约 {s['naive_stat_estimate']} 次调用 (未实测)，"
+                f"快照实际 {s['syscalls']} 次 (scandir {s['scandir_calls']} + stat {s['stat_calls']})")
@@ -0,0 +1,173 @@
+"""
+MAERS Image Variants
+缩略图 / 预览图按请求的 Accept 头协商编码 (studio 静态文件路径)：
+- 同一衍生图可有多种编码：name.avif / name.webp / name.jpg，按 AVIF > WebP > JPEG 选择客户端支持的最小格式
+- 所需编码不存在时从原图 (photos/images/) 或已有的其他编码按需生成并落盘缓存，之后直接命中
+- 请求地址的扩展名只用于定位衍生图 (也可以不带扩展名)，实际编码由 Accept 决定，响应带 Vary: Accept
+"""
+import os
+import posixpath
+import threading
+import urllib.parse
+
+from . import photos
+from . import log
+
+logger = log.get_logger('PHOTOS')
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+
+# 衍生图目录 -> 最大边长
+VARIANT_DIRS = {
+    photos.THUMB_DIR: (600, 600),
+    photos.PREVIEW_DIR: (2560, 2560),
+}
+# 格式: (名称, 扩展名, MIME, Pillow 编码名, 保存参数)，按优先级排列
+FORMATS = (
+    ('avif', '.avif', 'image/avif', 'AVIF', {'quality': 70}),
+    ('webp', '.webp', 'image/webp', 'WEBP', {'quality': 80}),
+    ('jpeg', '.jpg', 'image/jpeg', 'JPEG', {'quality': 85, 'optimize': True}),
+)
+FORMAT_EXTS = {ext: name for name, ext, *_ in FORMATS}
+FALLBACK_FORMAT = 'jpeg'  # 所有客户端都支持
+
+_lock = threading.Lock()
+_unsupported = set()   # 当前 Pillow 无法编码的格式 (如未安装 AVIF 插件)
+_failed = set()        # 生成失败的目标文件，避免每次请求重试
+
+def _variant_dir(rel_path):
+    for prefix in VARIANT_DIRS:
+        if rel_path.startswith(prefix + '/'):
+            return prefix
+    return None
+
+def is_variant_path(url_path):
+    return _variant_dir(url_path.lstrip('/')) is not None
+
+def strip_format(rel_path):
+    """衍生图路径去掉编码扩展名 (原图或其他路径原样返回)"""
+    if not rel_path or not _variant_dir(rel_path):
+        return rel_path
+    stem, ext = os.path.splitext(rel_path)
+    return stem if ext.lower() in FORMAT_EXTS else rel_path
+
+def sibling_paths(rel_path):
+    """同一衍生图的全部编码路径 (用于删除与清理时的引用保护)"""
+    stem = strip_format(rel_path)
+    if stem == rel_path and not _variant_dir(rel_path or ''):
+        return [rel_path] if rel_path else []
+    return [stem + ext for ext in FORMAT_EXTS]
+
+def accepted_formats(accept):
+    """按优先级返回客户端接受的格式；JPEG 始终兜底"""
+    accept = (accept or '').lower()
+    formats = []
+    for name, _, mime, _, _ in FORMATS:
+        for part in accept.split(','):
+            fields = [f.strip() for f in part.split(';')]
+            if fields[0] != mime:
+                continue
+            q = next((f[2:] for f in fields[1:] if f.startswith('q=')), '1')
+            try:
+                if float(q) > 0:
+                    formats.append(name)
+            except ValueError:
+                pass
+    if FALLBACK_FORMAT not in formats:
+        formats.append(FALLBACK_FORMAT)
+    return formats
+
+def _full(rel_path):
+    return os.path.join(PROJECT_ROOT, rel_path.replace('/', os.sep))
+
+def _find_source(stem):
+    """生成用的源图：优先原图 (photos/images/<分类>/同名.*)，其次已有的其他编码"""
+    variant_dir = _variant_dir(stem)
+    rel_in_dir = stem[len(variant_dir) + 1:]
+    original_stem = f"{photos.BASE_IMAGE_DIR}/{rel_in_dir}"
+    candidates = []
+    folder = os.path.dirname(_full(original_stem))
+    base = os.path.basename(original_stem)
+    try:
+        with os.scandir(folder) as entries:
+            candidates += [e.path for e in entries if e.is_file() and os.path.splitext(e.name)[0] == base]
+    except OSError:
+        pass
+    candidates += [_full(stem + ext) for ext in FORMAT_EXTS if os.path.exists(_full(stem + ext))]
+    return candidates[0] if candidates else None
+
+def _generate(stem, fmt):
+    _, ext, _, encoder, params = next(f for f in FORMATS if f[0] == fmt)
+    target = _full(stem + ext)
+    source = _find_source(stem)
+    if source is None or not photos.ensure_pil():
+        return None
+    if fmt == 'avif' or source.lower().endswith('.avif'):
+        try: import pillow_avif  # noqa: F401  (旧版 Pillow 的 AVIF 插件)
+        except ImportError: pass
+
+    from PIL import Image, ImageOps
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail(VARIANT_DIRS[_variant_dir(stem)])
+        if fmt == 'jpeg' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        temp_path = target + '.tmp'
+        try:
+            img.save(temp_path, encoder, **params)
+        except (KeyError, OSError, ValueError):
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    os.replace(temp_path, target)
+    logger.debug(f"🎞️  衍生图已生成 | Variant generated: {stem}{ext}", source=os.path.basename(source), format=fmt)
+    return target
+
+def negotiate(url_path, accept):
+    """
+    为衍生图请求选择编码，返回 (文件路径, MIME)；不可用时返回 None (交给普通静态文件处理)
+    """
+    # 规范化后重新校验目录，防止 ../ 越出衍生图目录
+    rel_path = posixpath.normpath(urllib.parse.unquote(url_path).lstrip('/'))
+    if not _variant_dir(rel_path):
+        return None
+    stem = strip_format(rel_path)
+    formats = accepted_formats(accept)
+
+    # 1. 已存在的编码中客户端支持的最优者
+    for name, ext, mime, _, _ in FORMATS:
+        if name in formats and os.path.exists(_full(stem + ext)):
+            best_existing = (name, _full(stem + ext), mime)
+            break
+    else:
+        best_existing = None
+
+    # 2. 比已有编码更优的格式按需生成 (已有最优时直接返回)
+    with _lock:
+        for name, ext, mime, _, _ in FORMATS:
+            if best_existing and name == best_existing[0]:
+                return best_existing[1], best_existing[2]
+            if name not in formats or name in _unsupported or (stem + ext) in _failed:
+                continue
+            try:
+                path = _generate(stem, name)
+            except KeyError:
+                _unsupported.add(name)
+                logger.warning(f"⚠️  当前 Pillow 不支持 {name} 编码，跳过 | Encoder unavailable: {name}")
+                continue
+            except Exception as e:
+                _failed.add(stem + ext)
+                logger.warning(f"⚠️  衍生图生成失败 | Variant generation failed: {stem}{ext} - {e}")
+                continue
+            if path:
+                return path, mime
+    return (best_existing[1], best_existing[2]) if best_existing else None
+
+def remove_variants(rel_path):
+    """删除衍生图的全部编码 (含按需生成的)"""
+    for path in sibling_paths(rel_path):
+        full_path = _full(path)
+        if os.path.exists(full_path):
+            os.remove(full_path)
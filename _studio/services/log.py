@@ -0,0 +1,185 @@
+"""
+MAERS Logging
+结构化、非阻塞的服务日志 (替代热路径上的同步 print)：
+- 调用方只把日志记录放入内存队列，格式化与 IO 由后台 QueueListener 线程完成
+- 控制台保持原有的 "  [ MODULE ] 图标 中文 | English" 格式 (默认 INFO 及以上)
+- 文件为按大小轮转的 JSON Lines (cache/logs/studio.jsonl)，含级别、模块、路由及结构化字段
+- 环境变量: MAERS_LOG_LEVEL (文件级别，默认 INFO)、MAERS_CONSOLE_LEVEL (默认 INFO)、MAERS_LOG_DIR
+
+用法:
+    logger = log.get_logger('CMS')
+    logger.debug(f"📂 同步完成 | Sync complete: {path}", module=module, ms=12.5)
+"""
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+LOG_DIR = os.environ.get('MAERS_LOG_DIR') or os.path.join(BASE_DIR, 'cache', 'logs')
+LOG_FILE = 'studio.jsonl'
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 5
+ROOT_LOGGER = 'maers'
+
+_route = contextvars.ContextVar('maers_route', default=None)
+_listener = None
+_configured = False
+_config_lock = threading.Lock()
+
+# ================= 格式化 =================
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)),
+            'level': record.levelname,
+            'module': getattr(record, 'tag', record.name),
+            'msg': record.getMessage(),
+        }
+        route = getattr(record, 'route', None)
+        if route:
+            entry['route'] = route
+        for key, value in (getattr(record, 'fields', None) or {}).items():
+            entry.setdefault(key, value)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record):
+        text = f"  [ {getattr(record, 'tag', record.name)} ] {record.getMessage()}"
+        if record.exc_text:
+            text += '\n' + record.exc_text
+        return text
+
+class _ConsoleHandler(logging.StreamHandler):
+    """每次输出时取当前的 sys.stdout (兼容 redirect_stdout)"""
+    def emit(self, record):
+        self.stream = sys.stdout
+        super().emit(record)
+
+class _QueueHandler(QueueHandler):
+    """入队前只合并消息与异常文本，其余格式化留给监听线程"""
+    def prepare(self, record):
+        message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = message, None, None
+        return record
+
+# ================= 配置 =================
+
+def _level(value, default):
+    return getattr(logging, str(value or default).upper(), logging.INFO)
+
+def configure(level=None, console_level=None, log_dir=None, console=True):
+    """(重新) 配置日志输出；未显式调用时在首次写日志时按环境变量自动配置"""
+    global _listener, _configured
+    with _config_lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+
+        file_level = _level(level or os.environ.get('MAERS_LOG_LEVEL'), 'INFO')
+        term_level = _level(console_level or os.environ.get('MAERS_CONSOLE_LEVEL'), 'INFO')
+        handlers = []
+
+        log_dir = log_dir or LOG_DIR
+        try:
+            os.makedirs(log_dir, exist_ok=True)
+            file_handler = RotatingFileHandler(os.path.join(log_dir, LOG_FILE), maxBytes=MAX_BYTES,
+                                               backupCount=BACKUP_COUNT, encoding='utf-8', delay=True)
+            file_handler.setLevel(file_level)
+            file_handler.setFormatter(JsonLinesFormatter())
+            handlers.append(file_handler)
+        except OSError as e:
+            print(f"  [ LOG ] ⚠️  日志目录不可用，仅输出到控制台 | Log dir unavailable: {e}")
+
+        if console:
+            console_handler = _ConsoleHandler()
+            console_handler.setLevel(term_level)
+            console_handler.setFormatter(ConsoleFormatter())
+            handlers.append(console_handler)
+
+        q = queue.SimpleQueue()
+        root = logging.getLogger(ROOT_LOGGER)
+        root.handlers = [_QueueHandler(q)]
+        root.setLevel(min([h.level for h in handlers] or [logging.CRITICAL]))
+        root.propagate = False
+
+        _listener = QueueListener(q, *handlers, respect_handler_level=True)
+        _listener.start()
+        if not _configured:
+            atexit.register(shutdown)
+        _configured = True
+
+def shutdown():
+    """停止监听线程并落盘队列中剩余的日志"""
+    global _listener
+    with _config_lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+
+def _ensure_configured():
+    if not _configured:
+        configure()
+
+# ================= 请求上下文 =================
+
+def set_route(route):
+    """在请求线程中标记当前路由，返回用于 reset_route 的令牌"""
+    return _route.set(route)
+
+def reset_route(token):
+    _route.reset(token)
+
+# ================= Logger =================
+
+class StudioLogger:
+    """带模块标签与结构化字段的 logger：logger.info(msg, key=value, ...)"""
+    def __init__(self, tag):
+        self.tag = tag
+        self._logger = logging.getLogger(f"{ROOT_LOGGER}.{tag.lower()}")
+
+    def _log(self, level, msg, fields, exc_info=False):
+        _ensure_configured()
+        if self._logger.isEnabledFor(level):
+            extra = {'tag': self.tag, 'route': _route.get(), 'fields': fields}
+            self._logger.log(level, msg, extra=extra, exc_info=exc_info, stacklevel=3)
+
+    def debug(self, msg, **fields):
+        self._log(logging.DEBUG, msg, fields)
+
+    def info(self, msg, **fields):
+        self._log(logging.INFO, msg, fields)
+
+    def warning(self, msg, **fields):
+        self._log(logging.WARNING, msg, fields)
+
+    def error(self, msg, **fields):
+        self._log(logging.ERROR, msg, fields)
+
+    def exception(self, msg, **fields):
+        """ERROR 级别并附带当前异常的堆栈"""
+        self._log(logging.ERROR, msg, fields, exc_info=True)
+
+_loggers = {}
+
+def get_logger(tag):
+    logger = _loggers.get(tag)
+    if logger is None:
+        logger = _loggers.setdefault(tag, StudioLogger(tag))
+    return logger
@@ -0,0 +1,247 @@
+"""
+MAERS Request Metrics
+按路由统计请求数、状态码、延迟直方图、请求 / 响应字节数、数据库耗时与文件同步耗时：
+- Handler 在每个请求开始时 begin()，结束时 finish()；期间的数据库 / 同步耗时记入当前线程的请求
+- 计数器不加锁 (服务器为单线程，写入只发生在请求线程)，直方图使用固定桶
+- /api/_metrics 输出 JSON，?format=prometheus 输出 Prometheus 文本格式
+"""
+import time
+import bisect
+import sqlite3
+import threading
+import functools
+
+# 延迟桶上界 (秒)，最后一个隐含 +Inf
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_ROUTES = 200  # 路由数上限，超出后归入 OTHER_ROUTE (防止任意 404 路径撑爆统计)
+OTHER_ROUTE = '<other>'
+STATIC_ROUTE = '<static>'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_started = time.time()
+_local = threading.local()
+_routes = {}
+
+class RouteStats:
+    __slots__ = ('count', 'statuses', 'buckets', 'latency_sum', 'bytes_in', 'bytes_out',
+                 'db_seconds', 'db_calls', 'sync_seconds', 'sync_calls')
+
+    def __init__(self):
+        self.count = 0
+        self.statuses = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.db_seconds = 0.0
+        self.db_calls = 0
+        self.sync_seconds = 0.0
+        self.sync_calls = 0
+
+    def quantile(self, q):
+        """由直方图估算分位数 (返回所在桶的上界，秒)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+class _Request:
+    __slots__ = ('start', 'db_seconds', 'db_calls', 'sync_seconds', 'sync_calls')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_seconds = 0.0
+        self.db_calls = 0
+        self.sync_seconds = 0.0
+        self.sync_calls = 0
+
+# ================= 请求生命周期 =================
+
+def begin():
+    _local.request = _Request()
+
+def finish(route, status, bytes_in=0, bytes_out=0):
+    req = getattr(_local, 'request', None)
+    if req is None:
+        return
+    _local.request = None
+    elapsed = time.perf_counter() - req.start
+
+    stats = _routes.get(route)
+    if stats is None:
+        if len(_routes) >= MAX_ROUTES:
+            route = OTHER_ROUTE
+        stats = _routes.setdefault(route, RouteStats())
+    stats.count += 1
+    stats.statuses[status] = stats.statuses.get(status, 0) + 1
+    stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+    stats.latency_sum += elapsed
+    stats.bytes_in += bytes_in
+    stats.bytes_out += bytes_out
+    stats.db_seconds += req.db_seconds
+    stats.db_calls += req.db_calls
+    stats.sync_seconds += req.sync_seconds
+    stats.sync_calls += req.sync_calls
+
+def _add_db(seconds):
+    req = getattr(_local, 'request', None)
+    if req is not None:
+        req.db_seconds += seconds
+        req.db_calls += 1
+
+def _add_sync(seconds):
+    req = getattr(_local, 'request', None)
+    if req is not None:
+        req.sync_seconds += seconds
+        req.sync_calls += 1
+
+# ================= 数据库计时 =================
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            _add_db(time.perf_counter() - start)
+
+    def executemany(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().executemany(*args)
+        finally:
+            _add_db(time.perf_counter() - start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            _add_db(time.perf_counter() - start)
+
+class TimedConnection(sqlite3.Connection):
+    """execute / commit 计入当前请求的数据库耗时 (sqlite3.connect 的 factory)"""
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            _add_db(time.perf_counter() - start)
+
+def connect(path, **kwargs):
+    return sqlite3.connect(path, factory=TimedConnection, **kwargs)
+
+# ================= 文件同步计时 =================
+
+def timed_sync(func):
+    """装饰静态 JSON 同步函数，耗时计入当前请求的 sync 时间"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _add_sync(time.perf_counter() - start)
+    return wrapper
+
+# ================= 导出 =================
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+def _bound_ms(bound):
+    if bound is None:
+        return None
+    return '+Inf' if bound == float('inf') else _ms(bound)
+
+def snapshot():
+    routes = {}
+    for route, s in sorted(_routes.items()):
+        p50, p95, p99 = (s.quantile(q) for q in (0.5, 0.95, 0.99))
+        routes[route] = {
+            'count': s.count,
+            'statuses': {str(k): v for k, v in sorted(s.statuses.items())},
+            'latency_ms': {
+                'sum': _ms(s.latency_sum),
+                'mean': _ms(s.latency_sum / s.count) if s.count else 0.0,
+                'p50_le': _bound_ms(p50),
+                'p95_le': _bound_ms(p95),
+                'p99_le': _bound_ms(p99),
+                'buckets': {
+                    **{str(_ms(b)): n for b, n in zip(LATENCY_BUCKETS, s.buckets)},
+                    '+Inf': s.buckets[-1],
+                },
+            },
+            'bytes_in': s.bytes_in,
+            'bytes_out': s.bytes_out,
+            'db_ms': _ms(s.db_seconds),
+            'db_calls': s.db_calls,
+            'sync_ms': _ms(s.sync_seconds),
+            'sync_calls': s.sync_calls,
+        }
+    return {'uptime_s': round(time.time() - _started, 1), 'routes': routes}
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render_prometheus():
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ','.join(f'{k}="{_label(v)}"' for k, v in labels)
+            lines.append(f"{name}{{{label_text}}} {value}")
+
+    items = sorted(_routes.items())
+    metric('maers_http_requests_total', 'counter', 'Requests by route and status.',
+           [((('route', r), ('status', code)), n) for r, s in items for code, n in sorted(s.statuses.items())])
+
+    histogram = []
+    for r, s in items:
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS, s.buckets):
+            cumulative += n
+            histogram.append(((('route', r), ('le', bound)), cumulative))
+        histogram.append(((('route', r), ('le', '+Inf')), s.count))
+    lines.append("# HELP maers_http_request_duration_seconds Request latency.")
+    lines.append("# TYPE maers_http_request_duration_seconds histogram")
+    for labels, value in histogram:
+        label_text = ','.join(f'{k}="{_label(v)}"' for k, v in labels)
+        lines.append(f"maers_http_request_duration_seconds_bucket{{{label_text}}} {value}")
+    for r, s in items:
+        lines.append(f'maers_http_request_duration_seconds_sum{{route="{_label(r)}"}} {s.latency_sum:.6f}')
+        lines.append(f'maers_http_request_duration_seconds_count{{route="{_label(r)}"}} {s.count}')
+
+    metric('maers_http_request_bytes_total', 'counter', 'Request body bytes received.',
+           [((('route', r),), s.bytes_in) for r, s in items])
+    metric('maers_http_response_bytes_total', 'counter', 'Response bytes sent (headers included).',
+           [((('route', r),), s.bytes_out) for r, s in items])
+    metric('maers_db_seconds_total', 'counter', 'SQLite time spent inside requests.',
+           [((('route', r),), f"{s.db_seconds:.6f}") for r, s in items])
+    metric('maers_db_calls_total', 'counter', 'SQLite calls made inside requests.',
+           [((('route', r),), s.db_calls) for r, s in items])
+    metric('maers_sync_seconds_total', 'counter', 'Static JSON sync time spent inside requests.',
+           [((('route', r),), f"{s.sync_seconds:.6f}") for r, s in items])
+    metric('maers_sync_calls_total', 'counter', 'Static JSON syncs performed inside requests.',
+           [((('route', r),), s.sync_calls) for r, s in items])
+    lines.append(f"maers_uptime_seconds {time.time() - _started:.1f}")
+    return '\n'.join(lines) + '\n'
+
+def reset():
+    _routes.clear()
@@ -0,0 +1,118 @@
+"""
+MAERS Module Graph
+解析各 HTML 页面的入口 ESM 模块，沿静态 import 构建完整依赖图，并在 <head> 中写入
+<link rel="modulepreload"> 列表，使浏览器一次性发现整张模块图 (而不是逐层瀑布式发现)：
+- 入口：<script type="module" src> 以及内联 <script type="module"> 中的静态 import
+- 只跟随静态 import / export from；动态 import() 保持按需加载
+- 列表写在 <!-- <maers:modulepreload> --> 标记之间，重复运行只替换该区块
+"""
+import os
+import re
+import posixpath
+
+from . import asset_refs
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+
+PRELOAD_START = '<!-- <maers:modulepreload> 由 _studio/preload-modules.py 生成，请勿手动修改 -->'
+PRELOAD_END = '<!-- </maers:modulepreload> -->'
+_PRELOAD_BLOCK_RE = re.compile(r'[ \t]*<!-- <maers:modulepreload>.*?<!-- </maers:modulepreload> -->[ \t]*\n?', re.S)
+_SCRIPT_RE = re.compile(r'<script\b([^>]*)>(.*?)</script\s*>', re.S | re.I)
+_ATTR_RE = re.compile(r'''([\w-]+)\s*=\s*(["'])(.*?)\2''', re.S)
+_HEAD_END_RE = re.compile(r'^([ \t]*)</head\s*>', re.M | re.I)
+
+class ModuleGraph:
+    """模块 → 静态依赖 的缓存 (同一模块被多个页面引用时只解析一次)"""
+    def __init__(self, root=PROJECT_ROOT):
+        self.root = root
+        self._deps = {}
+
+    def exists(self, rel):
+        return os.path.isfile(os.path.join(self.root, rel.replace('/', os.sep)))
+
+    def deps(self, rel):
+        if rel not in self._deps:
+            try:
+                with open(os.path.join(self.root, rel.replace('/', os.sep)), 'r', encoding='utf-8') as f:
+                    text = f.read()
+            except (OSError, UnicodeDecodeError):
+                text = ''
+            self._deps[rel] = [d for d in asset_refs.find_deps(rel, text, static_imports=True) if self.exists(d)]
+        return self._deps[rel]
+
+    def walk(self, entries):
+        """广度优先遍历：返回 {模块: 发现轮次}，入口为第 1 轮"""
+        depth = {rel: 1 for rel in entries}
+        frontier = list(entries)
+        while frontier:
+            next_frontier = []
+            for rel in frontier:
+                for dep in self.deps(rel):
+                    if dep not in depth:
+                        depth[dep] = depth[rel] + 1
+                        next_frontier.append(dep)
+            frontier = next_frontier
+        return depth
+
+def page_entries(page_rel, html, exists):
+    """页面的入口模块：(src 引入的模块, 内联脚本静态 import 的模块)"""
+    src_entries, inline_entries = [], []
+    for m in _SCRIPT_RE.finditer(html):
+        attrs = {k.lower(): v for k, _, v in _ATTR_RE.findall(m.group(1))}
+        if attrs.get('type', '').lower() != 'module':
+            continue
+        if 'src' in attrs:
+            target = asset_refs.resolve(page_rel, attrs['src'], 'html')
+            if target and exists(target) and target not in src_entries:
+                src_entries.append(target)
+        else:
+            for target in asset_refs.find_deps(page_rel, m.group(2), static_imports=True):
+                if exists(target) and target not in inline_entries:
+                    inline_entries.append(target)
+    return src_entries, inline_entries
+
+def plan_page(graph, page_rel, html):
+    """返回 (需要预加载的模块列表, 原始发现轮次)：按发现轮次排序，不含 <script src> 入口本身"""
+    src_entries, inline_entries = page_entries(page_rel, html, graph.exists)
+    depth = graph.walk(src_entries + [e for e in inline_entries if e not in src_entries])
+    modules = sorted((rel for rel in depth if rel not in src_entries), key=lambda rel: (depth[rel], rel))
+    return modules, max(depth.values(), default=0)
+
+def render_page(page_rel, html, modules):
+    """写入 (或移除) modulepreload 区块，返回新的 HTML"""
+    html = _PRELOAD_BLOCK_RE.sub('', html)
+    head_end = _HEAD_END_RE.search(html)
+    if not modules or not head_end:
+        return html
+    indent = head_end.group(1) + '  '
+    page_dir = posixpath.dirname(page_rel)
+    lines = [indent + PRELOAD_START]
+    for rel in modules:
+        href = posixpath.relpath(rel, page_dir) if page_dir else rel
+        lines.append(f'{indent}<link rel="modulepreload" href="{href}" />')
+    lines.append(indent + PRELOAD_END)
+    return html[:head_end.start()] + '\n'.join(lines) + '\n' + html[head_end.start():]
+
+def list_pages(root=PROJECT_ROOT):
+    return sorted(name for name in os.listdir(root) if name.endswith('.html'))
+
+def update_pages(root=PROJECT_ROOT, pages=None, write=True):
+    """为各页面生成 modulepreload 列表；返回 [{'page', 'modules', 'depth', 'changed'}, ...]"""
+    graph = ModuleGraph(root)
+    report = []
+    for page in pages or list_pages(root):
+        path = os.path.join(root, page.replace('/', os.sep))
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            html = f.read()
+        modules, depth = plan_page(graph, page, html)
+        new_html = render_page(page, html, modules)
+        changed = new_html != html
+        if changed and write:
+            temp_path = path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+                f.write(new_html)
+            os.replace(temp_path, path)
+        report.append({'page': page, 'modules': modules, 'depth': depth, 'changed': changed})
+    return report
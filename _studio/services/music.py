@@ -1,47 +1,167 @@
-from . import cms
+from concurrent.futures import ThreadPoolExecutor
+from . import music_api
+from . import music_library
+from . import asset_gc
+from . import log
 
-MUSIC_JSON_FILE = 'data/music-data.json'
+logger = log.get_logger('MUSIC')
+
+REFRESH_WORKERS = 4
+
+def load_music_data():
+    """读取音乐数据 (含尚未落盘的合并写入)"""
+    return music_library.get_library().get_data()
 
 def save_music_data(data):
-    """保存音乐数据"""
-    cms.save_json(MUSIC_JSON_FILE, data)
+    """保存音乐数据 (整库替换，同时为缺失 id 的专辑分配稳定 id)"""
+    music_library.get_library().replace(data)
+    asset_gc.track_music(data)
     return {}
 
+def _resolve_album_id(body):
+    """优先使用 albumId；兼容旧的 catIdx/colIdx/albIdx 位置参数"""
+    if body.get('albumId'):
+        return body['albumId']
+    album_id = music_library.get_library().album_id_at(body['catIdx'], body['colIdx'], body['albIdx'])
+    if album_id is None:
+        raise IndexError(f"Album position out of range: {body['catIdx']}/{body['colIdx']}/{body['albIdx']}")
+    return album_id
+
+def _resolve_page(lib, album_id, body):
+    """优先使用分P页码 page；兼容旧的 trackIdx (page_mapping 中的位置)"""
+    try:
+        if 'page' in body:
+            return int(body['page'])
+        track_idx = int(body['trackIdx'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Invalid page/trackIdx: {body.get('page', body.get('trackIdx'))!r}")
+    alb = lib.get_album(album_id) or {}
+    mapping = alb.get('page_mapping') or list(range(1, alb.get('total', 1) + 1))
+    if not 0 <= track_idx < len(mapping):
+        raise IndexError(f"Track index out of range: {track_idx}")
+    return mapping[track_idx]
+
 def delete_track(body):
     """删除指定音轨"""
-    c, l, a, t = body['catIdx'], body['colIdx'], body['albIdx'], body['trackIdx']
-    m = cms.load_json(MUSIC_JSON_FILE)
-    
+    lib = music_library.get_library()
     try:
-        alb = m[c]['collections'][l]['albums'][a]
-        if 'page_mapping' not in alb: alb['page_mapping'] = list(range(1, alb.get('total', 1)+1))
-        if 'custom_parts' not in alb: alb['custom_parts'] = []
-        
-        if 0 <= t < len(alb['page_mapping']):
-            alb['page_mapping'].pop(t)
-            if t < len(alb['custom_parts']): alb['custom_parts'].pop(t)
-            alb['total'] = len(alb['page_mapping'])
-            cms.save_json(MUSIC_JSON_FILE, m)
-            print(f"  [ MUSIC ] 🗑️  音轨 {t+1} 已剔除 | Track {t+1} popped from: {alb.get('title', 'Unknown Album')}")
-        return {}
+        album_id = _resolve_album_id(body)
+        page = _resolve_page(lib, album_id, body)
+        alb = lib.delete_track(album_id, page)
+        logger.info(f"🗑️  音轨 P{page} 已剔除 | Track P{page} popped from: {alb.get('title', 'Unknown Album')}")
+        return {"albumId": album_id, "page": page}
     except (IndexError, KeyError) as e:
-        print(f"  [ MUSIC ] ❌ 删除音轨出错 | Delete track error: {e}")
+        logger.error(f"❌ 删除音轨出错 | Delete track error: {e}")
         raise e
 
 def reset_tracks(body):
     """重置专辑音轨"""
-    c, l, a = body['catIdx'], body['colIdx'], body['albIdx']
-    m = cms.load_json(MUSIC_JSON_FILE)
-    
+    lib = music_library.get_library()
     try:
-        alb = m[c]['collections'][l]['albums'][a]
-        orig = alb.get('bili_total', alb.get('total', 1))
-        alb['page_mapping'] = list(range(1, orig+1))
-        alb['total'] = orig
-        alb['custom_parts'] = []
-        cms.save_json(MUSIC_JSON_FILE, m)
-        print(f"  [ MUSIC ] ♻️  音轨已重置 ({orig}) | Tracks reset to original ({orig}) for: {alb.get('title', 'Album')}")
-        return {}
+        album_id = _resolve_album_id(body)
+        alb = lib.reset_tracks(album_id)
+        logger.info(f"♻️  音轨已重置 ({alb['total']}) | Tracks reset to original ({alb['total']}) for: {alb.get('title', 'Album')}")
+        return {"albumId": album_id}
     except (IndexError, KeyError) as e:
-        print(f"  [ MUSIC ] ❌ 重置音轨出错 | Reset tracks error: {e}")
+        logger.error(f"❌ 重置音轨出错 | Reset tracks error: {e}")
         raise e
+
+PATCH_ACTIONS = {
+    'delete_track': lambda lib, op: lib.delete_track(op['albumId'], int(op['page'])),
+    'rename_track': lambda lib, op: lib.rename_track(op['albumId'], int(op['page']), op['title']),
+    'reset_tracks': lambda lib, op: lib.reset_tracks(op['albumId']),
+    'update_album': lambda lib, op: lib.update_album(op['albumId'], op.get('fields', {})),
+}
+
+def _validate_op(i, op):
+    """校验单个补丁操作的结构 (格式错误抛 ValueError → 400)"""
+    if not isinstance(op, dict):
+        raise ValueError(f"Op at {i} must be an object")
+    action = op.get('action')
+    if action not in PATCH_ACTIONS:
+        raise ValueError(f"Unknown action at {i}: {action}")
+    if not isinstance(op.get('albumId'), str):
+        raise ValueError(f"Missing albumId at {i}")
+    if action in ('delete_track', 'rename_track'):
+        try:
+            int(op['page'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Invalid page at {i}: {op.get('page')!r}")
+    if action == 'rename_track' and not isinstance(op.get('title'), str):
+        raise ValueError(f"Invalid title at {i}")
+    if action == 'update_album' and not isinstance(op.get('fields', {}), dict):
+        raise ValueError(f"Invalid fields at {i}")
+
+def apply_patch(ops):
+    """
+    按专辑 id 执行一组增量修改，多次修改合并为一次落盘。
+    ops: [{ "action": "delete_track", "albumId": "...", "page": 3 }, ...]
+    全部操作先校验结构，再在同一事务中执行；任一操作失败 (如音轨不存在) 则整体不生效。
+    """
+    if not isinstance(ops, list):
+        raise ValueError("ops must be a list")
+    lib = music_library.get_library()
+    for i, op in enumerate(ops):
+        _validate_op(i, op)
+        if lib.get_album(op['albumId']) is None:
+            raise KeyError(f"Album not found at {i}: {op['albumId']}")
+
+    def apply():
+        results = []
+        for i, op in enumerate(ops):
+            PATCH_ACTIONS[op['action']](lib, op)
+            results.append({"index": i, "action": op['action'], "albumId": op['albumId']})
+        return results
+
+    results = lib.transaction(apply)
+    if any(op['action'] == 'update_album' for op in ops):
+        asset_gc.track_music(lib.get_data())
+    return {"results": results}
+
+def iter_albums(data):
+    """遍历 分类 → 合集 → 专辑"""
+    for cat in data if isinstance(data, list) else []:
+        for col in cat.get('collections', []):
+            for alb in col.get('albums', []):
+                yield alb
+
+def apply_video_info(alb, info):
+    """将 B站元数据写回专辑；已手动剔除过分P (page_mapping) 的专辑只更新原始信息"""
+    pages = info.get('pages', [])
+    alb['bili_total'] = len(pages)
+    alb['duration'] = info.get('duration', alb.get('duration'))
+    alb['durations'] = {str(p['page']): p['duration'] for p in pages}
+
+    if 'page_mapping' not in alb:
+        parts = list(alb.get('custom_parts') or [])
+        alb['custom_parts'] = parts[:len(pages)] + [p['part'] for p in pages[len(parts):]]
+        alb['total'] = len(pages)
+
+def refresh_library(force=False, max_workers=REFRESH_WORKERS):
+    """批量刷新 music-data.json 中所有专辑的 B站元数据 (并发受限，结果按 bvid 合并到最新数据)"""
+    lib = music_library.get_library()
+    with lib.lock:
+        bvids = [alb['bvid'] for alb in iter_albums(lib.get_data()) if alb.get('bvid')]
+    album_count, bvids = len(bvids), list(dict.fromkeys(bvids))
+    logger.info(f"🔄 批量刷新元数据 | Refreshing {len(bvids)} videos ({album_count} albums)")
+
+    results = {}
+    if bvids:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(bvids))) as pool:
+            for bvid, (code, info) in zip(bvids, pool.map(lambda b: music_api.get_video_info(b, force=force), bvids)):
+                results[bvid] = (code, info)
+
+    # 抓取期间可能有新的保存，重新取当前数据并按 bvid 应用结果
+    failed = set()
+    def apply(alb):
+        code, info = results.get(alb.get('bvid'), (None, None))
+        if code == 200:
+            apply_video_info(alb, info)
+            return True
+        if code is not None:
+            failed.add(alb['bvid'])
+        return False
+
+    updated = lib.update_albums(apply)
+    logger.info(f"✅ 刷新完成 | Refreshed {updated} albums, {len(failed)} failed")
+    return {"updated": updated, "failed": sorted(failed)}
@@ -1,40 +1,138 @@
 """
 MAERS Music API Module
 用于集成各种音乐/视频平台的 API 获取。
+Bilibili 元数据按 bvid 缓存于本地 (成功结果长 TTL，错误结果短 TTL 负缓存)。
 """
-import urllib.request
+import os
+import time
 import json
+import sqlite3
+import threading
+import urllib.request
 import urllib.parse
 
+from . import log
+
+logger = log.get_logger('BILI')
+
+# ================= 配置 =================
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+CACHE_DB = os.path.join(CACHE_DIR, 'bili-meta.db')
+
+# 可通过环境变量指向本地替身服务 (测试用)
+BILI_API_BASE = os.environ.get('MAERS_BILI_API', 'https://api.bilibili.com')
+FETCH_TIMEOUT = 8
+FETCH_RETRIES = 1
+CACHE_TTL = 24 * 3600
+NEGATIVE_TTL = 10 * 60   # API 明确返回视频不存在 (NOT_FOUND_CODES)
+ERROR_TTL = 60           # 网络异常或其他 API 错误 (风控 -412 / -352 等)，短暂负缓存避免反复请求
+NOT_FOUND_CODES = {-404, 62002}  # 视频不存在 / 稿件不可见
+
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+
+# ==========================================
+# 元数据缓存
+# ==========================================
+
+class BiliCache:
+    def __init__(self, db_path=CACHE_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS videos (
+                bvid TEXT PRIMARY KEY,
+                code INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def get(self, bvid):
+        """返回未过期的 (code, data)，否则 None"""
+        conn = self._connect()
+        row = conn.execute("SELECT code, data, fetched_at FROM videos WHERE bvid=?", (bvid,)).fetchone()
+        conn.close()
+        if not row:
+            return None
+        code, data, fetched_at = row
+        ttl = {200: CACHE_TTL, 404: NEGATIVE_TTL}.get(code, ERROR_TTL)
+        if time.time() - fetched_at > ttl:
+            return None
+        return code, json.loads(data)
+
+    def put(self, bvid, code, data):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO videos (bvid, code, data, fetched_at) VALUES (?, ?, ?, ?)",
+                     (bvid, code, json.dumps(data, ensure_ascii=False), time.time()))
+        conn.commit()
+        conn.close()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = BiliCache()
+        return _cache
+
 # ==========================================
 # BILIBILI API
 # ==========================================
 
-def get_video_info(bvid):
+def _fetch_video_info(bvid, timeout):
+    api_url = f"{BILI_API_BASE}/x/web-interface/view?bvid={urllib.parse.quote(bvid)}"
+    req = urllib.request.Request(api_url, headers=HEADERS)
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        data = json.loads(resp.read().decode('utf-8'))
+    if data.get('code') == 0:
+        v = data['data']
+        logger.info(f"✅ 元数据获取成功 | Metadata retrieved: {v['title']}")
+        return 200, {
+            "title": v['title'],
+            "duration": v['duration'],
+            "cover": v['pic'],
+            "pages": [{"page": p['page'], "part": p['part'], "duration": p['duration']} for p in v.get('pages', [])]
+        }
+    bili_code = data.get('code')
+    logger.warning(f"⚠️  API 响应错误 | API Error: {bili_code}")
+    if bili_code in NOT_FOUND_CODES:
+        return 404, {"error": "Video not found", "bili_code": bili_code}
+    # 其余错误多为临时性 (请求被拦截、限流)，按 502 走 ERROR_TTL 短缓存
+    return 502, {"error": f"Bilibili API error: {data.get('message') or bili_code}", "bili_code": bili_code}
+
+def get_video_info(bvid, force=False, timeout=FETCH_TIMEOUT):
     if not bvid:
         return 400, {"error": "Missing bvid"}
-    
-    try:
-        print(f"  [ BILI ] 🌐 正在获取元数据 | Fetching metadata for: {bvid}")
-        api_url = f"https://api.bilibili.com/x/web-interface/view?bvid={bvid}"
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        
-        req = urllib.request.Request(api_url, headers=headers)
-        with urllib.request.urlopen(req, timeout=5) as resp:
-            data = json.loads(resp.read().decode('utf-8'))
-            if data.get('code') == 0:
-                v = data['data']
-                print(f"  [ BILI ] ✅ 元数据获取成功 | Metadata retrieved: {v['title']}")
-                result = { 
-                    "title": v['title'], 
-                    "duration": v['duration'], 
-                    "cover": v['pic'],
-                    "pages": [{"page": p['page'], "part": p['part'], "duration": p['duration']} for p in v.get('pages', [])] 
-                }
-                return 200, result
-            else:
-                print(f"  [ BILI ] ⚠️  API 响应错误 | API Error: {data.get('code')}")
-                return 404, {"error": "Video not found or API error", "bili_code": data.get('code')}
-    except Exception as e:
-        print(f"  [ BILI ] ❌ 网络请求失败 | Network Error: {e}")
-        return 500, {"error": str(e)}
+
+    cache = get_cache()
+    if not force:
+        cached = cache.get(bvid)
+        if cached:
+            return cached
+
+    logger.info(f"🌐 正在获取元数据 | Fetching metadata for: {bvid}")
+    last_error = None
+    for attempt in range(FETCH_RETRIES + 1):
+        try:
+            code, result = _fetch_video_info(bvid, timeout)
+            cache.put(bvid, code, result)
+            return code, result
+        except Exception as e:
+            last_error = e
+            if attempt < FETCH_RETRIES:
+                time.sleep(0.5 * (attempt + 1))
+
+    logger.error(f"❌ 网络请求失败 | Network Error: {last_error}")
+    result = {"error": str(last_error)}
+    cache.put(bvid, 500, result)
+    return 500, result
@@ -0,0 +1,241 @@
+"""
+MAERS Music Library Model
+music-data.json 的常驻内存模型：
+- 专辑拥有稳定 id (缺失时自动分配并持久化)，音轨以 B站分P页码 (page) 作为专辑内稳定 id
+- album id → album 的 O(1) 索引，增量补丁操作
+- 写入原子替换，并在短时间窗口内合并多次修改为一次落盘
+"""
+import os
+import copy
+import json
+import time
+import atexit
+import threading
+
+from . import metrics
+from . import log
+
+logger = log.get_logger('MUSIC')
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+MUSIC_DATA_PATH = os.path.join(PROJECT_ROOT, 'data', 'music-data.json')
+
+WRITE_DELAY = 0.3  # 合并写入窗口 (秒)
+
+class MusicLibrary:
+    def __init__(self, path, write_delay=WRITE_DELAY):
+        self.path = path
+        self.write_delay = write_delay
+        self.lock = threading.RLock()
+        self.data = []
+        self.albums = {}
+        self._mtime = None
+        self._dirty = False
+        self._timer = None
+        self._id_seq = 0
+
+    # ---------- 加载与索引 ----------
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _ensure_fresh(self):
+        if self._dirty:
+            return  # 内存中有未落盘的修改，以内存为准
+        mtime = self._file_mtime()
+        if mtime is not None and mtime == self._mtime:
+            return
+        data = []
+        if mtime is not None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                logger.error(f"❌ 加载失败 | Load failed: {e}")
+        self._mtime = mtime
+        if self._set_data(data):
+            self._schedule_write()
+
+    def _new_album_id(self):
+        self._id_seq += 1
+        return f"alb_{int(time.time() * 1000)}_{self._id_seq}"
+
+    def _set_data(self, data):
+        """重建索引，返回是否为缺失 id 的专辑分配了新 id"""
+        self.data = data if isinstance(data, list) else []
+        self.albums = {}
+        assigned = False
+        for cat in self.data:
+            for col in cat.get('collections', []):
+                for alb in col.get('albums', []):
+                    if not alb.get('id') or alb['id'] in self.albums:
+                        alb['id'] = self._new_album_id()
+                        assigned = True
+                    self.albums[alb['id']] = alb
+        return assigned
+
+    # ---------- 写入 ----------
+
+    def _schedule_write(self):
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.write_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    @metrics.timed_sync
+    def flush(self):
+        """立即落盘所有挂起修改"""
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + '.tmp'
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.data, f, ensure_ascii=False, indent=2)
+                os.replace(temp_path, self.path)
+            except Exception as e:
+                logger.error(f"❌ 保存失败 | Save failed: {e}")
+                if os.path.exists(temp_path):
+                    try: os.remove(temp_path)
+                    except: pass
+                raise
+            self._mtime = self._file_mtime()
+            self._dirty = False
+
+    # ---------- 读取 ----------
+
+    def get_data(self):
+        """返回数据副本；修改须经补丁方法或 replace，不能直接改动常驻数据"""
+        with self.lock:
+            self._ensure_fresh()
+            return copy.deepcopy(self.data)
+
+    def get_album(self, album_id):
+        with self.lock:
+            self._ensure_fresh()
+            return self.albums.get(album_id)
+
+    def album_id_at(self, cat_idx, col_idx, alb_idx):
+        """兼容旧接口：位置索引 → 专辑 id"""
+        with self.lock:
+            self._ensure_fresh()
+            try:
+                return self.data[cat_idx]['collections'][col_idx]['albums'][alb_idx]['id']
+            except (IndexError, KeyError, TypeError):
+                return None
+
+    # ---------- 补丁操作 ----------
+
+    def replace(self, data):
+        """整库替换 (对应前端全量保存)，立即落盘"""
+        with self.lock:
+            self._set_data(copy.deepcopy(data))
+            self._dirty = True
+            self.flush()
+
+    def _require(self, album_id):
+        alb = self.albums.get(album_id)
+        if alb is None:
+            raise KeyError(f"Album not found: {album_id}")
+        return alb
+
+    @staticmethod
+    def _ensure_mapping(alb):
+        if 'page_mapping' not in alb:
+            alb['page_mapping'] = list(range(1, int(alb.get('total', 1)) + 1))
+        if 'custom_parts' not in alb:
+            alb['custom_parts'] = []
+
+    def delete_track(self, album_id, page):
+        """按分P页码剔除音轨"""
+        with self.lock:
+            self._ensure_fresh()
+            alb = self._require(album_id)
+            self._ensure_mapping(alb)
+            if page not in alb['page_mapping']:
+                raise KeyError(f"Track P{page} not found in album {album_id}")
+            idx = alb['page_mapping'].index(page)
+            alb['page_mapping'].pop(idx)
+            if idx < len(alb['custom_parts']):
+                alb['custom_parts'].pop(idx)
+            alb['total'] = len(alb['page_mapping'])
+            self._schedule_write()
+            return alb
+
+    def rename_track(self, album_id, page, title):
+        with self.lock:
+            self._ensure_fresh()
+            alb = self._require(album_id)
+            self._ensure_mapping(alb)
+            if page not in alb['page_mapping']:
+                raise KeyError(f"Track P{page} not found in album {album_id}")
+            idx = alb['page_mapping'].index(page)
+            parts = alb['custom_parts']
+            parts.extend(f"P{alb['page_mapping'][i]}" for i in range(len(parts), idx + 1))
+            parts[idx] = title
+            self._schedule_write()
+            return alb
+
+    def reset_tracks(self, album_id):
+        with self.lock:
+            self._ensure_fresh()
+            alb = self._require(album_id)
+            orig = int(alb.get('bili_total', alb.get('total', 1)))
+            alb['page_mapping'] = list(range(1, orig + 1))
+            alb['total'] = orig
+            alb['custom_parts'] = []
+            self._schedule_write()
+            return alb
+
+    def update_albums(self, apply):
+        """在当前数据上对每张专辑调用 apply(alb) (返回 True 表示有修改)，合并落盘，返回修改数量"""
+        with self.lock:
+            self._ensure_fresh()
+            changed = sum(1 for alb in list(self.albums.values()) if apply(alb))
+            if changed:
+                self._schedule_write()
+            return changed
+
+    def transaction(self, apply):
+        """在锁内执行 apply()；任一步骤抛错时恢复执行前的数据，不留下部分修改"""
+        with self.lock:
+            self._ensure_fresh()
+            snapshot, was_dirty = copy.deepcopy(self.data), self._dirty
+            try:
+                return apply()
+            except Exception:
+                self._set_data(snapshot)
+                self._dirty = was_dirty
+                raise
+
+    def update_album(self, album_id, fields):
+        with self.lock:
+            self._ensure_fresh()
+            alb = self._require(album_id)
+            for key, value in fields.items():
+                if key != 'id':
+                    alb[key] = value
+            self._schedule_write()
+            return alb
+
+_library = None
+_library_lock = threading.Lock()
+
+def get_library():
+    """进程内单例 (退出时自动落盘挂起的修改)"""
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = MusicLibrary(MUSIC_DATA_PATH)
+            atexit.register(_library.flush)
+        return _library
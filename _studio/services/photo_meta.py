@@ -0,0 +1,517 @@
+"""
+MAERS Photo Metadata
+不解码像素的图片元数据提取 (只读取文件头)：
+- 容器：JPEG (APP1 Exif / XMP + SOF)、PNG (IHDR / eXIf / iTXt)、WebP (VP8X / VP8 / VP8L / EXIF / XMP)、
+  AVIF / HEIC (ispe + Exif / XMP item)、TIFF；其他格式退回 Pillow 的惰性打开 (同样只读文件头)
+- 字段：宽高 (已按 Orientation 换算为显示尺寸)、相机、镜头、曝光参数、GPS、拍摄时间
+- 结果写入 gallery.db 的 photos 表 (带索引列)，上传时提取，存量图片由 backfill 并行补齐
+"""
+import io
+import os
+import re
+import time
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from . import log
+
+logger = log.get_logger('PHOTOS')
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+
+# photos 表中的元数据列 (meta_at 为提取时间，NULL 表示尚未提取)
+COLUMNS = (
+    ('width', 'INTEGER'),
+    ('height', 'INTEGER'),
+    ('camera', 'TEXT'),
+    ('lens', 'TEXT'),
+    ('exposure_time', 'REAL'),   # 秒
+    ('f_number', 'REAL'),
+    ('iso', 'INTEGER'),
+    ('focal_length', 'REAL'),    # 毫米
+    ('gps_lat', 'REAL'),
+    ('gps_lon', 'REAL'),
+    ('taken_at', 'REAL'),        # 拍摄时间 (本地时间戳)
+    ('meta_at', 'REAL'),
+)
+FIELDS = tuple(name for name, _ in COLUMNS if name != 'meta_at')
+INDEXES = {
+    'idx_taken_at': '(category, taken_at)',
+    'idx_camera': '(camera)',
+    'idx_lens': '(lens)',
+    'idx_gps': '(gps_lat, gps_lon)',
+}
+
+PARALLEL_THRESHOLD = 32  # 待提取图片少于该数量时不启动进程池
+MAX_BOX_BYTES = 4 * 1024 * 1024  # 单个元数据块的读取上限
+
+# ================= TIFF / EXIF =================
+
+_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+_TYPE_FORMATS = {1: 'B', 3: 'H', 4: 'I', 9: 'i'}
+
+# 需要的标签：IFD0 / Exif IFD / GPS IFD
+_IFD0_TAGS = {0x0100: 'tiff_width', 0x0101: 'tiff_height', 0x010F: 'make', 0x0110: 'model',
+              0x0112: 'orientation', 0x0132: 'datetime'}
+_EXIF_TAGS = {0x829A: 'exposure_time', 0x829D: 'f_number', 0x8827: 'iso', 0x9003: 'datetime_original',
+              0x9004: 'datetime_digitized', 0x920A: 'focal_length', 0xA002: 'pixel_width',
+              0xA003: 'pixel_height', 0xA434: 'lens_model'}
+_GPS_TAGS = {0x0001: 'lat_ref', 0x0002: 'lat', 0x0003: 'lon_ref', 0x0004: 'lon'}
+_EXIF_IFD, _GPS_IFD = 0x8769, 0x8825
+
+def _read_ifd(tiff, offset, endian, wanted, out):
+    """读取一个 IFD 中需要的标签，返回 {子 IFD 标签: 偏移}"""
+    pointers = {}
+    if offset + 2 > len(tiff):
+        return pointers
+    count = struct.unpack_from(endian + 'H', tiff, offset)[0]
+    for i in range(min(count, 512)):
+        entry = offset + 2 + i * 12
+        if entry + 12 > len(tiff):
+            break
+        tag, typ, n = struct.unpack_from(endian + 'HHI', tiff, entry)
+        if tag in (_EXIF_IFD, _GPS_IFD):
+            pointers[tag] = struct.unpack_from(endian + 'I', tiff, entry + 8)[0]
+            continue
+        if tag not in wanted or typ not in _TYPE_SIZES:
+            continue
+        size = _TYPE_SIZES[typ] * n
+        pos = entry + 8 if size <= 4 else struct.unpack_from(endian + 'I', tiff, entry + 8)[0]
+        if pos + size > len(tiff):
+            continue
+        if typ == 2 or typ == 7:
+            value = tiff[pos:pos + n].split(b'\0', 1)[0].decode('utf-8', 'replace').strip()
+        elif typ in (5, 10):
+            fmt = endian + ('II' if typ == 5 else 'ii') * n
+            nums = struct.unpack_from(fmt, tiff, pos)
+            value = [a / b if b else None for a, b in zip(nums[::2], nums[1::2])]
+            value = value[0] if n == 1 else value
+        else:
+            nums = struct.unpack_from(endian + _TYPE_FORMATS[typ] * n, tiff, pos)
+            value = nums[0] if n == 1 else list(nums)
+        out[wanted[tag]] = value
+    return pointers
+
+def parse_tiff(tiff):
+    """解析 TIFF 结构的 EXIF 数据 (以 II* / MM* 开头)，返回原始标签字典"""
+    raw = {}
+    if tiff[:4] not in (b'II*\0', b'MM\0*'):
+        return raw
+    endian = '<' if tiff[:2] == b'II' else '>'
+    pointers = _read_ifd(tiff, struct.unpack_from(endian + 'I', tiff, 4)[0], endian, _IFD0_TAGS, raw)
+    if _EXIF_IFD in pointers:
+        _read_ifd(tiff, pointers[_EXIF_IFD], endian, _EXIF_TAGS, raw)
+    if _GPS_IFD in pointers:
+        _read_ifd(tiff, pointers[_GPS_IFD], endian, _GPS_TAGS, raw)
+    return raw
+
+# ================= XMP =================
+
+def _xmp_value(xmp, *names):
+    for name in names:
+        # 属性形式 exif:FNumber="28/10"，或元素形式 <exif:FNumber>28/10</exif:FNumber> (含 rdf:Seq)
+        m = re.search(rf'{name}\s*=\s*"([^"]*)"', xmp) or \
+            re.search(rf'<{name}>\s*(?:<rdf:\w+>\s*<rdf:li[^>]*>)?([^<]+)<', xmp)
+        if m and m.group(1).strip():
+            return m.group(1).strip()
+    return None
+
+def _rational(text):
+    try:
+        num, _, den = text.partition('/')
+        return float(num) / float(den) if den else float(num)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+def _xmp_gps(text):
+    """XMP GPS 坐标："34,12.345N" 或 "34,12,20.7N" """
+    m = re.match(r'^\s*([\d.]+),([\d.]+)(?:,([\d.]+))?\s*([NSEW])\s*$', text or '')
+    if not m:
+        return None
+    value = float(m.group(1)) + float(m.group(2)) / 60 + float(m.group(3) or 0) / 3600
+    return -value if m.group(4) in 'SW' else value
+
+def parse_xmp(xmp):
+    """从 XMP 包中提取与 EXIF 对应的原始字段 (仅作补充，EXIF 优先)"""
+    if isinstance(xmp, bytes):
+        xmp = xmp.decode('utf-8', 'replace')
+    raw = {}
+    for key, names in (('make', ('tiff:Make',)), ('model', ('tiff:Model',)),
+                       ('lens_model', ('exifEX:LensModel', 'aux:Lens')),
+                       ('xmp_datetime', ('exif:DateTimeOriginal', 'photoshop:DateCreated', 'xmp:CreateDate')),
+                       ('iso', ('exifEX:PhotographicSensitivity', 'exif:ISOSpeedRatings'))):
+        value = _xmp_value(xmp, *names)
+        if value:
+            raw[key] = int(value) if key == 'iso' and value.isdigit() else value
+    for key, name in (('exposure_time', 'exif:ExposureTime'), ('f_number', 'exif:FNumber'),
+                      ('focal_length', 'exif:FocalLength')):
+        value = _xmp_value(xmp, name)
+        if value:
+            raw[key] = _rational(value)
+    for key, name in (('xmp_lat', 'exif:GPSLatitude'), ('xmp_lon', 'exif:GPSLongitude')):
+        value = _xmp_gps(_xmp_value(xmp, name))
+        if value is not None:
+            raw[key] = value
+    for key, name in (('tiff_width', 'tiff:ImageWidth'), ('tiff_height', 'tiff:ImageLength'),
+                      ('orientation', 'tiff:Orientation')):
+        value = _xmp_value(xmp, name)
+        if value and value.isdigit():
+            raw[key] = int(value)
+    return raw
+
+# ================= 容器解析 =================
+
+_XMP_JPEG_SIG = b'http://ns.adobe.com/xap/1.0/\0'
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def _scan_jpeg(f, found):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':  # 容错：跳过填充字节
+            byte = f.read(1)
+        marker = f.read(1)
+        while marker == b'\xff':
+            marker = f.read(1)
+        if not marker or marker[0] in (0xD9, 0xDA):  # EOI / SOS 之后是像素数据
+            return
+        if 0xD0 <= marker[0] <= 0xD7 or marker[0] == 0x01:
+            continue
+        length = struct.unpack('>H', f.read(2))[0] - 2
+        if marker[0] == 0xE1 and length <= MAX_BOX_BYTES:
+            data = f.read(length)
+            if data.startswith(b'Exif\0\0'):
+                found['exif'] = data[6:]
+            elif data.startswith(_XMP_JPEG_SIG):
+                found['xmp'] = data[len(_XMP_JPEG_SIG):]
+        elif marker[0] in _SOF_MARKERS:
+            data = f.read(length)
+            found['height'], found['width'] = struct.unpack_from('>HH', data, 1)
+        else:
+            f.seek(length, io.SEEK_CUR)
+
+def _scan_png(f, found):
+    f.seek(8)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        length, kind = struct.unpack('>I4s', header)
+        if kind == b'IHDR':
+            found['width'], found['height'] = struct.unpack('>II', f.read(8))
+            f.seek(length - 8 + 4, io.SEEK_CUR)
+        elif kind == b'eXIf' and length <= MAX_BOX_BYTES:
+            found['exif'] = f.read(length)
+            f.seek(4, io.SEEK_CUR)
+        elif kind == b'iTXt' and length <= MAX_BOX_BYTES:
+            data = f.read(length)
+            f.seek(4, io.SEEK_CUR)
+            keyword, _, rest = data.partition(b'\0')
+            if keyword == b'XML:com.adobe.xmp' and len(rest) >= 2:
+                compressed, text = rest[0], rest[2:].split(b'\0', 2)[-1]
+                found['xmp'] = zlib.decompress(text) if compressed else text
+        elif kind == b'IEND':
+            return
+        else:
+            f.seek(length + 4, io.SEEK_CUR)
+
+def _scan_webp(f, found):
+    f.seek(12)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        kind, length = struct.unpack('<4sI', header)
+        padded = length + (length & 1)
+        if kind == b'VP8X':
+            data = f.read(10)
+            found['width'] = int.from_bytes(data[4:7], 'little') + 1
+            found['height'] = int.from_bytes(data[7:10], 'little') + 1
+            f.seek(padded - 10, io.SEEK_CUR)
+        elif kind == b'VP8 ' and 'width' not in found:
+            data = f.read(10)
+            w, h = struct.unpack_from('<HH', data, 6)
+            found['width'], found['height'] = w & 0x3FFF, h & 0x3FFF
+            f.seek(padded - 10, io.SEEK_CUR)
+        elif kind == b'VP8L' and 'width' not in found:
+            bits = int.from_bytes(f.read(5)[1:5], 'little')
+            found['width'], found['height'] = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            f.seek(padded - 5, io.SEEK_CUR)
+        elif kind in (b'EXIF', b'XMP ') and length <= MAX_BOX_BYTES:
+            data = f.read(length)
+            f.seek(padded - length, io.SEEK_CUR)
+            if kind == b'EXIF':
+                found['exif'] = data[6:] if data.startswith(b'Exif\0\0') else data
+            else:
+                found['xmp'] = data
+        else:
+            f.seek(padded, io.SEEK_CUR)
+
+def _iter_boxes(f, end):
+    """ISOBMFF box 迭代：产出 (类型, 数据起点, 数据终点)"""
+    while f.tell() + 8 <= end:
+        start = f.tell()
+        size, kind = struct.unpack('>I4s', f.read(8))
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+        elif size == 0:
+            size = end - start
+        if size < 8 or start + size > end:
+            return
+        yield kind, f.tell(), start + size
+        f.seek(start + size)
+
+def _scan_heif(f, found):
+    f.seek(0, io.SEEK_END)
+    file_end = f.tell()
+    f.seek(0)
+    items, locations, sizes = {}, {}, []
+    for kind, start, end in _iter_boxes(f, file_end):
+        if kind != b'meta':
+            continue
+        f.seek(start + 4)  # FullBox 版本与标志
+        for sub, sub_start, sub_end in _iter_boxes(f, end):
+            if sub == b'iinf':
+                f.seek(sub_start)
+                version = f.read(1)[0]
+                f.seek(3 + (2 if version == 0 else 4), io.SEEK_CUR)
+                for infe, infe_start, infe_end in _iter_boxes(f, sub_end):
+                    f.seek(infe_start)
+                    data = f.read(min(infe_end - infe_start, 512))
+                    if infe != b'infe' or data[0] < 2:
+                        continue
+                    wide = data[0] >= 3
+                    item_id = struct.unpack_from('>I' if wide else '>H', data, 4)[0]
+                    offset = 4 + (4 if wide else 2) + 2
+                    item_type = data[offset:offset + 4]
+                    if item_type == b'mime' and b'rdf+xml' in data[offset + 4:]:
+                        item_type = b'XMP '
+                    items[item_id] = item_type
+            elif sub == b'iloc':
+                f.seek(sub_start)
+                data = f.read(min(sub_end - sub_start, MAX_BOX_BYTES))
+                locations = _parse_iloc(data)
+            elif sub == b'iprp':
+                f.seek(sub_start)
+                for ipco, ipco_start, ipco_end in _iter_boxes(f, sub_end):
+                    if ipco != b'ipco':
+                        continue
+                    f.seek(ipco_start)
+                    for prop, prop_start, _ in _iter_boxes(f, ipco_end):
+                        if prop == b'ispe':
+                            f.seek(prop_start + 4)
+                            sizes.append(struct.unpack('>II', f.read(8)))
+                        elif prop == b'irot':
+                            # HEIF 以 irot 为准 (EXIF Orientation 仅供参考)，旋转 90° / 270° 时宽高互换
+                            f.seek(prop_start)
+                            found['swap'] = bool(f.read(1)[0] & 1)
+        break
+    if sizes:
+        # 网格图的各 tile 也有 ispe，取面积最大者作为整图尺寸
+        found['width'], found['height'] = max(sizes, key=lambda s: s[0] * s[1])
+    for item_id, item_type in items.items():
+        if item_type not in (b'Exif', b'XMP ') or item_id not in locations:
+            continue
+        offset, length = locations[item_id]
+        if length > MAX_BOX_BYTES:
+            continue
+        f.seek(offset)
+        data = f.read(length)
+        if item_type == b'Exif' and len(data) > 4:
+            # Exif item 以 4 字节的 TIFF 头偏移开头
+            found['exif'] = data[4 + struct.unpack_from('>I', data)[0]:]
+        elif item_type == b'XMP ':
+            found['xmp'] = data
+
+def _parse_iloc(data):
+    """iloc box：{item_id: (文件偏移, 长度)} (仅支持单 extent、construction_method 0)"""
+    version = data[0]
+    sizes = struct.unpack_from('>H', data, 4)[0]
+    offset_size, length_size = sizes >> 12, (sizes >> 8) & 0xF
+    base_size, index_size = (sizes >> 4) & 0xF, sizes & 0xF
+    pos = 6
+
+    def read(n):
+        nonlocal pos
+        value = int.from_bytes(data[pos:pos + n], 'big') if n else 0
+        pos += n
+        return value
+
+    count = read(2 if version < 2 else 4)
+    locations = {}
+    for _ in range(count):
+        item_id = read(2 if version < 2 else 4)
+        method = read(2) & 0xF if version in (1, 2) else 0
+        read(2)  # data_reference_index
+        base = read(base_size)
+        extents = read(2)
+        for e in range(extents):
+            if version in (1, 2):
+                read(index_size)
+            extent_offset, extent_length = read(offset_size), read(length_size)
+            if e == 0 and extents == 1 and method == 0:
+                locations[item_id] = (base + extent_offset, extent_length)
+    return locations
+
+def _scan_pillow(f, found):
+    """未识别的格式：Pillow 惰性打开只读取文件头，不解码像素"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return
+    with Image.open(f) as img:
+        found['width'], found['height'] = img.size
+        exif = img.getexif()
+        if exif:
+            data = exif.tobytes()
+            found['exif'] = data[6:] if data.startswith(b'Exif\0\0') else data
+
+def _scan(f, found):
+    head = f.read(16)
+    if head[:2] == b'\xff\xd8':
+        _scan_jpeg(f, found)
+    elif head[:8] == b'\x89PNG\r\n\x1a\n':
+        _scan_png(f, found)
+    elif head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        _scan_webp(f, found)
+    elif head[4:8] == b'ftyp':
+        _scan_heif(f, found)
+    elif head[:4] in (b'II*\0', b'MM\0*'):
+        f.seek(0)
+        found['exif'] = f.read(MAX_BOX_BYTES)
+    else:
+        f.seek(0)
+        _scan_pillow(f, found)
+
+# ================= 归一化 =================
+
+def _parse_datetime(text):
+    if not text:
+        return None
+    for fmt, size in (('%Y:%m:%d %H:%M:%S', 19), ('%Y-%m-%dT%H:%M:%S', 19), ('%Y-%m-%d', 10)):
+        try:
+            return time.mktime(time.strptime(text[:size], fmt))
+        except (ValueError, OverflowError):
+            continue
+    return None
+
+def _gps(values, ref):
+    if not isinstance(values, list) or len(values) != 3 or None in values:
+        return None
+    value = values[0] + values[1] / 60 + values[2] / 3600
+    return round(-value if ref in ('S', 'W') else value, 7)
+
+def _camera(make, model):
+    make, model = (make or '').strip(), (model or '').strip()
+    if make and model.lower().startswith(make.split()[0].lower()):
+        return model
+    return ' '.join(p for p in (make, model) if p) or None
+
+def _normalize(found):
+    raw = parse_xmp(found['xmp']) if found.get('xmp') else {}
+    if found.get('exif'):
+        # EXIF 优先，XMP 只补充缺失字段
+        raw.update({k: v for k, v in parse_tiff(found['exif']).items() if v not in (None, '')})
+
+    width = found.get('width') or raw.get('pixel_width') or raw.get('tiff_width')
+    height = found.get('height') or raw.get('pixel_height') or raw.get('tiff_height')
+    swap = found['swap'] if 'swap' in found else raw.get('orientation') in (5, 6, 7, 8)
+    if swap and width and height:
+        width, height = height, width  # 旋转 90° 的照片按显示方向记录
+
+    iso = raw.get('iso')
+    meta = {
+        'width': width,
+        'height': height,
+        'camera': _camera(raw.get('make'), raw.get('model')),
+        'lens': (raw.get('lens_model') or '').strip() or None,
+        'exposure_time': raw.get('exposure_time'),
+        'f_number': raw.get('f_number'),
+        'iso': iso[0] if isinstance(iso, list) else iso,
+        'focal_length': raw.get('focal_length'),
+        'gps_lat': _gps(raw.get('lat'), raw.get('lat_ref')),
+        'gps_lon': _gps(raw.get('lon'), raw.get('lon_ref')),
+        'taken_at': None,
+    }
+    if meta['gps_lat'] is None and 'xmp_lat' in raw and 'xmp_lon' in raw:
+        meta['gps_lat'], meta['gps_lon'] = round(raw['xmp_lat'], 7), round(raw['xmp_lon'], 7)
+    if meta['gps_lat'] is None or meta['gps_lon'] is None:
+        meta['gps_lat'] = meta['gps_lon'] = None
+    for key in ('datetime_original', 'datetime_digitized', 'xmp_datetime', 'datetime'):
+        meta['taken_at'] = _parse_datetime(raw.get(key))
+        if meta['taken_at']:
+            break
+    for key in ('exposure_time', 'f_number', 'focal_length'):
+        if not isinstance(meta[key], (int, float)):
+            meta[key] = None
+    if not isinstance(meta['iso'], int):
+        meta['iso'] = None
+    return meta
+
+def extract(source):
+    """
+    提取图片元数据。source 为图片字节串或文件路径；
+    返回包含 FIELDS 全部键的字典 (无法获取的字段为 None)，解析失败时尽量保留已读到的部分
+    """
+    found = {}
+    # 文件打不开时直接抛出；解析中途出错则保留已读到的字段
+    f = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else open(source, 'rb')
+    with f:
+        try:
+            _scan(f, found)
+        except Exception as e:
+            logger.debug(f"⚠️  元数据解析不完整 | Metadata parse incomplete: {e}")
+    try:
+        return _normalize(found)
+    except Exception as e:
+        logger.debug(f"⚠️  元数据归一化失败 | Metadata normalize failed: {e}")
+        return dict.fromkeys(FIELDS)
+
+# ================= 存量回填 =================
+
+def _extract_worker(item):
+    photo_id, full_path = item
+    if not os.path.exists(full_path):
+        return photo_id, 'missing', None, None
+    try:
+        return photo_id, 'extracted', extract(full_path), None
+    except Exception as e:
+        return photo_id, 'error', None, str(e)
+
+def backfill(workers=None, force=False):
+    """
+    为尚未提取元数据的图片 (或 force=True 时全部图片) 补齐元数据列，
+    图片较多时多进程并行；原图缺失的记录保持未提取状态，下次重试
+    """
+    from . import photos
+
+    conn = photos.get_db()
+    where = '' if force else ' WHERE meta_at IS NULL'
+    rows = conn.execute(f"SELECT id, path FROM photos{where}").fetchall()
+    pending = [(row['id'], os.path.join(PROJECT_ROOT, row['path'].replace('/', os.sep))) for row in rows]
+
+    summary = {'extracted': 0, 'missing': 0, 'error': 0}
+    if len(pending) >= PARALLEL_THRESHOLD and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_extract_worker, pending, chunksize=16))
+    else:
+        results = [_extract_worker(item) for item in pending]
+
+    now = time.time()
+    updates = []
+    for photo_id, status, meta, err in results:
+        summary[status] += 1
+        if err:
+            logger.warning(f"⚠️  元数据提取失败 | Metadata extraction failed: {photo_id} ({err})")
+        if meta is not None:
+            updates.append(tuple(meta[k] for k in FIELDS) + (now, photo_id))
+
+    assignments = ', '.join(f"{k}=?" for k in FIELDS)
+    conn.executemany(f"UPDATE photos SET {assignments}, meta_at=? WHERE id=?", updates)
+    conn.commit()
+    conn.close()
+    logger.info(f"🏷️  元数据回填完成 | Metadata backfill complete: {summary}")
+    return summary
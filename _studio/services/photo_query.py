@@ -0,0 +1,197 @@
+"""
+MAERS Photo Query
+相册分页查询 (/api/photos/query)，不再需要前端一次性读取整个 photos-data.json：
+- 游标 (keyset) 分页：按 (排序列, id) 定位下一页，翻页成本与页码无关
+- 标签 AND / OR 过滤：photo_tags 表由触发器随 photos.tags 自动维护，所有写入方 (含 cms_other_tags、清理脚本) 无需改动
+- 拍摄时间范围过滤 (taken_at，见 photo_meta)，排序支持 sort_order / created_at
+- 复合索引 (category, sort_order, id) / (category, created_at, id) 覆盖分类内的排序与翻页
+"""
+import json
+import time
+import base64
+
+from . import photo_meta
+
+SORT_COLUMNS = {'sort_order': 'asc', 'created_at': 'desc'}  # 可排序列 -> 默认方向
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+# photo_tags_delete 最后创建，存在即说明整套结构已就绪
+SCHEMA_MARKER = 'photo_tags_delete'
+SCHEMA = '''
+    CREATE INDEX IF NOT EXISTS idx_category_order ON photos(category, sort_order, id);
+    CREATE INDEX IF NOT EXISTS idx_category_created ON photos(category, created_at, id);
+
+    CREATE TABLE IF NOT EXISTS photo_tags (
+        tag TEXT NOT NULL,
+        photo_id TEXT NOT NULL,
+        PRIMARY KEY (tag, photo_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_photo_tags_photo ON photo_tags(photo_id);
+
+    INSERT OR IGNORE INTO photo_tags (tag, photo_id)
+        SELECT j.value, p.id FROM photos p, json_each(p.tags) j
+        WHERE json_valid(p.tags) AND j.type = 'text';
+
+    CREATE TRIGGER IF NOT EXISTS photo_tags_insert AFTER INSERT ON photos
+    WHEN json_valid(NEW.tags) BEGIN
+        INSERT OR IGNORE INTO photo_tags (tag, photo_id)
+            SELECT value, NEW.id FROM json_each(NEW.tags) WHERE type = 'text';
+    END;
+    CREATE TRIGGER IF NOT EXISTS photo_tags_update AFTER UPDATE OF tags ON photos BEGIN
+        DELETE FROM photo_tags WHERE photo_id = OLD.id;
+        INSERT OR IGNORE INTO photo_tags (tag, photo_id)
+            SELECT value, NEW.id FROM json_each(CASE WHEN json_valid(NEW.tags) THEN NEW.tags ELSE '[]' END)
+            WHERE type = 'text';
+    END;
+    CREATE TRIGGER IF NOT EXISTS photo_tags_delete AFTER DELETE ON photos BEGIN
+        DELETE FROM photo_tags WHERE photo_id = OLD.id;
+    END;
+'''
+
+def ensure_schema(conn):
+    """建立查询索引与 photo_tags 表 (旧库首次打开时执行一次，并从 tags 列回填)"""
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='trigger' AND name=?", (SCHEMA_MARKER,)).fetchone()
+    if row:
+        return False
+    conn.executescript(SCHEMA)
+    conn.commit()
+    return True
+
+# ================= 参数解析 =================
+
+def _param(query_params, key, default=None):
+    return query_params.get(key, [default])[0]
+
+def _parse_time(text, end=False):
+    """时间戳 / YYYY-MM-DD / YYYY-MM-DDTHH:MM:SS；仅日期作为结束时间时包含当天"""
+    if text is None or text == '':
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    for fmt, size in (('%Y-%m-%dT%H:%M:%S', 19), ('%Y-%m-%d', 10)):
+        try:
+            value = time.mktime(time.strptime(text[:size], fmt))
+        except ValueError:
+            continue
+        return value + 86400 - 0.001 if end and size == 10 else value
+    raise ValueError(f"Invalid date: {text}")
+
+def encode_cursor(sort, order, value, photo_id):
+    raw = json.dumps([sort, order, value, photo_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, sort, order):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        c_sort, c_order, value, photo_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if (c_sort, c_order) != (sort, order):
+        raise ValueError("Cursor does not match sort order")
+    return value, photo_id
+
+def parse_query(query_params):
+    """把请求参数转换为查询条件；参数不合法时抛出 ValueError"""
+    sort = _param(query_params, 'sort', 'sort_order')
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Invalid sort: {sort}")
+    order = _param(query_params, 'order', SORT_COLUMNS[sort]).lower()
+    if order not in ('asc', 'desc'):
+        raise ValueError(f"Invalid order: {order}")
+    try:
+        limit = min(max(int(_param(query_params, 'limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        raise ValueError("Invalid limit")
+    tag_mode = _param(query_params, 'tag_mode', 'and').lower()
+    if tag_mode not in ('and', 'or'):
+        raise ValueError(f"Invalid tag_mode: {tag_mode}")
+
+    # tags 可重复传参 (tags=a&tags=b) 或逗号分隔
+    tags = []
+    for value in query_params.get('tags', []):
+        tags += [t.strip() for t in value.split(',') if t.strip()]
+    cursor = _param(query_params, 'cursor')
+    return {
+        'category': _param(query_params, 'category'),
+        'tags': list(dict.fromkeys(tags)),
+        'tag_mode': tag_mode,
+        'taken_from': _parse_time(_param(query_params, 'from')),
+        'taken_to': _parse_time(_param(query_params, 'to'), end=True),
+        'sort': sort,
+        'order': order,
+        'limit': limit,
+        'after': decode_cursor(cursor, sort, order) if cursor else None,
+    }
+
+# ================= 查询 =================
+
+def build_sql(q):
+    """返回 (sql, params)；多取一行用于判断是否还有下一页"""
+    where, params = [], []
+    if q['category'] is not None:
+        where.append("category = ?")
+        params.append(q['category'])
+    if q['tags']:
+        marks = ', '.join('?' * len(q['tags']))
+        if q['tag_mode'] == 'or':
+            where.append(f"id IN (SELECT photo_id FROM photo_tags WHERE tag IN ({marks}))")
+        else:
+            where.append(f"id IN (SELECT photo_id FROM photo_tags WHERE tag IN ({marks}) "
+                         f"GROUP BY photo_id HAVING COUNT(*) = {len(q['tags'])})")
+        params += q['tags']
+    if q['taken_from'] is not None:
+        where.append("taken_at >= ?")
+        params.append(q['taken_from'])
+    if q['taken_to'] is not None:
+        where.append("taken_at <= ?")
+        params.append(q['taken_to'])
+
+    column, direction = q['sort'], q['order'].upper()
+    if q['after'] is not None:
+        where.append(f"({column}, id) {'>' if direction == 'ASC' else '<'} (?, ?)")
+        params += list(q['after'])
+
+    sql = "SELECT * FROM photos"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {column} {direction}, id {direction} LIMIT ?"
+    params.append(q['limit'] + 1)
+    return sql, params
+
+def row_to_item(row):
+    """photos-data.json 的条目字段，外加分类、排序与元数据列"""
+    from . import photos
+    item = photos.row_item(row)
+    item.update({
+        "category": row['category'],
+        "created_at": row['created_at'],
+        "sort_order": row['sort_order'],
+    })
+    item.update({k: row[k] for k in photo_meta.FIELDS})
+    return item
+
+def query(q):
+    from . import photos
+    sql, params = build_sql(q)
+    conn = photos.get_db()
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+
+    has_more = len(rows) > q['limit']
+    rows = rows[:q['limit']]
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(q['sort'], q['order'], last[q['sort']], last['id'])
+    return {"items": [row_to_item(r) for r in rows], "next_cursor": next_cursor}
+
+def handle_query(query_params):
+    """GET /api/photos/query"""
+    try:
+        q = parse_query(query_params)
+    except ValueError as e:
+        return 400, {"error": str(e)}
+    return 200, query(q)
@@ -5,6 +5,16 @@ import hashlib
 import sqlite3
 import json
 import uuid
+import threading
+
+from .fs_snapshot import FsSnapshot
+from . import metrics
+from . import log
+from . import photo_meta
+from . import photo_query
+from . import blob_store
+
+logger = log.get_logger('PHOTOS')
 
 # 配置常量 
 # Moved to services, so go up one level
@@ -24,17 +34,28 @@ PREVIEW_DIR    = 'photos/previews'
 # 静态JS文件路径
 GALLERY_JSON_FILE = os.path.join(DATA_DIR, 'photos-data.json')
 
-try:
-    from PIL import Image, ImageOps 
-    HAS_PIL = True
-except ImportError:
-    HAS_PIL = False
-    print("⚠️ [Photos] 未检测到 Pillow 库，图片处理功能受限")
+# Pillow 导入较慢，推迟到第一次处理图片时 (见 ensure_pil)
+Image = ImageOps = None
+HAS_PIL = None  # None: 尚未检测
+
+_sync_lock = threading.Lock()
+
+def ensure_pil():
+    """按需导入 Pillow，返回是否可用"""
+    global Image, ImageOps, HAS_PIL
+    if HAS_PIL is None:
+        try:
+            from PIL import Image, ImageOps
+            HAS_PIL = True
+        except ImportError:
+            HAS_PIL = False
+            logger.warning("⚠️  未检测到 Pillow 库，图片处理功能受限 | Pillow missing, image processing limited")
+    return HAS_PIL
 
 # ================= 数据库工具 =================
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = metrics.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     
     # Check for tags column migration
@@ -42,14 +63,34 @@ def get_db():
     cursor.execute("PRAGMA table_info(photos)")
     columns = [r['name'] for r in cursor.fetchall()]
     if 'tags' not in columns:
-        print("  [ PHOTOS ] ⚠️  Schema Migration: Adding 'tags' column...")
+        logger.warning("⚠️  Schema Migration: Adding 'tags' column...")
         cursor.execute("ALTER TABLE photos ADD COLUMN tags TEXT")
         conn.commit()
+
+    # 元数据列 (宽高 / 相机 / 镜头 / 曝光 / GPS / 拍摄时间) 及其索引
+    missing = [(name, decl) for name, decl in photo_meta.COLUMNS if name not in columns]
+    if missing:
+        logger.warning(f"⚠️  Schema Migration: Adding metadata columns ({', '.join(n for n, _ in missing)})...")
+        for name, decl in missing:
+            cursor.execute(f"ALTER TABLE photos ADD COLUMN {name} {decl}")
+        for index, cols in photo_meta.INDEXES.items():
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index} ON photos{cols}")
+        conn.commit()
+
+    # 分页查询用的复合索引与标签表 (见 photo_query)
+    if photo_query.ensure_schema(conn):
+        logger.warning("⚠️  Schema Migration: Adding query indexes and photo_tags table...")
     
     return conn
 
+@metrics.timed_sync
 def sync_gallery_js():
     """从数据库生成静态 JSON 数据供前端读取"""
+    start = time.perf_counter()
+    with _sync_lock:
+        _write_gallery_js(start)
+
+def _write_gallery_js(start):
     conn = get_db()
     cursor = conn.cursor()
     
@@ -62,54 +103,59 @@ def sync_gallery_js():
     for row in rows:
         cat = row['category']
         if cat not in data: data[cat] = []
-        
-        item = {
-            "id": row['id'],
-            "path": row['path'],
-            "name": row['name'],
-            "thumb": row['thumb'],
-            "preview": row['preview'],
-            "hash": row['hash'],
-            "tags": json.loads(row['tags']) if row['tags'] else []
-        }
-        data[cat].append(item)
+        data[cat].append(row_item(row))
     
     # 写入 JSON 文件
     try:
         with open(GALLERY_JSON_FILE, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"✅ [Photos] Gallery JSON 同步成功: {os.path.basename(GALLERY_JSON_FILE)}")
+        logger.debug(f"✅ Gallery JSON 同步成功 | Gallery JSON synced: {os.path.basename(GALLERY_JSON_FILE)}",
+                     photos=len(rows), ms=round((time.perf_counter() - start) * 1000, 2))
     except Exception as e:
-        print(f"❌ [Photos] Gallery JSON 同步失败: {e}")
+        logger.error(f"❌ Gallery JSON 同步失败 | Gallery JSON sync failed: {e}")
+
+def row_item(row):
+    """photos-data.json 中单张图片的条目 (分页查询接口沿用同一结构)"""
+    from . import image_variants  # 避免循环导入 (image_variants 依赖本模块)
+    return {
+        "id": row['id'],
+        "path": row['path'],
+        "name": row['name'],
+        # 衍生图不带编码扩展名，由服务端按 Accept 协商 (静态托管时前端补默认扩展名)
+        "thumb": image_variants.strip_format(row['thumb']),
+        "preview": image_variants.strip_format(row['preview']),
+        "hash": row['hash'],
+        "tags": json.loads(row['tags']) if row['tags'] else []
+    }
+
+def gallery_js_stale():
+    """gallery.db 比 photos-data.json 新 (或后者不存在) 时需要重新同步"""
+    try:
+        db_mtime = os.path.getmtime(DB_PATH)
+    except OSError:
+        return False
+    try:
+        return db_mtime > os.path.getmtime(GALLERY_JSON_FILE)
+    except OSError:
+        return True
+
+def start_background_sync():
+    """启动时的图库同步：仅在数据过期时于后台线程执行，不阻塞端口绑定"""
+    if not gallery_js_stale():
+        return None
+    logger.info("🔄 Gallery JSON 已过期，后台同步中 | Gallery JSON stale, syncing in background")
+    thread = threading.Thread(target=sync_gallery_js, name='gallery-sync', daemon=True)
+    thread.start()
+    return thread
 
 # ================= 业务逻辑 =================
 
 def to_web_path(path):
     return path.replace('\\', '/')
 
-def get_exif_datetime(file_data):
-    """从图片二进制数据中读取 EXIF 拍摄时间，返回 (time_struct, timestamp) 或 None"""
-    if not HAS_PIL:
-        return None
-    try:
-        import io
-        img = Image.open(io.BytesIO(file_data))
-        exif_data = img._getexif()
-        if not exif_data:
-            return None
-        # Tag 36867 = DateTimeOriginal, 36868 = DateTimeDigitized, 306 = DateTime
-        for tag_id in (36867, 36868, 306):
-            raw = exif_data.get(tag_id)
-            if raw:
-                t_struct = time.strptime(raw, '%Y:%m:%d %H:%M:%S')
-                timestamp = time.mktime(t_struct)
-                return (t_struct, timestamp)
-    except Exception as e:
-        print(f"  [ PHOTOS ] ⚠️  EXIF 读取失败，使用当前时间: {e}")
-    return None
-
 def handle_upload(query, file_data):
     """处理图片上传请求"""
+    start = time.perf_counter()
     category = os.path.basename(query.get('category', ['default'])[0])
     import urllib.parse
     raw_name_input = urllib.parse.unquote(query.get('name', ['temp.jpg'])[0])
@@ -117,10 +163,14 @@ def handle_upload(query, file_data):
     if not ext: ext = '.jpg'
     
     file_hash = hashlib.md5(file_data).hexdigest()
+    # 只解析文件头 (EXIF / XMP / 尺寸)，不解码像素
+    meta = photo_meta.extract(file_data)
     need_convert = query.get('convert', [''])[0] == 'avif'
 
     conn = get_db()
     cursor = conn.cursor()
+    # 本次请求内的存在性检查 (修复检测 + 文件名冲突探测) 共用目录快照
+    fs = FsSnapshot(PROJECT_ROOT)
 
     # 1. 查重逻辑 (秒级)
     cursor.execute("SELECT * FROM photos WHERE hash=? AND category=?", (file_hash, category))
@@ -131,10 +181,9 @@ def handle_upload(query, file_data):
     
     if existing_row:
         # Check if physical file exists
-        full_existing_path = os.path.join(PROJECT_ROOT, existing_row['path'])
-        
-        if os.path.exists(full_existing_path):
-            print(f"  [ PHOTOS ] ♻️  检测到重复图片 ({file_hash}) | Duplicate found, skipping upload.")
+        if fs.exists(existing_row['path']):
+            logger.info(f"♻️  检测到重复图片 ({file_hash}) | Duplicate found, skipping upload.",
+                        category=category, hash=file_hash, id=existing_row['id'])
             # 移到第一位 (更新 sort_order)
             # 获取当前最小 order
             cursor.execute("SELECT MIN(sort_order) FROM photos WHERE category=?", (category,))
@@ -155,25 +204,24 @@ def handle_upload(query, file_data):
                     
             return {"status": "success", "msg": "duplicate_found", "path": return_path}
         else:
-            print(f"  [ PHOTOS ] ⚠️  数据库记录存在但物理文件丢失 | DB record exists but file missing, repairing: {existing_row['path']}")
+            logger.warning(f"⚠️  数据库记录存在但物理文件丢失 | DB record exists but file missing, repairing: {existing_row['path']}")
             safe_name = existing_row['name']
             is_restore = True
 
     # 2. 生成新文件 (如果不是修复模式)
     if not is_restore:
-        print(f"  [ PHOTOS ] 📤 上传图片中 | Uploading to category: {category}")
+        logger.debug(f"📤 上传图片中 | Uploading to category: {category}", category=category, bytes=len(file_data))
         
         # 优先使用 EXIF 拍摄时间，降级使用当前系统时间
-        exif_result = get_exif_datetime(file_data)
-        if exif_result:
-            t_struct, exif_timestamp = exif_result
+        exif_timestamp = meta['taken_at']
+        if exif_timestamp:
+            t_struct = time.localtime(exif_timestamp)
             base_time_str = time.strftime('%Y%m%d_%H%M%S', t_struct)
-            print(f"  [ PHOTOS ] 📅 使用 EXIF 拍摄时间: {base_time_str}")
+            logger.debug(f"📅 使用 EXIF 拍摄时间: {base_time_str}")
         else:
             t_struct = time.localtime()
-            exif_timestamp = None
             base_time_str = time.strftime('%Y%m%d_%H%M%S', t_struct)
-            print(f"  [ PHOTOS ] 📅 EXIF 不可用，使用当前时间: {base_time_str}")
+            logger.debug(f"📅 EXIF 不可用，使用当前时间: {base_time_str}")
         
         counter = 1
         while True:
@@ -181,8 +229,7 @@ def handle_upload(query, file_data):
             safe_name = f"{base_time_str}_{counter:02d}{final_ext}"
             
             # 物理路径检查
-            check_path = os.path.join(BASE_IMAGE_DIR, category, safe_name)
-            if not os.path.exists(check_path):
+            if not fs.exists(f"{BASE_IMAGE_DIR}/{category}/{safe_name}"):
                 break
             counter += 1
 
@@ -195,8 +242,23 @@ def handle_upload(query, file_data):
     rel_thumb = rel_path
     rel_prev = rel_path
 
+    thumb_name = os.path.splitext(safe_name)[0] + ".webp"
+    thumb_disk_path = os.path.join(THUMB_DIR, category, thumb_name)
+    prev_name = os.path.splitext(safe_name)[0] + ".avif"
+    prev_disk_path = os.path.join(PREVIEW_DIR, category, prev_name)
+    outputs = {'path': save_path, 'thumb': thumb_disk_path, 'preview': prev_disk_path}
+
+    # 同一张图片已在任意分类处理过时，直接硬链接内容寻址存储中的文件，跳过对应的编码
+    produced = {kind for kind, disk_path in outputs.items()
+                if blob_store.materialize(file_hash, [(blob_store.suffix_for(kind, disk_path), disk_path)])}
+    shared = set(produced)
+    if 'thumb' in shared: rel_thumb = to_web_path(f"{THUMB_DIR}/{category}/{thumb_name}")
+    if 'preview' in shared: rel_prev = to_web_path(f"{PREVIEW_DIR}/{category}/{prev_name}")
+
     # 图片处理逻辑 (保持原有)
-    if HAS_PIL:
+    if len(shared) == len(outputs):
+        logger.debug(f"🔗 复用已有编码结果 | Reusing stored blobs: {file_hash}", category=category, hash=file_hash)
+    elif ensure_pil():
         try:
             import io
             # 如果是修复模式，强行检查是否需要 convert (根据文件名)
@@ -211,8 +273,15 @@ def handle_upload(query, file_data):
             img = Image.open(io.BytesIO(file_data))
             img = ImageOps.exif_transpose(img) 
 
+            # 修复模式下残留的旧文件可能是指向 blob 的硬链接，先解除再重新写入
+            for kind, disk_path in outputs.items():
+                if kind not in shared and os.path.exists(disk_path):
+                    os.remove(disk_path)
+
             # A. 原图
-            if need_convert or (is_restore and safe_name.endswith('.avif')):
+            if 'path' in shared:
+                pass
+            elif need_convert or (is_restore and safe_name.endswith('.avif')):
                 img.save(save_path, "AVIF", quality=70)
             else:
                 # If restoring a non-avif file or just uploading raw
@@ -224,30 +293,37 @@ def handle_upload(query, file_data):
                 else: 
                      # Fallback
                      img.save(save_path)
+            produced.add('path')
 
             # B. WebP 缩略图
-            thumb_name = os.path.splitext(safe_name)[0] + ".webp"
-            thumb_disk_path = os.path.join(THUMB_DIR, category, thumb_name)
-            thumb_img = img.copy()
-            thumb_img.thumbnail((600, 600))
-            if thumb_img.mode in ("RGBA", "P"): thumb_img = thumb_img.convert("RGB")
-            thumb_img.save(thumb_disk_path, "WEBP", quality=80)
-            rel_thumb = to_web_path(f"{THUMB_DIR}/{category}/{thumb_name}")
+            if 'thumb' not in shared:
+                thumb_img = img.copy()
+                thumb_img.thumbnail((600, 600))
+                if thumb_img.mode in ("RGBA", "P"): thumb_img = thumb_img.convert("RGB")
+                thumb_img.save(thumb_disk_path, "WEBP", quality=80)
+                produced.add('thumb')
+                rel_thumb = to_web_path(f"{THUMB_DIR}/{category}/{thumb_name}")
             
             # C. 预览大图
-            prev_name = os.path.splitext(safe_name)[0] + ".avif"
-            prev_disk_path = os.path.join(PREVIEW_DIR, category, prev_name)
-            prev_img = img.copy()
-            prev_img.thumbnail((2560, 2560))
-            prev_img.save(prev_disk_path, "AVIF", quality=70)
-            rel_prev = to_web_path(f"{PREVIEW_DIR}/{category}/{prev_name}")
+            if 'preview' not in shared:
+                prev_img = img.copy()
+                prev_img.thumbnail((2560, 2560))
+                prev_img.save(prev_disk_path, "AVIF", quality=70)
+                produced.add('preview')
+                rel_prev = to_web_path(f"{PREVIEW_DIR}/{category}/{prev_name}")
 
         except Exception as e:
-            print(f"⚠️ [Photos] 处理失败，回退到原图: {e}")
+            logger.warning(f"⚠️  处理失败，回退到原图 | Processing failed, keeping original: {e}", category=category, name=safe_name)
             if not os.path.exists(save_path):
                 with open(save_path, 'wb') as f: f.write(file_data)
-    else:
+    elif 'path' not in shared:
         with open(save_path, 'wb') as f: f.write(file_data)
+        # 要求转 AVIF 时此处只是原样写入，不能作为 AVIF 编码结果共享
+        if not need_convert: produced.add('path')
+
+    # 新编码的文件收入内容寻址存储，供其他分类的相同图片复用
+    blob_store.adopt(file_hash, [(blob_store.suffix_for(kind, outputs[kind]), outputs[kind])
+                                 for kind in produced - shared])
 
     # 4. 插入或更新数据库
     
@@ -256,23 +332,28 @@ def handle_upload(query, file_data):
     min_order = cursor.fetchone()[0]
     new_order = (min_order if min_order is not None else 0) - 1
     
+    meta_values = tuple(meta[k] for k in photo_meta.FIELDS) + (time.time(),)
+    meta_columns = photo_meta.FIELDS + ('meta_at',)
     if is_restore:
         # Update existing record to bump to top (and ensure paths are correct if we want)
-        cursor.execute("UPDATE photos SET sort_order=? WHERE id=?", (new_order, existing_row['id']))
+        assignments = ', '.join(f"{k}=?" for k in meta_columns)
+        cursor.execute(f"UPDATE photos SET sort_order=?, {assignments} WHERE id=?",
+                       (new_order,) + meta_values + (existing_row['id'],))
     else:
         new_id = str(uuid.uuid4())
         # 优先用 EXIF 时间作为 created_at，降级用当前时间
         created_at = exif_timestamp if exif_timestamp else time.time()
-        cursor.execute('''
-            INSERT INTO photos (id, category, name, path, thumb, preview, hash, created_at, sort_order)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (new_id, category, safe_name, rel_path, rel_thumb, rel_prev, file_hash, created_at, new_order))
+        cursor.execute(f'''
+            INSERT INTO photos (id, category, name, path, thumb, preview, hash, created_at, sort_order, {', '.join(meta_columns)})
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?{', ?' * len(meta_columns)})
+        ''', (new_id, category, safe_name, rel_path, rel_thumb, rel_prev, file_hash, created_at, new_order) + meta_values)
     
     conn.commit()
     conn.close()
     
     sync_gallery_js()
-    print(f"  [ PHOTOS ] ✅ 处理完成 | Processed: {safe_name}")
+    logger.info(f"✅ 处理完成 | Processed: {safe_name}", category=category, name=safe_name, hash=file_hash,
+                bytes=len(file_data), restored=is_restore, ms=round((time.perf_counter() - start) * 1000, 2))
 
     return {
         "status": "success",
@@ -286,7 +367,7 @@ def handle_upload(query, file_data):
 def handle_delete(body):
     """处理删除请求"""
     target_path = body.get('path')
-    print(f"  [ PHOTOS ] 🗑️  请求删除文件 | Request delete: {target_path}")
+    logger.info(f"🗑️  请求删除文件 | Request delete: {target_path}")
     
     conn = get_db()
     cursor = conn.cursor()
@@ -296,7 +377,7 @@ def handle_delete(body):
     row = cursor.fetchone()
     
     if not row:
-        print(f"  [ PHOTOS ] ❌ 数据库未找到记录 | Record not found in DB")
+        logger.error(f"❌ 数据库未找到记录 | Record not found in DB")
         conn.close()
         return {}
 
@@ -310,21 +391,25 @@ def handle_delete(body):
             os.remove(full_path)
             
         # 删除关联图
-        # 这里逻辑稍微优化下，直接从 DB 拿 thumb/preview 路径更稳
+        # 这里逻辑稍微优化下，直接从 DB 拿 thumb/preview 路径更稳 (连同按需生成的其他编码)
+        from . import image_variants
         for key in ['thumb', 'preview']:
             if row[key] and row[key] != target_path:
-                derived_sys = row[key].replace('/', os.sep)
-                derived_full = os.path.abspath(os.path.join(PROJECT_ROOT, derived_sys))
-                if os.path.exists(derived_full):
-                    os.remove(derived_full)
-        print(f"  [ PHOTOS ] 🔥 物理文件已粉碎 | Physical files purged: {target_path}")
+                image_variants.remove_variants(row[key])
+        logger.info(f"🔥 物理文件已粉碎 | Physical files purged: {target_path}")
                     
     except Exception as e:
-        print(f"  [ PHOTOS ] ❌ 删除出错 | Delete Error: {e}")
+        logger.error(f"❌ 删除出错 | Delete Error: {e}")
         
     # 3. 数据库删除
     cursor.execute("DELETE FROM photos WHERE id=?", (row['id'],))
     conn.commit()
+
+    # 4. 最后一条引用该内容的记录删除后，清理内容寻址存储
+    if row['hash']:
+        cursor.execute("SELECT 1 FROM photos WHERE hash=? LIMIT 1", (row['hash'],))
+        if not cursor.fetchone():
+            blob_store.remove(row['hash'], PROJECT_ROOT)
     conn.close()
     
     sync_gallery_js()
@@ -335,7 +420,7 @@ def handle_reorder(query, body):
     cat_id = query.get('category', [None])[0]
     if not cat_id: return {}
     
-    print(f"  [ PHOTOS ] ↕️  图库重排序 | Reordering gallery: {cat_id}")
+    logger.info(f"↕️  图库重排序 | Reordering gallery: {cat_id}")
     
     # body: [ {path: '...'}, ... ]
     # 这意味着前端给的是一个新的顺序列表
@@ -353,10 +438,10 @@ def handle_reorder(query, body):
             cursor.execute("UPDATE photos SET sort_order=? WHERE path=? AND category=?", (index, path, cat_id))
         
         conn.commit()
-        print(f"  [ PHOTOS ] ✅ 排序完成 | Reorder complete ({len(body)} items)")
+        logger.info(f"✅ 排序完成 | Reorder complete ({len(body)} items)", category=cat_id, items=len(body))
         
     except Exception as e:
-        print(f"  [ PHOTOS ] ❌ 排序错误 | Reorder Error: {e}")
+        logger.error(f"❌ 排序错误 | Reorder Error: {e}")
         conn.rollback()
         
     conn.close()
@@ -382,6 +467,6 @@ def update_tags(photo_id, tags):
     conn.commit()
     conn.close()
     
-    print(f"  [ PHOTOS ] 🏷️  Tags Updated: {photo_id} -> {tags}")
+    logger.debug(f"🏷️  Tags Updated: {photo_id} -> {tags}", id=photo_id, tags=len(tags))
     sync_gallery_js()
     return True
@@ -0,0 +1,217 @@
+"""
+MAERS Request Profiler
+按需对单个请求做确定性剖析 (sys.setprofile)，输出火焰图可用的折叠栈 (collapsed stacks)：
+- 请求带 X-Maers-Profile: 1 头或 ?_profile=1 参数时启用，其余请求零开销
+- 每条折叠栈为 "路由;帧;帧;... 微秒"，可直接交给 flamegraph.pl / speedscope
+- 同时按最内层帧归类自耗时：sqlite / json / pillow / fs (文件与目录 IO) / net / python
+- 结果保存在 cache/profiles/，由 /api/_profiles 列出
+注意：剖析本身有明显开销，记录的耗时只用于比较各部分占比。
+"""
+import os
+import re
+import sys
+import json
+import time
+import threading
+
+from . import log
+
+logger = log.get_logger('PROFILE')
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+PROFILE_DIR = os.path.join(BASE_DIR, 'cache', 'profiles')
+
+PROFILE_HEADER = 'X-Maers-Profile'
+PROFILE_PARAM = '_profile'
+MAX_PROFILES = 50  # 超出后删除最旧的记录
+FOLDED_EXT = '.folded'
+SUMMARY_EXT = '.json'
+
+# C 函数所属模块 / Python 帧所在目录 → 分类
+_C_MODULE_CATEGORIES = {
+    'sqlite3': 'sqlite', '_sqlite3': 'sqlite',
+    '_json': 'json', 'json': 'json',
+    '_io': 'fs', 'io': 'fs', 'posix': 'fs', 'nt': 'fs', 'shutil': 'fs',
+    '_socket': 'net', 'socket': 'net',
+}
+_PATH_CATEGORIES = (
+    (os.sep + 'sqlite3' + os.sep, 'sqlite'),
+    (os.sep + 'json' + os.sep, 'json'),
+    (os.sep + 'PIL' + os.sep, 'pillow'),
+    (os.sep + 'pillow_avif' + os.sep, 'pillow'),
+)
+_FS_BUILTINS = {'open', 'scandir', 'stat', 'listdir', 'remove', 'rename', 'replace', 'makedirs', 'mkdir'}
+
+_lock = threading.Lock()
+
+# ================= 启用判断 =================
+
+def requested(query_params, headers):
+    if query_params.get(PROFILE_PARAM, [''])[0] in ('1', 'true'):
+        return True
+    return bool(headers) and headers.get(PROFILE_HEADER, '') in ('1', 'true')
+
+# ================= 剖析器 =================
+
+def _module_category(module):
+    root = module.split('.')[0]
+    return 'pillow' if root == 'PIL' else _C_MODULE_CATEGORIES.get(root)
+
+def _c_label(func):
+    name = getattr(func, '__qualname__', None) or getattr(func, '__name__', '?')
+    module = getattr(func, '__module__', None)
+    category = None
+    if module is None:
+        # 内置方法：按所属对象的类型 (含基类，如 metrics.TimedCursor → sqlite3.Cursor) 归类
+        owner = getattr(func, '__self__', None)
+        if isinstance(owner, type(sys)):
+            module = owner.__name__
+        else:
+            module = type(owner).__module__
+            for cls in type(owner).__mro__:
+                category = _module_category(cls.__module__)
+                if category:
+                    break
+    if category is None:
+        if module == 'builtins':
+            category = 'fs' if name in _FS_BUILTINS else None
+        else:
+            category = _module_category(module)
+    return f"{module}.{name}", category
+
+def _py_label(code):
+    filename = code.co_filename
+    category = None
+    for marker, cat in _PATH_CATEGORIES:
+        if marker in filename:
+            category = cat
+            break
+    return f"{os.path.basename(filename)}:{code.co_name}", category
+
+class StackProfiler:
+    """sys.setprofile 钩子：维护调用栈，把相邻两次事件之间的时间记到当前栈上"""
+    def __init__(self, root_label):
+        self.stack = [(root_label, 'python')]   # (折叠栈路径, 分类)
+        self.folded = {}
+        self.categories = {}
+        self._labels = {}
+        self._last = 0.0
+
+    def _account(self, now):
+        path, category = self.stack[-1]
+        elapsed = now - self._last
+        self.folded[path] = self.folded.get(path, 0.0) + elapsed
+        self.categories[category] = self.categories.get(category, 0.0) + elapsed
+
+    def _push(self, label, category):
+        parent_path, parent_category = self.stack[-1]
+        # 未识别的帧沿用调用方的分类 (如 PIL 内部调用的标准库函数)
+        self.stack.append((f"{parent_path};{label}", category or parent_category))
+
+    def _hook(self, frame, event, arg):
+        self._account(time.perf_counter())
+        if event == 'call':
+            code = frame.f_code
+            entry = self._labels.get(code)
+            if entry is None:
+                entry = self._labels[code] = _py_label(code)
+            self._push(*entry)
+        elif event == 'c_call':
+            # 绑定方法每次调用都是新对象，不做缓存 (也避免持有其引用)
+            self._push(*_c_label(arg))
+        elif len(self.stack) > 1:  # return / c_return / c_exception
+            self.stack.pop()
+        self._last = time.perf_counter()
+
+    def run(self, func):
+        previous = sys.getprofile()
+        self._last = time.perf_counter()
+        sys.setprofile(self._hook)
+        try:
+            return func()
+        finally:
+            sys.setprofile(previous)
+            self._account(time.perf_counter())
+
+# ================= 存储 =================
+
+def _slug(text):
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', text).strip('_')[:80] or 'root'
+
+def _prune():
+    names = sorted(n for n in os.listdir(PROFILE_DIR) if n.endswith(SUMMARY_EXT))
+    for name in names[:max(0, len(names) - MAX_PROFILES)]:
+        stem = name[:-len(SUMMARY_EXT)]
+        for ext in (SUMMARY_EXT, FOLDED_EXT):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, stem + ext))
+            except OSError:
+                pass
+
+def save(profiler, route, duration):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S') + f"-{int(time.time() * 1000) % 1000:03d}"
+    stem = f"{stamp}_{_slug(route)}_{int(duration * 1000)}ms"
+    with open(os.path.join(PROFILE_DIR, stem + FOLDED_EXT), 'w', encoding='utf-8') as f:
+        for path, seconds in sorted(profiler.folded.items()):
+            micros = int(seconds * 1_000_000)
+            if micros:
+                f.write(f"{path} {micros}\n")
+
+    total = sum(profiler.categories.values()) or 1.0
+    summary = {
+        'name': stem,
+        'route': route,
+        'created_at': time.time(),
+        'duration_ms': round(duration * 1000, 2),
+        'categories': {
+            cat: {'ms': round(sec * 1000, 2), 'share': round(sec / total, 4)}
+            for cat, sec in sorted(profiler.categories.items(), key=lambda kv: -kv[1])
+        },
+    }
+    with open(os.path.join(PROFILE_DIR, stem + SUMMARY_EXT), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    _prune()
+    return summary
+
+def profile(route, func):
+    """剖析 func() 并保存结果；剖析失败不影响请求本身"""
+    with _lock:
+        profiler = StackProfiler(route)
+        start = time.perf_counter()
+        try:
+            return profiler.run(func)
+        finally:
+            duration = time.perf_counter() - start
+            try:
+                summary = save(profiler, route, duration)
+                logger.info(f"🔬 已保存剖析结果 | Profile saved: {summary['name']}")
+            except Exception as e:
+                logger.warning(f"⚠️  剖析结果保存失败 | Failed to save profile: {e}")
+
+# ================= 查询 =================
+
+def list_profiles():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not name.endswith(SUMMARY_EXT):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, name), 'r', encoding='utf-8') as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+def read_folded(name):
+    """返回折叠栈文本 (name 不合法或不存在时为 None)"""
+    if not name or os.path.basename(name) != name:
+        return None
+    path = os.path.join(PROFILE_DIR, name + FOLDED_EXT)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
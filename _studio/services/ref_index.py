@@ -0,0 +1,246 @@
+"""
+MAERS Reference Index
+持久化的资源引用索引 (被引用路径 → 引用方)：
+- 引用方为 CMS 正文 MD 文件 (以数据库 content 字段的 data 相对路径为键)
+- 每次正文写入时增量更新；全量刷新时仅重新扫描 mtime / size 变化的文件，扫描多进程并行
+- 供 clean-data.py 构建白名单，避免每次重读全部 MD
+- 封面 / Space 图标 / 音乐数据以带前缀的引用方登记 (cover:<id>、space-tree、music-data)，
+  引用计数归零的路径进入 pending 队列，由 asset_gc 后台回收
+"""
+import os
+import re
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from . import metrics
+from . import log
+from .image_variants import FORMAT_EXTS
+
+logger = log.get_logger('CLEAN')
+
+# ================= 配置 =================
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+INDEX_DB = os.path.join(CACHE_DIR, 'ref-index.db')
+
+REF_PATTERN = re.compile(r'photos/[^"\'\s)]+\.[\w]+')
+PARALLEL_THRESHOLD = 32  # 待扫描文件少于该数量时不启动进程池
+
+# ================= 引用提取 =================
+
+def expand_ref(path):
+    """原图引用同时保护其缩略图 / 预览图 (同扩展名及按 Accept 协商生成的各种编码)"""
+    path = path.replace('\\', '/')
+    refs = {path}
+    if path.startswith('photos/images/'):
+        refs.add(path.replace('photos/images/', 'photos/thumbnails/'))
+        refs.add(path.replace('photos/images/', 'photos/previews/'))
+        base = os.path.splitext(path)[0]
+        for ext in FORMAT_EXTS:
+            refs.add(base.replace('photos/images/', 'photos/thumbnails/') + ext)
+            refs.add(base.replace('photos/images/', 'photos/previews/') + ext)
+    return refs
+
+def extract_refs(text):
+    refs = set()
+    for m in set(REF_PATTERN.findall(text or '')):
+        refs |= expand_ref(m)
+    return refs
+
+def file_stamp(full_path):
+    try:
+        st = os.stat(full_path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+def _scan_worker(item):
+    """进程池任务: (source, full_path) → (source, stamp, refs, error)"""
+    source, full_path = item
+    try:
+        stamp = file_stamp(full_path)
+        with open(full_path, 'r', encoding='utf-8') as f:
+            return source, stamp, extract_refs(f.read()), None
+    except Exception as e:
+        return source, None, set(), str(e)
+
+# ================= 索引 =================
+
+class RefIndex:
+    def __init__(self, db_path=INDEX_DB):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = self._connect()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS sources (
+                source TEXT PRIMARY KEY,
+                mtime_ns INTEGER,
+                size INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS refs (
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                PRIMARY KEY (source, target)
+            );
+            CREATE INDEX IF NOT EXISTS idx_refs_target ON refs(target);
+            CREATE TABLE IF NOT EXISTS pending (
+                target TEXT PRIMARY KEY,
+                since REAL NOT NULL
+            );
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _connect(self):
+        return metrics.connect(self.db_path, timeout=10)
+
+    @staticmethod
+    def _drop(conn, source):
+        """移除引用方，其引用的路径若因此失去全部引用则进入 pending 队列"""
+        old = [r[0] for r in conn.execute("SELECT target FROM refs WHERE source=?", (source,))]
+        conn.execute("DELETE FROM sources WHERE source=?", (source,))
+        conn.execute("DELETE FROM refs WHERE source=?", (source,))
+        now = time.time()
+        for target in old:
+            if conn.execute("SELECT 1 FROM refs WHERE target=? LIMIT 1", (target,)).fetchone() is None:
+                conn.execute("INSERT OR IGNORE INTO pending (target, since) VALUES (?, ?)", (target, now))
+
+    @classmethod
+    def _store(cls, conn, source, stamp, refs):
+        cls._drop(conn, source)
+        mtime_ns, size = stamp or (None, None)
+        conn.execute("INSERT INTO sources (source, mtime_ns, size) VALUES (?, ?, ?)",
+                     (source, mtime_ns, size))
+        conn.executemany("INSERT OR IGNORE INTO refs (source, target) VALUES (?, ?)",
+                         [(source, t) for t in refs])
+        conn.executemany("DELETE FROM pending WHERE target=?", [(t,) for t in refs])
+
+    # ---------- 写入钩子 ----------
+
+    def update_source(self, source, full_path, text=None):
+        """正文写入后调用；text 为空时从磁盘读取"""
+        if text is None:
+            with open(full_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        with self.lock:
+            conn = self._connect()
+            self._store(conn, source, file_stamp(full_path), extract_refs(text))
+            conn.commit()
+            conn.close()
+
+    def set_refs(self, source, refs):
+        """登记非文件型引用方 (封面、JSON 数据文件等) 的完整引用集合"""
+        with self.lock:
+            conn = self._connect()
+            self._store(conn, source, None, set(refs))
+            conn.commit()
+            conn.close()
+
+    def rename_source(self, old_source, new_source):
+        with self.lock:
+            conn = self._connect()
+            self._drop(conn, new_source)
+            conn.execute("UPDATE sources SET source=? WHERE source=?", (new_source, old_source))
+            conn.execute("UPDATE refs SET source=? WHERE source=?", (new_source, old_source))
+            conn.commit()
+            conn.close()
+
+    def remove_source(self, source):
+        with self.lock:
+            conn = self._connect()
+            self._drop(conn, source)
+            conn.commit()
+            conn.close()
+
+    # ---------- 增量刷新 ----------
+
+    def refresh(self, sources, workers=None, full=False):
+        """
+        与当前的 MD 引用方集合对齐。
+        sources: { source: full_path }；不在其中的旧 MD 记录会被移除 (带前缀的非文件引用方不受影响)。
+        仅重新扫描 stamp 变化 (或 full=True) 的文件。
+        """
+        stats = {'scanned': 0, 'unchanged': 0, 'removed': 0, 'error': 0}
+        with self.lock:
+            conn = self._connect()
+            known = {row[0]: (row[1], row[2]) for row in conn.execute(
+                "SELECT source, mtime_ns, size FROM sources WHERE mtime_ns IS NOT NULL")}
+
+            stale = [s for s in known if s not in sources]
+            for s in stale:
+                self._drop(conn, s)
+            stats['removed'] = len(stale)
+
+            pending = []
+            for source, full_path in sources.items():
+                if not full and source in known and known[source] == file_stamp(full_path):
+                    stats['unchanged'] += 1
+                else:
+                    pending.append((source, full_path))
+
+            if len(pending) >= PARALLEL_THRESHOLD and workers != 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(_scan_worker, pending, chunksize=16))
+            else:
+                results = [_scan_worker(item) for item in pending]
+
+            for source, stamp, refs, err in results:
+                if err:
+                    stats['error'] += 1
+                    logger.warning(f"⚠️  引用扫描失败 | Ref scan failed: {source} ({err})")
+                    continue
+                self._store(conn, source, stamp, refs)
+                stats['scanned'] += 1
+
+            conn.commit()
+            conn.close()
+        return stats
+
+    # ---------- 查询 ----------
+
+    def targets(self):
+        conn = self._connect()
+        rows = conn.execute("SELECT DISTINCT target FROM refs").fetchall()
+        conn.close()
+        return {r[0] for r in rows}
+
+    def refcount(self, target):
+        conn = self._connect()
+        row = conn.execute("SELECT COUNT(*) FROM refs WHERE target=?", (target,)).fetchone()
+        conn.close()
+        return row[0]
+
+    def due(self, older_than, limit):
+        """引用归零且已超过宽限期的路径"""
+        conn = self._connect()
+        rows = conn.execute("SELECT target FROM pending WHERE since <= ? ORDER BY since LIMIT ?",
+                            (older_than, limit)).fetchall()
+        conn.close()
+        return [r[0] for r in rows]
+
+    def discard_pending(self, targets):
+        with self.lock:
+            conn = self._connect()
+            conn.executemany("DELETE FROM pending WHERE target=?", [(t,) for t in targets])
+            conn.commit()
+            conn.close()
+
+    def referrers(self, target):
+        conn = self._connect()
+        rows = conn.execute("SELECT source FROM refs WHERE target=? ORDER BY source", (target,)).fetchall()
+        conn.close()
+        return [r[0] for r in rows]
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """进程内单例"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = RefIndex()
+        return _index
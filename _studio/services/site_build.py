@@ -0,0 +1,309 @@
+"""
+MAERS Site Build
+把可发布的站点文件导出到输出目录 (默认 dist/)，为静态资源加内容哈希：
+- 被 HTML / CSS / ESM import 引用到的 JS、CSS、图片额外输出 name.<hash>.ext，并改写引用方
+- JS / CSS 的哈希包含其依赖的最终文件名，依赖变化会逐级传递到引用方 (循环依赖按整组计算)
+- 原文件名的副本保留 (兼容运行时拼接的路径)，缓存策略仍为 must-revalidate
+- 文本资源预压缩为 .gz (安装 brotli 时额外输出 .br)
+- 输出目录中的 vercel.json 为带哈希的文件加上 immutable 缓存头
+- 增量构建：清单 (.build-manifest.json) 记录每个文件的 mtime / 大小 / 摘要 / 输出键，未变化的文件直接跳过
+"""
+import os
+import gzip
+import json
+import time
+import hashlib
+
+from . import asset_refs
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+DEFAULT_OUT_DIR = os.path.join(PROJECT_ROOT, 'dist')
+
+MANIFEST_NAME = '.build-manifest.json'
+MANIFEST_VERSION = 1
+HASH_LEN = 10
+
+# 不发布的目录 / 文件 (以 . 开头的条目一律跳过)
+EXCLUDE_DIRS = {'_studio', '_说明', 'dist', 'node_modules', '__pycache__'}
+EXCLUDE_FILES = {'requests.jsonl', 'vercel.json'}
+EXCLUDE_EXTS = {'.db', '.db-wal', '.db-shm', '.bat', '.py', '.pyc', '.exe', '.tmp', '.patch'}
+
+HASHABLE_EXTS = {'.js', '.mjs', '.css', '.svg', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.ico',
+                 '.woff', '.woff2', '.ttf'}
+# Service Worker 的作用域与注册地址绑定，必须保持固定 URL
+NEVER_HASH = {'maers-version-controller.js'}
+
+COMPRESS_EXTS = {'.html', '.htm', '.js', '.mjs', '.css', '.json', '.svg', '.txt', '.xml', '.md', '.map'}
+COMPRESS_MIN_BYTES = 1024
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+def iter_publishable(root=PROJECT_ROOT, skip_dir=None):
+    """按路径顺序产出可发布文件 (rel_path, os.stat_result)；skip_dir 为额外跳过的目录 (如输出目录)"""
+    root = os.path.abspath(root)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            d for d in dirnames
+            if not (d.startswith('.') or d in EXCLUDE_DIRS or os.path.join(dirpath, d) == skip_dir)
+        )
+        rel_dir = os.path.relpath(dirpath, root).replace(os.sep, '/')
+        for name in sorted(filenames):
+            if name.startswith('.') or name in EXCLUDE_FILES or os.path.splitext(name)[1].lower() in EXCLUDE_EXTS:
+                continue
+            rel = name if rel_dir == '.' else f"{rel_dir}/{name}"
+            yield rel, os.stat(os.path.join(dirpath, name))
+
+def hashed_name(rel_path, digest):
+    base, ext = os.path.splitext(rel_path)
+    return f"{base}.{digest[:HASH_LEN]}{ext}"
+
+def _sha256(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode('utf-8') if isinstance(part, str) else part)
+        h.update(b'\0')
+    return h.hexdigest()
+
+def _strongly_connected(nodes, edges):
+    """迭代式 Tarjan：按 "依赖在前" 的顺序返回强连通分量"""
+    index, low, on_stack, stack, result = {}, {}, set(), [], []
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, iter(edges.get(root, ())))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, children = work[-1]
+            advanced = False
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(edges.get(child, ()))))
+                    advanced = True
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                result.append(sorted(component))
+    return result
+
+class SiteBuilder:
+    def __init__(self, root=PROJECT_ROOT, out_dir=DEFAULT_OUT_DIR, compress=True, force=False):
+        self.root = os.path.abspath(root)
+        self.out_dir = os.path.abspath(out_dir)
+        self.compress = compress
+        self.force = force
+        self.manifest_path = os.path.join(self.out_dir, MANIFEST_NAME)
+        self.files = {}      # rel -> {'mtime_ns', 'size', 'digest', 'deps'}
+        self.names = {}      # rel -> 带哈希的文件名 (仅被引用的可哈希资源)
+        self.stats = {'files': 0, 'read': 0, 'written': 0, 'skipped': 0, 'removed': 0,
+                      'hashed': 0, 'compressed': 0, 'bytes_written': 0}
+        self.phase_times = []
+        self._old = self._load_manifest()
+
+    # ---------- 清单 ----------
+
+    def _load_manifest(self):
+        if self.force:
+            return {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != MANIFEST_VERSION or data.get('root') != self.root:
+            return {}
+        return data.get('files', {})
+
+    def _save_manifest(self, entries):
+        data = {
+            'version': MANIFEST_VERSION,
+            'root': self.root,
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'assets': dict(sorted(self.names.items())),
+            'files': entries,
+        }
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, self.manifest_path)
+
+    # ---------- 扫描 ----------
+
+    def scan(self):
+        """列举可发布文件，未变化的文件沿用清单中的摘要与依赖 (不读取内容)"""
+        for rel, st in iter_publishable(self.root, skip_dir=self.out_dir):
+            old = self._old.get(rel)
+            if old and old['mtime_ns'] == st.st_mtime_ns and old['size'] == st.st_size:
+                digest, deps = old['digest'], old['deps']
+            else:
+                digest, deps = self._analyze(rel)
+                self.stats['read'] += 1
+            self.files[rel] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'digest': digest, 'deps': deps}
+        self.stats['files'] = len(self.files)
+
+    def _read(self, rel):
+        with open(os.path.join(self.root, rel.replace('/', os.sep)), 'rb') as f:
+            return f.read()
+
+    def _analyze(self, rel):
+        raw = self._read(rel)
+        deps = []
+        if asset_refs.kind_of(rel):
+            try:
+                deps = asset_refs.find_deps(rel, raw.decode('utf-8'))
+            except UnicodeDecodeError:
+                pass
+        return hashlib.sha256(raw).hexdigest(), deps
+
+    # ---------- 哈希命名 ----------
+
+    def _hashable(self, rel):
+        return rel not in NEVER_HASH and os.path.splitext(rel)[1].lower() in HASHABLE_EXTS
+
+    def assign_names(self):
+        """被引用的可哈希资源按 (自身摘要 + 依赖的最终文件名) 命名，依赖优先处理"""
+        referenced = {dep for entry in self.files.values() for dep in entry['deps']
+                      if dep in self.files and self._hashable(dep)}
+        edges = {rel: [d for d in self.files[rel]['deps'] if d in referenced] for rel in referenced}
+        for component in _strongly_connected(sorted(referenced), edges):
+            members = set(component)
+            external = sorted({self.names[d] for rel in component for d in edges[rel] if d not in members})
+            # 单个文件即 (摘要 + 依赖名)；循环依赖的一组文件共用同一个哈希
+            group = _sha256(*(self.files[rel]['digest'] for rel in component), *external)
+            for rel in component:
+                self.names[rel] = hashed_name(rel, group)
+        self.stats['hashed'] = len(self.names)
+
+    # ---------- 输出 ----------
+
+    def _out_path(self, rel):
+        return os.path.join(self.out_dir, rel.replace('/', os.sep))
+
+    def _write(self, rel, data):
+        path = self._out_path(rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.stats['bytes_written'] += len(data)
+        return self._write_compressed(rel, data)
+
+    def _write_compressed(self, rel, data):
+        """写入 .gz / .br 旁路文件 (压缩后更大则不输出)，返回实际输出的路径列表"""
+        outputs = [rel]
+        if not self.compress or os.path.splitext(rel)[1].lower() not in COMPRESS_EXTS:
+            return outputs
+        if len(data) < COMPRESS_MIN_BYTES:
+            return outputs
+        encoders = [('.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+        if HAS_BROTLI:
+            encoders.append(('.br', lambda d: brotli.compress(d, quality=11)))
+        for suffix, encode in encoders:
+            packed = encode(data)
+            if len(packed) < len(data):
+                with open(self._out_path(rel + suffix), 'wb') as f:
+                    f.write(packed)
+                outputs.append(rel + suffix)
+                self.stats['compressed'] += 1
+        return outputs
+
+    def _output_key(self, rel, entry, targets):
+        rewrites = sorted((d, self.names[d]) for d in entry['deps'] if d in self.names)
+        return _sha256(entry['digest'], json.dumps(rewrites), *targets, str(self.compress))
+
+    def emit(self):
+        entries = {}
+        for rel, entry in self.files.items():
+            targets = [rel] + ([self.names[rel]] if rel in self.names else [])
+            key = self._output_key(rel, entry, targets)
+            old = self._old.get(rel)
+            if old and old.get('key') == key and all(os.path.exists(self._out_path(p)) for p in old['outputs']):
+                outputs = old['outputs']
+                self.stats['skipped'] += 1
+            else:
+                data = self._read(rel)
+                if any(d in self.names for d in entry['deps']):
+                    data = asset_refs.rewrite(rel, data.decode('utf-8'), self.names).encode('utf-8')
+                outputs = []
+                for target in targets:
+                    outputs += self._write(target, data)
+                self.stats['written'] += 1
+            entries[rel] = {**entry, 'key': key, 'outputs': outputs}
+        return entries
+
+    def remove_stale(self, entries):
+        """删除上一次构建输出、本次不再产生的文件"""
+        current = {p for entry in entries.values() for p in entry['outputs']}
+        for entry in self._old.values():
+            for path in entry.get('outputs', ()):
+                if path not in current:
+                    try:
+                        os.remove(self._out_path(path))
+                        self.stats['removed'] += 1
+                    except OSError:
+                        pass
+
+    def write_headers(self):
+        """输出目录的 vercel.json：沿用项目配置，并为带哈希的资源追加 immutable 规则 (后出现的规则优先)"""
+        config = {}
+        try:
+            with open(os.path.join(self.root, 'vercel.json'), 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            pass
+        exts = '|'.join(sorted(e.lstrip('.') for e in HASHABLE_EXTS))
+        config['headers'] = list(config.get('headers', [])) + [{
+            'source': f"/(.*)\\.([0-9a-f]{{{HASH_LEN}}})\\.({exts})",
+            'headers': [{'key': 'Cache-Control', 'value': IMMUTABLE_CACHE}],
+        }]
+        with open(os.path.join(self.out_dir, 'vercel.json'), 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=4)
+
+    def _phase(self, name, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.phase_times.append((name, time.perf_counter() - start))
+        return result
+
+    def build(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._phase('scan', self.scan)
+        self._phase('hash', self.assign_names)
+        entries = self._phase('emit', self.emit)
+        self._phase('cleanup', self.remove_stale, entries)
+        self.write_headers()
+        self._save_manifest(entries)
+        return self.stats
+
+def build_site(out_dir=DEFAULT_OUT_DIR, root=PROJECT_ROOT, compress=True, force=False):
+    builder = SiteBuilder(root, out_dir, compress=compress, force=force)
+    builder.build()
+    return builder
@@ -1,10 +1,11 @@
 import os
 import json
-import urllib.request
-import urllib.parse
-import re
-from html.parser import HTMLParser
-from . import cms
+from . import space_meta
+from . import space_tree
+from . import asset_gc
+from . import log
+
+logger = log.get_logger('SPACE')
 
 # ================= 配置 =================
 SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -13,117 +14,20 @@ PROJECT_ROOT = os.path.dirname(BASE_DIR)
 DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
 SPACE_JSON_PATH = os.path.join(DATA_DIR, 'space-collections.json')
 
-# ================= HTML Parser for Metadata =================
-class MetaParser(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.title = None
-        self.description = None
-        self.icon_url = None
-        self.in_title = False
-        
-    def handle_starttag(self, tag, attrs):
-        attrs_dict = dict(attrs)
-        
-        # Title tag
-        if tag == 'title':
-            self.in_title = True
-            
-        # Meta description
-        if tag == 'meta':
-            name = attrs_dict.get('name', '').lower()
-            property_attr = attrs_dict.get('property', '').lower()
-            
-            if name == 'description' or property_attr == 'og:description':
-                self.description = attrs_dict.get('content', '')
-                
-        # Favicon
-        if tag == 'link':
-            rel = attrs_dict.get('rel', '').lower()
-            if 'icon' in rel:
-                self.icon_url = attrs_dict.get('href', '')
-                
-    def handle_data(self, data):
-        if self.in_title and not self.title:
-            self.title = data.strip()
-            
-    def handle_endtag(self, tag):
-        if tag == 'title':
-            self.in_title = False
-
 # ================= URL Metadata Fetcher =================
-def fetch_url_metadata(url):
+# 解析器与抓取引擎位于 space_meta (并发、流式解析、本地缓存)
+MetaParser = space_meta.MetaParser
+
+def fetch_url_metadata(url, force=False):
     """
-    抓取网站的 Title, Description, Favicon
-    返回: { 'title': str, 'description': str, 'icon_url': str }
+    抓取网站的 Title, Description, Favicon (命中本地缓存时不发请求)
+    返回: { 'title': str, 'description': str, 'icon_url': str, 'google_icon': str }
     """
-    try:
-        # 确保 URL 有协议
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-            
-        # 解析域名
-        parsed = urllib.parse.urlparse(url)
-        domain = parsed.netloc
-        
-        # 设置请求头
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        req = urllib.request.Request(url, headers=headers)
-        
-        # 获取页面内容
-        with urllib.request.urlopen(req, timeout=10) as response:
-            html = response.read().decode('utf-8', errors='ignore')
-            
-        # 解析 HTML
-        parser = MetaParser()
-        parser.feed(html)
-        
-        # 处理 Favicon URL
-        icon_url = parser.icon_url
-        if icon_url:
-            # 相对路径转绝对路径
-            if icon_url.startswith('//'):
-                icon_url = parsed.scheme + ':' + icon_url
-            elif icon_url.startswith('/'):
-                icon_url = f"{parsed.scheme}://{domain}{icon_url}"
-            elif not icon_url.startswith('http'):
-                icon_url = f"{parsed.scheme}://{domain}/{icon_url}"
-        else:
-            # 默认尝试 /favicon.ico
-            icon_url = f"{parsed.scheme}://{domain}/favicon.ico"
-            
-        # 使用 Google Favicon API 作为备选
-        google_icon = f"https://www.google.com/s2/favicons?sz=128&domain={domain}"
-        
-        return {
-            'title': parser.title or domain,
-            'description': parser.description or '',
-            'icon_url': icon_url,
-            'google_icon': google_icon  # 提供备选方案
-        }
-        
-    except Exception as e:
-        print(f"  [ SPACE ] ⚠️  URL 抓取失败 | Fetch failed: {url} - {e}")
-        # 返回基础信息
-        try:
-            parsed = urllib.parse.urlparse(url if url.startswith('http') else 'https://' + url)
-            domain = parsed.netloc
-            return {
-                'title': domain,
-                'description': '',
-                'icon_url': f"https://www.google.com/s2/favicons?sz=128&domain={domain}",
-                'google_icon': f"https://www.google.com/s2/favicons?sz=128&domain={domain}"
-            }
-        except:
-            return {
-                'title': url,
-                'description': '',
-                'icon_url': 'ui/placeholder.svg',
-                'google_icon': 'ui/placeholder.svg'
-            }
+    return space_meta.fetch_one(url, force=force)['data']
+
+def fetch_url_metadata_batch(urls, force=False):
+    """批量抓取，返回逐条结果 { 'url', 'ok', 'cached', 'data' }"""
+    return space_meta.fetch_many(urls, force=force)
 
 # ================= JSON 数据操作 =================
 def load_collections():
@@ -134,7 +38,7 @@ def load_collections():
         with open(SPACE_JSON_PATH, 'r', encoding='utf-8') as f:
             return json.load(f)
     except Exception as e:
-        print(f"  [ SPACE ] ❌ 加载失败 | Load failed: {e}")
+        logger.error(f"❌ 加载失败 | Load failed: {e}")
         return []
 
 def save_collections(data):
@@ -151,10 +55,10 @@ def save_collections(data):
             os.remove(SPACE_JSON_PATH)
         os.rename(temp_path, SPACE_JSON_PATH)
         
-        print(f"  [ SPACE ] 💾 数据已保存 | Data saved")
+        logger.info(f"💾 数据已保存 | Data saved")
         return True
     except Exception as e:
-        print(f"  [ SPACE ] ❌ 保存失败 | Save failed: {e}")
+        logger.error(f"❌ 保存失败 | Save failed: {e}")
         if os.path.exists(temp_path):
             try: os.remove(temp_path)
             except: pass
@@ -173,7 +77,7 @@ def add_collection(item_data):
     collections.insert(0, item_data)
     
     if save_collections(collections):
-        print(f"  [ SPACE ] 🆕 已添加 | Added: {item_data['title']}")
+        logger.info(f"🆕 已添加 | Added: {item_data['title']}")
         return True
     return False
 
@@ -188,7 +92,7 @@ def update_collection(item_id, update_data):
                 item[key] = value # 允许修改 ID
                     
             if save_collections(collections):
-                print(f"  [ SPACE ] ✎  已更新 | Updated: {item_id}")
+                logger.info(f"✎  已更新 | Updated: {item_id}")
                 return True
             return False
             
@@ -205,7 +109,7 @@ def delete_collection(item_id):
         raise ValueError(f"Item with ID '{item_id}' not found")
         
     if save_collections(new_collections):
-        print(f"  [ SPACE ] 🗑️  已删除 | Deleted: {item_id}")
+        logger.info(f"🗑️  已删除 | Deleted: {item_id}")
         return True
     return False
 
@@ -228,49 +132,29 @@ def reorder_collections(id_list):
             reordered.append(item)
             
     if save_collections(reordered):
-        print(f"  [ SPACE ] ↕️  已重排序 | Reordered")
+        logger.info(f"↕️  已重排序 | Reordered")
         return True
     return False
 
 # ================= Tree Operations =================
 def load_tree():
-    """Load space-tree.json"""
-    tree_path = os.path.join(DATA_DIR, 'space-tree.json')
-    if not os.path.exists(tree_path):
-        return {"root": []}
-    try:
-        with open(tree_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"  [ SPACE ] ❌ Load Tree failed: {e}")
-        return {"root": []}
+    """Load space-tree.json (常驻模型，按 mtime 失效)"""
+    return space_tree.get_model().get_tree()
 
 def save_tree(data):
     """Save space-tree.json"""
-    tree_path = os.path.join(DATA_DIR, 'space-tree.json')
     try:
-        cms.save_json(tree_path, data)
+        space_tree.get_model().replace_tree(data)
+        asset_gc.track_space_tree(data)
+        logger.info(f"💾 数据已保存 | Tree saved")
         return True
     except Exception as e:
-        print(f"  [ SPACE ] ❌ Save Tree failed: {e}")
+        logger.error(f"❌ Save Tree failed: {e}")
         return False
 
 def update_node_tags(node_id, tags):
-    """Recursively find node and update tags"""
-    data = load_tree()
-    
-    def find_and_update(nodes):
-        for node in nodes:
-            if node.get('id') == node_id:
-                node['tags'] = tags
-                return True
-            if node.get('children'):
-                if find_and_update(node['children']):
-                    return True
-        return False
-
-    if find_and_update(data.get('root', [])):
-        if save_tree(data):
-            print(f"  [ SPACE ] 🏷️  Tags Updated: {node_id} -> {tags}")
-            return True
+    """按 id 直接定位节点并更新标签"""
+    if space_tree.get_model().update_tags(node_id, tags):
+        logger.info(f"🏷️  Tags Updated: {node_id} -> {tags}")
+        return True
     return False
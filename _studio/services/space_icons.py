@@ -0,0 +1,208 @@
+"""
+MAERS Space Icon Mirror
+将 Space 书签的远程图标下载到本地：统一缩放为小尺寸 WebP，按内容哈希存放于 photos/icons/，
+可选地为每个文件夹生成雪碧图 (sprite) 及其 CSS / JSON 索引。
+"""
+import io
+import os
+import json
+import re
+import math
+import hashlib
+import urllib.request
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from . import space_tree
+from . import asset_gc
+from . import log
+
+logger = log.get_logger('SPACE')
+
+# ================= 配置 =================
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+
+ICON_DIR = 'photos/icons'
+SPRITE_DIR = 'photos/icons/sprites'
+SPRITE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')  # 文件夹 ID 直接作为雪碧图文件名
+ICON_SIZE = 64
+MAX_ICON_BYTES = 1024 * 1024
+FETCH_TIMEOUT = 10
+MAX_WORKERS = 8
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+    logger.warning("⚠️  未检测到 Pillow 库，图标镜像功能不可用 | Pillow missing, icon mirroring disabled")
+
+# ================= 工具函数 =================
+
+def is_remote(path):
+    return bool(path) and path.startswith(('http://', 'https://', '//'))
+
+def google_icon_url(page_url):
+    domain = urllib.parse.urlparse(page_url or '').netloc
+    return f"https://www.google.com/s2/favicons?sz=128&domain={domain}" if domain else None
+
+def _download(url):
+    if url.startswith('//'):
+        url = 'https:' + url
+    req = urllib.request.Request(url, headers=HEADERS)
+    with urllib.request.urlopen(req, timeout=FETCH_TIMEOUT) as resp:
+        data = resp.read(MAX_ICON_BYTES + 1)
+    if len(data) > MAX_ICON_BYTES:
+        raise ValueError("icon too large")
+    return data
+
+def normalize_icon(raw):
+    """解码任意位图图标 (ico/png/jpg/gif/webp)，居中缩放到 ICON_SIZE 正方形 WebP"""
+    img = Image.open(io.BytesIO(raw))
+    if getattr(img, 'n_frames', 1) > 1:
+        img.seek(0)
+    img = img.convert('RGBA')
+    img.thumbnail((ICON_SIZE, ICON_SIZE))
+    canvas = Image.new('RGBA', (ICON_SIZE, ICON_SIZE), (0, 0, 0, 0))
+    canvas.paste(img, ((ICON_SIZE - img.width) // 2, (ICON_SIZE - img.height) // 2))
+    buf = io.BytesIO()
+    canvas.save(buf, 'WEBP', quality=90, method=6)
+    return buf.getvalue()
+
+def store_icon(webp_bytes):
+    """按内容哈希落盘，返回站点相对路径 (已存在则直接复用)"""
+    digest = hashlib.sha1(webp_bytes).hexdigest()
+    rel_path = f"{ICON_DIR}/{digest[:2]}/{digest}.webp"
+    full_path = os.path.join(PROJECT_ROOT, rel_path)
+    if not os.path.exists(full_path):
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        temp_path = full_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(webp_bytes)
+        os.replace(temp_path, full_path)
+    return rel_path
+
+def mirror_one(icon_url, page_url=None):
+    """下载并转存单个图标，失败时回退到 Google Favicon 服务；返回本地路径或 None"""
+    candidates = [icon_url]
+    fallback = google_icon_url(page_url)
+    if fallback and fallback != icon_url:
+        candidates.append(fallback)
+
+    for url in candidates:
+        try:
+            return store_icon(normalize_icon(_download(url)))
+        except Exception as e:
+            logger.warning(f"⚠️  图标下载失败 | Icon fetch failed: {url} - {e}")
+    return None
+
+# ================= 树遍历 =================
+
+def _walk(nodes, parent_id='root'):
+    for node in nodes or []:
+        yield parent_id, node
+        if node.get('children'):
+            yield from _walk(node['children'], node.get('id'))
+
+# ================= 雪碧图 =================
+
+def sprite_paths(folder_id):
+    if not isinstance(folder_id, str) or not SPRITE_ID_PATTERN.match(folder_id):
+        raise ValueError(f"Invalid sprite folder id: {folder_id!r}")
+    base = f"{SPRITE_DIR}/{folder_id}"
+    return {'image': base + '.webp', 'css': base + '.css', 'index': base + '.json'}
+
+def build_sprite(folder_id, icon_paths):
+    """将同一文件夹下的本地图标打包为网格雪碧图"""
+    icon_paths = sorted(set(icon_paths))
+    if not icon_paths:
+        return None
+
+    cols = math.ceil(math.sqrt(len(icon_paths)))
+    rows = math.ceil(len(icon_paths) / cols)
+    sheet = Image.new('RGBA', (cols * ICON_SIZE, rows * ICON_SIZE), (0, 0, 0, 0))
+
+    index = {}
+    for i, rel_path in enumerate(icon_paths):
+        x, y = (i % cols) * ICON_SIZE, (i // cols) * ICON_SIZE
+        with Image.open(os.path.join(PROJECT_ROOT, rel_path)) as icon:
+            sheet.paste(icon.convert('RGBA'), (x, y))
+        index[rel_path] = {'x': x, 'y': y, 'w': ICON_SIZE, 'h': ICON_SIZE}
+
+    paths = sprite_paths(folder_id)
+    os.makedirs(os.path.join(PROJECT_ROOT, SPRITE_DIR), exist_ok=True)
+    sheet.save(os.path.join(PROJECT_ROOT, paths['image']), 'WEBP', quality=90, method=6)
+
+    sprite_name = os.path.basename(paths['image'])
+    css_lines = []
+    for rel_path, pos in index.items():
+        key = os.path.splitext(os.path.basename(rel_path))[0]
+        css_lines.append(
+            f".space-icon-{key} {{ background: url('{sprite_name}') -{pos['x']}px -{pos['y']}px no-repeat; "
+            f"width: {ICON_SIZE}px; height: {ICON_SIZE}px; }}"
+        )
+    with open(os.path.join(PROJECT_ROOT, paths['css']), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(css_lines) + '\n')
+    with open(os.path.join(PROJECT_ROOT, paths['index']), 'w', encoding='utf-8') as f:
+        json.dump({'image': paths['image'], 'size': ICON_SIZE, 'icons': index}, f, ensure_ascii=False, indent=2)
+    return paths
+
+# ================= 任务入口 =================
+
+def mirror_icons(build_sprites=False, max_workers=MAX_WORKERS):
+    """
+    镜像 space-tree.json 中所有远程图标，并回写节点 icon 字段。
+    原始地址保留在 icon_source 中；同一远程地址只下载一次。
+    """
+    if not HAS_PIL:
+        return {"success": False, "error": "Pillow is not installed"}
+
+    model = space_tree.get_model()
+    tree = model.get_tree()
+    entries = list(_walk(tree.get('root', [])))
+
+    pending = {}
+    for _, node in entries:
+        icon = node.get('icon')
+        if is_remote(icon) and icon not in pending:
+            pending[icon] = node.get('url')
+
+    logger.info(f"🖼️  图标镜像开始 | Mirroring {len(pending)} remote icons")
+    mirrored = {}
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as pool:
+            for url, local in zip(pending, pool.map(lambda u: mirror_one(u, pending[u]), pending)):
+                if local:
+                    mirrored[url] = local
+
+    # 下载期间树可能已被保存，只把图标替换应用到模型当前的节点上
+    updated = model.replace_icons(mirrored) if mirrored else 0
+    if updated:
+        tree = model.get_tree()
+        entries = list(_walk(tree.get('root', [])))
+        asset_gc.track_space_tree(tree)
+
+    sprites = []
+    if build_sprites:
+        groups = {}
+        for parent_id, node in entries:
+            icon = node.get('icon')
+            if icon and icon.startswith(ICON_DIR + '/') and os.path.exists(os.path.join(PROJECT_ROOT, icon)):
+                groups.setdefault(parent_id, []).append(icon)
+        for folder_id, icons in groups.items():
+            if not isinstance(folder_id, str) or not SPRITE_ID_PATTERN.match(folder_id):
+                # 无 ID 或 ID 含路径字符的文件夹不生成雪碧图 (避免 None.webp / 写出 SPRITE_DIR 之外)
+                logger.warning(f"⚠️  跳过雪碧图 (文件夹 ID 无效) | Sprite skipped, invalid folder id: {folder_id!r}")
+                continue
+            if build_sprite(folder_id, icons):
+                sprites.append(folder_id)
+
+    failed = len(pending) - len(mirrored)
+    logger.info(f"✅ 图标镜像完成 | Mirrored {len(mirrored)}, failed {failed}, nodes updated {updated}, sprites {len(sprites)}")
+    return {"success": True, "mirrored": len(mirrored), "failed": failed, "updated": updated, "sprites": sprites}
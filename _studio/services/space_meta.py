@@ -0,0 +1,285 @@
+"""
+MAERS Space Metadata Fetcher
+网站元数据 (Title / Description / Favicon) 抓取引擎：
+- 有界线程池并发抓取，单域名并发受限
+- 流式读取，解析到 </head> 即停止下载
+- 本地 SQLite 缓存，TTL 内直接命中，过期后以 ETag / Last-Modified 协商
+"""
+import os
+import json
+import time
+import codecs
+import sqlite3
+import threading
+import urllib.request
+import urllib.parse
+import urllib.error
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
+
+from . import log
+
+logger = log.get_logger('SPACE')
+
+# ================= 配置 =================
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+CACHE_DB = os.path.join(CACHE_DIR, 'space-meta.db')
+
+DEFAULT_TTL = 7 * 24 * 3600
+FETCH_TIMEOUT = 10
+MAX_WORKERS = 8
+PER_HOST_LIMIT = 2
+MAX_HEAD_BYTES = 512 * 1024
+CHUNK_SIZE = 8192
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# ================= HTML Parser for Metadata =================
+class MetaParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.title = None
+        self.description = None
+        self.icon_url = None
+        self.in_title = False
+        self.head_done = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs_dict = dict(attrs)
+
+        # Title tag
+        if tag == 'title':
+            self.in_title = True
+
+        # Meta description
+        if tag == 'meta':
+            name = (attrs_dict.get('name') or '').lower()
+            property_attr = (attrs_dict.get('property') or '').lower()
+
+            if name == 'description' or property_attr == 'og:description':
+                self.description = attrs_dict.get('content', '')
+
+        # Favicon
+        if tag == 'link':
+            rel = (attrs_dict.get('rel') or '').lower()
+            if 'icon' in rel:
+                self.icon_url = attrs_dict.get('href', '')
+
+        # <body> 出现说明 <head> 已结束 (兼容省略 </head> 的页面)
+        if tag == 'body':
+            self.head_done = True
+
+    def handle_data(self, data):
+        if self.in_title and not self.title:
+            self.title = data.strip()
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self.in_title = False
+        if tag == 'head':
+            self.head_done = True
+
+# ================= 结果构造 =================
+def normalize_url(url):
+    url = url.strip()
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
+def build_result(url, parser):
+    parsed = urllib.parse.urlparse(url)
+    domain = parsed.netloc
+
+    # 处理 Favicon URL
+    icon_url = parser.icon_url
+    if icon_url:
+        # 相对路径转绝对路径
+        if icon_url.startswith('//'):
+            icon_url = parsed.scheme + ':' + icon_url
+        elif icon_url.startswith('/'):
+            icon_url = f"{parsed.scheme}://{domain}{icon_url}"
+        elif not icon_url.startswith('http'):
+            icon_url = f"{parsed.scheme}://{domain}/{icon_url}"
+    else:
+        # 默认尝试 /favicon.ico
+        icon_url = f"{parsed.scheme}://{domain}/favicon.ico"
+
+    return {
+        'title': parser.title or domain,
+        'description': parser.description or '',
+        'icon_url': icon_url,
+        # 使用 Google Favicon API 作为备选
+        'google_icon': f"https://www.google.com/s2/favicons?sz=128&domain={domain}"
+    }
+
+def fallback_result(url):
+    """抓取失败时的基础信息"""
+    try:
+        domain = urllib.parse.urlparse(normalize_url(url)).netloc
+        return {
+            'title': domain,
+            'description': '',
+            'icon_url': f"https://www.google.com/s2/favicons?sz=128&domain={domain}",
+            'google_icon': f"https://www.google.com/s2/favicons?sz=128&domain={domain}"
+        }
+    except:
+        return {
+            'title': url,
+            'description': '',
+            'icon_url': 'ui/placeholder.svg',
+            'google_icon': 'ui/placeholder.svg'
+        }
+
+# ================= 缓存 =================
+class MetaCache:
+    def __init__(self, db_path=CACHE_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS meta (
+                url TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get(self, url):
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM meta WHERE url=?", (url,)).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def put(self, url, data, etag=None, last_modified=None):
+        conn = self._connect()
+        conn.execute('''
+            INSERT OR REPLACE INTO meta (url, data, etag, last_modified, fetched_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (url, json.dumps(data, ensure_ascii=False), etag, last_modified, time.time()))
+        conn.commit()
+        conn.close()
+
+    def touch(self, url):
+        conn = self._connect()
+        conn.execute("UPDATE meta SET fetched_at=? WHERE url=?", (time.time(), url))
+        conn.commit()
+        conn.close()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MetaCache()
+        return _cache
+
+# ================= 抓取 =================
+_host_slots = {}
+_host_lock = threading.Lock()
+
+def _host_semaphore(host):
+    with _host_lock:
+        sem = _host_slots.get(host)
+        if sem is None:
+            sem = _host_slots[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+        return sem
+
+def _parse_head(response):
+    """流式读取响应，解析到 </head> 即停止"""
+    charset = response.headers.get_content_charset() or 'utf-8'
+    try:
+        decoder = codecs.getincrementaldecoder(charset)(errors='ignore')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+
+    parser = MetaParser()
+    read_total = 0
+    while not parser.head_done and read_total < MAX_HEAD_BYTES:
+        chunk = response.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        read_total += len(chunk)
+        parser.feed(decoder.decode(chunk))
+    parser.feed(decoder.decode(b'', final=True))
+    return parser
+
+def fetch_one(url, ttl=DEFAULT_TTL, force=False, cache=None, timeout=FETCH_TIMEOUT):
+    """
+    抓取单个 URL 的元数据。
+    返回: { 'url', 'ok', 'cached', 'data' }
+    """
+    url = normalize_url(url)
+    cache = cache or get_cache()
+    entry = cache.get(url)
+
+    if entry and not force and time.time() - entry['fetched_at'] < ttl:
+        return {'url': url, 'ok': True, 'cached': True, 'data': json.loads(entry['data'])}
+
+    headers = dict(HEADERS)
+    if entry:
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    host = urllib.parse.urlparse(url).netloc
+    try:
+        with _host_semaphore(host):
+            req = urllib.request.Request(url, headers=headers)
+            try:
+                with urllib.request.urlopen(req, timeout=timeout) as response:
+                    parser = _parse_head(response)
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+                    final_url = response.geturl() or url
+            except urllib.error.HTTPError as e:
+                if e.code == 304 and entry:
+                    cache.touch(url)
+                    return {'url': url, 'ok': True, 'cached': True, 'data': json.loads(entry['data'])}
+                raise
+
+        data = build_result(final_url, parser)
+        cache.put(url, data, etag, last_modified)
+        return {'url': url, 'ok': True, 'cached': False, 'data': data}
+
+    except Exception as e:
+        logger.warning(f"⚠️  URL 抓取失败 | Fetch failed: {url} - {e}")
+        # 过期缓存优先于兜底信息
+        if entry:
+            return {'url': url, 'ok': True, 'cached': True, 'stale': True, 'data': json.loads(entry['data'])}
+        return {'url': url, 'ok': False, 'cached': False, 'error': str(e), 'data': fallback_result(url)}
+
+def fetch_many(urls, ttl=DEFAULT_TTL, force=False, max_workers=MAX_WORKERS, timeout=FETCH_TIMEOUT):
+    """并发抓取多个 URL，结果顺序与输入一致 (重复 URL 只抓取一次)；含非字符串项时抛出 ValueError"""
+    invalid = [i for i, u in enumerate(urls) if not isinstance(u, str)]
+    if invalid:
+        raise ValueError(f"urls must be strings (invalid items at {invalid[:10]})")
+    cache = get_cache()
+    unique = list(dict.fromkeys(normalize_url(u) for u in urls if u))
+    if not unique:
+        return []
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique))) as pool:
+        results = dict(zip(unique, pool.map(
+            lambda u: fetch_one(u, ttl=ttl, force=force, cache=cache, timeout=timeout), unique
+        )))
+
+    hits = sum(1 for r in results.values() if r.get('cached'))
+    logger.info(f"🌐 批量抓取完成 | Batch fetched: {len(unique)} urls, {hits} cached, {time.time() - start:.2f}s")
+    return [results[normalize_url(u)] for u in urls if u]
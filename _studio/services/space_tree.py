@@ -0,0 +1,198 @@
+"""
+MAERS Space Tree Model
+space-tree.json 的常驻内存模型：一次加载，按文件 mtime 失效，
+维护 id → node 与 tag → node-ids 两个索引，写入时原子替换。
+对外只交出深拷贝；写盘失败时内存视为失效，下次访问从磁盘重新加载。
+"""
+import os
+import copy
+import json
+import threading
+
+from . import metrics
+from . import log
+
+logger = log.get_logger('SPACE')
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
+SPACE_TREE_PATH = os.path.join(DATA_DIR, 'space-tree.json')
+
+def _dedupe(items):
+    seen = set()
+    return [t for t in items if not (t in seen or seen.add(t))]
+
+class SpaceTreeModel:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.data = {"root": []}
+        self.by_id = {}
+        self.by_tag = {}
+        self._mtime = None
+
+    # ---------- 加载与索引 ----------
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _ensure_fresh(self):
+        mtime = self._file_mtime()
+        if mtime is not None and mtime == self._mtime:
+            return
+        data = {"root": []}
+        if mtime is not None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                logger.error(f"❌ Load Tree failed: {e}")
+        self._set_data(data)
+        self._mtime = mtime
+
+    def _set_data(self, data):
+        if not isinstance(data, dict):
+            data = {"root": []}
+        self.data = data
+        self.by_id = {}
+        self.by_tag = {}
+
+        def walk(nodes):
+            for node in nodes or []:
+                node_id = node.get('id')
+                if node_id is not None:
+                    self.by_id[node_id] = node
+                    self._index_tags(node_id, node.get('tags'))
+                if node.get('children'):
+                    walk(node['children'])
+
+        walk(data.get('root', []))
+
+    def _index_tags(self, node_id, tags):
+        for tag in tags or []:
+            self.by_tag.setdefault(tag, set()).add(node_id)
+
+    def _unindex_tags(self, node_id, tags):
+        for tag in tags or []:
+            ids = self.by_tag.get(tag)
+            if ids:
+                ids.discard(node_id)
+                if not ids:
+                    del self.by_tag[tag]
+
+    @metrics.timed_sync
+    def _write(self, data=None):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.data if data is None else data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+        except Exception:
+            # 原地修改过的内存已与磁盘不一致，强制下次访问重新加载
+            self._mtime = None
+            if os.path.exists(temp_path):
+                try: os.remove(temp_path)
+                except: pass
+            raise
+        self._mtime = self._file_mtime()
+
+    # ---------- 读取 ----------
+
+    def get_tree(self):
+        """返回深拷贝，调用方可自由修改后再交给 replace_tree"""
+        with self.lock:
+            self._ensure_fresh()
+            return copy.deepcopy(self.data)
+
+    def get_node(self, node_id):
+        with self.lock:
+            self._ensure_fresh()
+            return copy.deepcopy(self.by_id.get(node_id))
+
+    def used_tags(self):
+        with self.lock:
+            self._ensure_fresh()
+            return set(self.by_tag)
+
+    # ---------- 写入 ----------
+
+    def replace_tree(self, data):
+        """整树替换 (对应前端全量保存)；写盘成功后才替换内存"""
+        data = copy.deepcopy(data) if isinstance(data, dict) else {"root": []}
+        with self.lock:
+            self._write(data)
+            self._set_data(data)
+
+    def update_tags(self, node_id, tags):
+        with self.lock:
+            self._ensure_fresh()
+            node = self.by_id.get(node_id)
+            if node is None:
+                return False
+            self._unindex_tags(node_id, node.get('tags'))
+            node['tags'] = tags
+            self._index_tags(node_id, tags)
+            self._write()
+            return True
+
+    def replace_icons(self, mapping):
+        """
+        mapping: {旧 icon 地址: 本地路径}；在当前树上原地替换 (原地址保留在 icon_source)，
+        不会覆盖替换期间的其他保存。返回更新节点数
+        """
+        with self.lock:
+            self._ensure_fresh()
+            updated = 0
+            stack = list(self.data.get('root') or [])
+            while stack:
+                node = stack.pop()
+                local = mapping.get(node.get('icon'))
+                if local:
+                    node['icon_source'] = node['icon']
+                    node['icon'] = local
+                    updated += 1
+                stack.extend(node.get('children') or [])
+            if updated:
+                self._write()
+            return updated
+
+    def rename_tag(self, old_name, new_name):
+        """仅修改命中该标签的节点，返回更新数量"""
+        with self.lock:
+            self._ensure_fresh()
+            ids = self.by_tag.pop(old_name, set())
+            for node_id in ids:
+                node = self.by_id[node_id]
+                node['tags'] = _dedupe([new_name if t == old_name else t for t in node['tags']])
+                self.by_tag.setdefault(new_name, set()).add(node_id)
+            if ids:
+                self._write()
+            return len(ids)
+
+    def delete_tag(self, tag_name):
+        with self.lock:
+            self._ensure_fresh()
+            ids = self.by_tag.pop(tag_name, set())
+            for node_id in ids:
+                node = self.by_id[node_id]
+                node['tags'] = [t for t in node['tags'] if t != tag_name]
+            if ids:
+                self._write()
+            return len(ids)
+
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    """进程内单例"""
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = SpaceTreeModel(SPACE_TREE_PATH)
+        return _model
@@ -0,0 +1,145 @@
+"""
+MAERS Service Worker Versions
+按内容哈希生成 maers-version-controller.js 的版本表，替代手动递增版本号：
+- groups.*.version: 分组内全部文件 (按 SW 的前缀匹配规则归组) 的内容哈希
+- default: 未被任何分组覆盖的文件的内容哈希
+- PRECACHE: 各分组的静态资源清单及其缓存版本，SW 安装时预缓存，仅内容变化的分组会失效
+  (分组声明 precache: false 时只生成版本号，不预缓存，如体积很大的 plugins/)
+files 单文件覆盖仍由人工维护，不做改动。
+"""
+import os
+import re
+import json
+import hashlib
+
+from . import site_build
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SERVICE_DIR)  # _studio/
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+CONTROLLER_NAME = 'maers-version-controller.js'
+CONTROLLER_PATH = os.path.join(PROJECT_ROOT, CONTROLLER_NAME)
+
+VERSION_LEN = 8
+PRECACHE_EXTS = {'.js', '.css', '.svg', '.png', '.ico', '.webp', '.woff', '.woff2'}
+PRECACHE_START = '// <maers:precache>'
+PRECACHE_END = '// </maers:precache>'
+
+_DEFAULT_RE = re.compile(r"(\bdefault\s*:\s*')([^']*)(')")
+_GROUP_RE = re.compile(r"(\w+)\s*:\s*\{([^{}]*)\}")
+_VERSION_RE = re.compile(r"(\bversion\s*:\s*')([^']*)(')")
+_PATHS_RE = re.compile(r"\bpaths\s*:\s*\[([^\]]*)\]")
+_NO_PRECACHE_RE = re.compile(r"\bprecache\s*:\s*false\b")
+_STRING_RE = re.compile(r"'([^']*)'")
+
+def _block_span(text, key):
+    """返回 `key: { ... }` 中花括号内部的 (start, end)，跳过 // 注释"""
+    m = re.search(rf"\b{key}\s*:\s*\{{", text)
+    if not m:
+        raise ValueError(f"未找到 {key} 配置块")
+    depth, i = 1, m.end()
+    while depth:
+        if text.startswith('//', i):
+            i = text.index('\n', i)
+            continue
+        ch = text[i]
+        if ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+        i += 1
+    return m.end(), i - 1
+
+def parse_groups(text):
+    """解析 groups 配置：[(name, version, paths, (body_start, body_end)), ...] (保持声明顺序)"""
+    start, end = _block_span(text, 'groups')
+    groups = []
+    for m in _GROUP_RE.finditer(text, start, end):
+        body = m.group(2)
+        version = _VERSION_RE.search(body)
+        paths = _PATHS_RE.search(body)
+        if not version or not paths:
+            continue
+        groups.append((m.group(1), version.group(2), _STRING_RE.findall(paths.group(1)), m.span(2)))
+    return groups
+
+def _digest(parts):
+    h = hashlib.sha256()
+    for rel, file_hash in parts:
+        h.update(f"{rel}\0{file_hash}\n".encode('utf-8'))
+    return h.hexdigest()[:VERSION_LEN]
+
+def _file_hash(root, rel):
+    h = hashlib.sha256()
+    with open(os.path.join(root, rel.replace('/', os.sep)), 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def compute(root=PROJECT_ROOT, text=None):
+    """计算各分组与默认版本，返回 {'default': str, 'groups': {name: str}, 'precache': {...}}"""
+    if text is None:
+        with open(os.path.join(root, CONTROLLER_NAME), 'r', encoding='utf-8') as f:
+            text = f.read()
+    groups = parse_groups(text)
+    members = {name: [] for name, *_ in groups}
+    no_precache = {name for name, _, _, (start, end) in groups if _NO_PRECACHE_RE.search(text, start, end)}
+    ungrouped = []
+    for rel, _ in site_build.iter_publishable(root):
+        if rel == CONTROLLER_NAME:
+            continue
+        # 与 SW 的 resolveVersion 一致：按声明顺序取第一个匹配的分组
+        owner = next((name for name, _, paths, _ in groups if any(rel.startswith(p) for p in paths)), None)
+        entry = (rel, _file_hash(root, rel))
+        (members[owner] if owner else ungrouped).append(entry)
+
+    precache = {}
+    for name, entries in members.items():
+        if name in no_precache:
+            continue
+        assets = [e for e in entries if os.path.splitext(e[0])[1].lower() in PRECACHE_EXTS]
+        if assets:
+            precache[name] = {'cache': _digest(assets), 'files': [rel for rel, _ in assets]}
+    return {
+        'default': _digest(ungrouped),
+        'groups': {name: _digest(entries) for name, entries in members.items()},
+        'precache': precache,
+    }
+
+def render(text, result):
+    """把计算结果写回控制器源码 (只替换版本字符串与 PRECACHE 区块)"""
+    # 从后往前替换，保证前面的偏移不变
+    for name, _, _, (start, end) in reversed(parse_groups(text)):
+        body = _VERSION_RE.sub(lambda m: m.group(1) + result['groups'][name] + m.group(3), text[start:end], count=1)
+        text = text[:start] + body + text[end:]
+    text = _DEFAULT_RE.sub(lambda m: m.group(1) + result['default'] + m.group(3), text, count=1)
+
+    begin = text.find(PRECACHE_START)
+    finish = text.find(PRECACHE_END)
+    if begin == -1 or finish == -1:
+        raise ValueError(f"未找到 PRECACHE 区块标记 ({PRECACHE_START} ... {PRECACHE_END})")
+    header_end = text.index('\n', begin) + 1
+    block = f"const PRECACHE = {json.dumps(result['precache'], ensure_ascii=False, indent=4)};\n"
+    return text[:header_end] + block + text[finish:]
+
+def update(root=PROJECT_ROOT, write=True):
+    """重新生成版本表；返回 (result, changed_groups, changed)"""
+    path = os.path.join(root, CONTROLLER_NAME)
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    old_versions = {name: version for name, version, _, _ in parse_groups(text)}
+    old_default = _DEFAULT_RE.search(text).group(2)
+
+    result = compute(root, text)
+    new_text = render(text, result)
+    changed_groups = [name for name, version in result['groups'].items() if old_versions.get(name) != version]
+    if result['default'] != old_default:
+        changed_groups.append('default')
+
+    changed = new_text != text
+    if changed and write:
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(new_text)
+        os.replace(temp_path, path)
+    return result, changed_groups, changed
@@ -0,0 +1,61 @@
+"""
+本地桩服务器：在随机端口上运行 http.server，按路径返回预设响应并记录收到的请求。
+测试用例只与 127.0.0.1 通信，不访问外网。
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubServer:
+    """
+    routes: { path: handler(request) -> (status, headers, body) }
+    request: { 'path', 'query', 'headers' }；body 可为 bytes 或 bytes 迭代器 (流式分块写出)
+    """
+    def __init__(self, routes):
+        self.routes = routes
+        self.requests = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path, _, query = self.path.partition('?')
+                request = {'path': path, 'query': query, 'headers': dict(self.headers)}
+                with stub.lock:
+                    stub.requests.append(request)
+                route = stub.routes.get(path)
+                status, headers, body = route(request) if route else (404, {}, b'')
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                if isinstance(body, bytes):
+                    self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                chunks = [body] if isinstance(body, bytes) else body
+                try:
+                    for chunk in chunks:
+                        self.wfile.write(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # 客户端提前断开 (例如解析到 </head> 即停止)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def hits(self, path):
+        with self.lock:
+            return [r for r in self.requests if r['path'] == path]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,109 @@
+"""
+cms 批量操作测试 (临时数据目录)：任一动作失败时数据库与磁盘上的 .md / 预渲染产物均保持原样
+运行: python -m unittest discover -s tests  (在 _studio/ 目录下)
+"""
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+STUDIO_DIR = os.path.dirname(TESTS_DIR)
+sys.path.append(STUDIO_DIR)  # _studio/
+sys.path.append(os.path.join(STUDIO_DIR, 'benchmarks'))
+
+from dataset import CMS_SCHEMA
+from services import cms, cms_content, cms_render, ref_index, log
+
+MODULE = 'notes'
+NOTES = {'n_1': ('Alpha', '# Alpha\n\nfirst note'), 'n_2': ('Beta', '# Beta\n\nsecond note')}
+
+class CmsBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        log.configure(console=False, log_dir=os.path.join(self.tmp, 'logs'))
+        self.data_dir = os.path.join(self.tmp, 'data')
+        os.makedirs(os.path.join(self.data_dir, MODULE))
+        db_path = os.path.join(self.data_dir, 'cms.db')
+
+        conn = sqlite3.connect(db_path)
+        conn.executescript(CMS_SCHEMA)
+        for order, (node_id, (title, text)) in enumerate(NOTES.items()):
+            rel_path = f"{MODULE}/{title}.md"
+            conn.execute("INSERT INTO nodes (id, module, parent_id, type, title, content, tags, created_at, sort_order) "
+                         "VALUES (?, ?, 'root', 'note', ?, ?, '[]', 0, ?)", (node_id, MODULE, title, rel_path, order))
+            md_path = os.path.join(self.data_dir, rel_path)
+            with open(md_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            cms_render.render_note(md_path, text)
+        conn.commit()
+        conn.close()
+
+        for patcher in (mock.patch.multiple(cms, PROJECT_ROOT=self.tmp, DATA_DIR=self.data_dir, DB_PATH=db_path),
+                        mock.patch.object(ref_index, '_index', ref_index.RefIndex(os.path.join(self.tmp, 'ref-index.db'))),
+                        mock.patch.object(cms, 'sync_js_file', lambda module: None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def snapshot(self):
+        """数据库行 + 数据目录下所有文件的内容"""
+        conn = sqlite3.connect(cms.DB_PATH)
+        rows = conn.execute("SELECT * FROM nodes ORDER BY id").fetchall()
+        conn.close()
+        files = {}
+        for dirpath, _, filenames in os.walk(os.path.join(self.data_dir, MODULE)):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                with open(path, 'rb') as f:
+                    files[os.path.relpath(path, self.data_dir)] = f.read()
+        return rows, files
+
+    def assert_rolled_back(self, ops):
+        before = self.snapshot()
+        code, result = cms.apply_batch(MODULE, ops + [{'action': 'bogus'}])
+        self.assertEqual(code, 400)
+        self.assertEqual(result['failed_index'], len(ops))
+        self.assertEqual(self.snapshot(), before)
+        # 内容缓存不能返回回滚前写入的正文
+        text, _ = cms_content.read_content(os.path.join(self.data_dir, MODULE, 'Alpha.md'))
+        self.assertEqual(text, NOTES['n_1'][1])
+
+    def test_rename_and_write_are_undone(self):
+        self.assert_rolled_back([
+            {'action': 'update', 'id': 'n_1', 'data': {'title': 'Gamma'}},
+            {'action': 'update', 'id': 'n_1', 'data': {'content': '# Gamma\n\nrewritten'}},
+        ])
+
+    def test_rename_onto_taken_name_is_undone(self):
+        self.assert_rolled_back([
+            {'action': 'update', 'id': 'n_1', 'data': {'title': 'Beta', 'content': 'clobber?'}},
+        ])
+
+    def test_delete_and_add_are_undone(self):
+        self.assert_rolled_back([
+            {'action': 'delete', 'id': 'n_1'},
+            {'action': 'delete', 'id': 'n_2'},
+            {'action': 'add', 'parentId': 'root', 'type': 'note', 'title': 'Alpha'},
+        ])
+
+    def test_successful_batch_applies_file_changes(self):
+        code, _ = cms.apply_batch(MODULE, [
+            {'action': 'update', 'id': 'n_1', 'data': {'title': 'Gamma', 'content': 'new body'}},
+            {'action': 'delete', 'id': 'n_2'},
+        ])
+        self.assertEqual(code, 200)
+        _, files = self.snapshot()
+        self.assertEqual(files[f'{MODULE}/Gamma.md'], b'new body')
+        self.assertIn(f'{MODULE}/Gamma.md' + cms_render.ARTIFACT_SUFFIX, files)
+        self.assertNotIn(f'{MODULE}/Alpha.md', files)
+        self.assertNotIn(f'{MODULE}/Beta.md', files)
+        self.assertNotIn(f'{MODULE}/Beta.md' + cms_render.ARTIFACT_SUFFIX, files)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+"""
+music_api B站元数据缓存测试 (BILI_API_BASE 指向本地桩服务器)：200 / 404 / 其他 API 错误 / 网络错误的 TTL 与重试
+运行: python -m unittest discover -s tests  (在 _studio/ 目录下)
+"""
+import os
+import sys
+import json
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(TESTS_DIR))  # _studio/
+sys.path.append(TESTS_DIR)
+
+from stub_server import StubServer
+from services import music_api, log
+
+VIEW_PATH = '/x/web-interface/view'
+
+def video_payload(title='Stub Video'):
+    return {'code': 0, 'data': {
+        'title': title, 'duration': 245, 'pic': 'https://i0.hdslb.com/cover.jpg',
+        'pages': [{'page': 1, 'part': 'P1', 'duration': 120}, {'page': 2, 'part': 'P2', 'duration': 125}],
+    }}
+
+def json_response(payload, status=200):
+    return status, {'Content-Type': 'application/json'}, json.dumps(payload).encode('utf-8')
+
+class MusicApiTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        log.configure(console=False, log_dir=os.path.join(self.tmp, 'logs'))
+        self.db_path = os.path.join(self.tmp, 'bili-meta.db')
+        for patcher in (mock.patch.object(music_api, '_cache', music_api.BiliCache(self.db_path)),
+                        mock.patch.object(music_api.time, 'sleep', lambda s: None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def serve(self, handler):
+        server = StubServer({VIEW_PATH: handler})
+        server.__enter__()
+        self.addCleanup(server.__exit__, None, None, None)
+        patcher = mock.patch.object(music_api, 'BILI_API_BASE', server.base_url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return server
+
+    def age(self, bvid, seconds):
+        """把缓存条目的抓取时间往前推，模拟时间流逝"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE videos SET fetched_at = fetched_at - ? WHERE bvid=?", (seconds, bvid))
+        conn.commit()
+        conn.close()
+
+    def test_success_is_cached_for_cache_ttl(self):
+        server = self.serve(lambda r: json_response(video_payload()))
+        code, info = music_api.get_video_info('BV1stub')
+        self.assertEqual(code, 200)
+        self.assertEqual(info['title'], 'Stub Video')
+        self.assertEqual([p['part'] for p in info['pages']], ['P1', 'P2'])
+        self.assertEqual(server.hits(VIEW_PATH)[0]['query'], 'bvid=BV1stub')
+
+        self.age('BV1stub', music_api.NEGATIVE_TTL + 1)
+        self.assertEqual(music_api.get_video_info('BV1stub'), (200, info))
+        self.assertEqual(len(server.hits(VIEW_PATH)), 1)
+
+        self.age('BV1stub', music_api.CACHE_TTL)
+        music_api.get_video_info('BV1stub')
+        self.assertEqual(len(server.hits(VIEW_PATH)), 2)
+
+    def test_force_bypasses_cache(self):
+        server = self.serve(lambda r: json_response(video_payload()))
+        music_api.get_video_info('BV1stub')
+        music_api.get_video_info('BV1stub', force=True)
+        self.assertEqual(len(server.hits(VIEW_PATH)), 2)
+
+    def test_not_found_is_negative_cached(self):
+        server = self.serve(lambda r: json_response({'code': -404, 'message': 'not found'}))
+        code, info = music_api.get_video_info('BV1gone')
+        self.assertEqual(code, 404)
+        self.assertEqual(info['bili_code'], -404)
+
+        self.age('BV1gone', music_api.ERROR_TTL + 1)
+        self.assertEqual(music_api.get_video_info('BV1gone')[0], 404)
+        self.assertEqual(len(server.hits(VIEW_PATH)), 1)
+
+        self.age('BV1gone', music_api.NEGATIVE_TTL)
+        music_api.get_video_info('BV1gone')
+        self.assertEqual(len(server.hits(VIEW_PATH)), 2)
+
+    def test_other_api_error_uses_short_ttl(self):
+        server = self.serve(lambda r: json_response({'code': -412, 'message': 'request was banned'}))
+        code, info = music_api.get_video_info('BV1blocked')
+        self.assertEqual(code, 502)
+        self.assertEqual(info['bili_code'], -412)
+
+        self.assertEqual(music_api.get_video_info('BV1blocked')[0], 502)
+        self.assertEqual(len(server.hits(VIEW_PATH)), 1)
+
+        self.age('BV1blocked', music_api.ERROR_TTL + 1)
+        music_api.get_video_info('BV1blocked')
+        self.assertEqual(len(server.hits(VIEW_PATH)), 2)
+
+    def test_transient_failure_is_retried(self):
+        calls = []
+        def flaky(request):
+            calls.append(request)
+            return json_response({}, 502) if len(calls) == 1 else json_response(video_payload())
+
+        self.serve(flaky)
+        code, info = music_api.get_video_info('BV1flaky')
+        self.assertEqual(code, 200)
+        self.assertEqual(info['title'], 'Stub Video')
+        self.assertEqual(len(calls), 2)
+
+    def test_network_error_uses_short_ttl(self):
+        server = self.serve(lambda r: json_response({}, 503))
+        code, info = music_api.get_video_info('BV1down')
+        self.assertEqual(code, 500)
+        self.assertIn('error', info)
+        self.assertEqual(len(server.hits(VIEW_PATH)), music_api.FETCH_RETRIES + 1)
+
+        # ERROR_TTL 内直接返回负缓存，不再请求
+        self.assertEqual(music_api.get_video_info('BV1down')[0], 500)
+        self.assertEqual(len(server.hits(VIEW_PATH)), music_api.FETCH_RETRIES + 1)
+
+        self.age('BV1down', music_api.ERROR_TTL + 1)
+        music_api.get_video_info('BV1down')
+        self.assertEqual(len(server.hits(VIEW_PATH)), 2 * (music_api.FETCH_RETRIES + 1))
+
+    def test_missing_bvid(self):
+        self.assertEqual(music_api.get_video_info('')[0], 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+space_meta 抓取引擎测试 (本地桩服务器)：TTL 命中、ETag 304 协商、</head> 提前停止、批量输入校验
+运行: python -m unittest discover -s tests  (在 _studio/ 目录下)
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(TESTS_DIR))  # _studio/
+sys.path.append(TESTS_DIR)
+
+from stub_server import StubServer
+from services import space_meta, log
+import routes
+
+HEAD = b'<html><head><title>Stub Site</title><meta name="description" content="desc">' \
+       b'<link rel="icon" href="/icon.png"></head>'
+
+class SpaceMetaTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        log.configure(console=False, log_dir=os.path.join(self.tmp, 'logs'))
+        self.cache = space_meta.MetaCache(os.path.join(self.tmp, 'space-meta.db'))
+        patcher = mock.patch.object(space_meta, '_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_ttl_hit_skips_request(self):
+        routes_ = {'/page': lambda r: (200, {'Content-Type': 'text/html'}, HEAD)}
+        with StubServer(routes_) as server:
+            url = server.base_url + '/page'
+            first = space_meta.fetch_one(url, cache=self.cache)
+            second = space_meta.fetch_one(url, cache=self.cache)
+            self.assertEqual(len(server.hits('/page')), 1)
+        self.assertFalse(first['cached'])
+        self.assertTrue(second['cached'])
+        self.assertEqual(first['data']['title'], 'Stub Site')
+        self.assertEqual(first['data']['description'], 'desc')
+        self.assertEqual(first['data']['icon_url'], server.base_url + '/icon.png')
+
+    def test_expired_entry_revalidates_with_304(self):
+        def page(request):
+            if request['headers'].get('If-None-Match') == '"v1"':
+                return 304, {'ETag': '"v1"'}, b''
+            return 200, {'Content-Type': 'text/html', 'ETag': '"v1"'}, HEAD
+
+        with StubServer({'/page': page}) as server:
+            url = server.base_url + '/page'
+            space_meta.fetch_one(url, cache=self.cache)
+            fetched_at = self.cache.get(url)['fetched_at']
+            time.sleep(0.01)
+            result = space_meta.fetch_one(url, ttl=0, cache=self.cache)
+            hits = server.hits('/page')
+
+        self.assertEqual(len(hits), 2)
+        self.assertEqual(hits[1]['headers'].get('If-None-Match'), '"v1"')
+        self.assertTrue(result['ok'])
+        self.assertTrue(result['cached'])
+        self.assertEqual(result['data']['title'], 'Stub Site')
+        # 304 刷新了缓存时间，TTL 重新计算
+        self.assertGreater(self.cache.get(url)['fetched_at'], fetched_at)
+
+    def test_stops_reading_at_head_end(self):
+        body_size = 2 * 1024 * 1024
+        def page(request):
+            filler = (b'<p>' + b'x' * 8188 + b'</p>' for _ in range(body_size // 8195))
+            return 200, {'Content-Type': 'text/html'}, iter([HEAD, b'<body>', *filler])
+
+        read_sizes = []
+        real_parse_head = space_meta._parse_head
+        def counting_parse_head(response):
+            real_read = response.read
+            def read(n=-1):
+                chunk = real_read(n)
+                read_sizes.append(len(chunk))
+                return chunk
+            response.read = read
+            return real_parse_head(response)
+
+        with StubServer({'/big': page}) as server, \
+                mock.patch.object(space_meta, '_parse_head', counting_parse_head):
+            result = space_meta.fetch_one(server.base_url + '/big', cache=self.cache)
+
+        self.assertEqual(result['data']['title'], 'Stub Site')
+        self.assertLessEqual(sum(read_sizes), 4 * space_meta.CHUNK_SIZE)
+
+    def test_failed_fetch_serves_stale_cache(self):
+        state = {'up': True}
+        def page(request):
+            if state['up']:
+                return 200, {'Content-Type': 'text/html'}, HEAD
+            return 500, {}, b''
+
+        with StubServer({'/page': page}) as server:
+            url = server.base_url + '/page'
+            space_meta.fetch_one(url, cache=self.cache)
+            state['up'] = False
+            result = space_meta.fetch_one(url, ttl=0, cache=self.cache)
+        self.assertTrue(result.get('stale'))
+        self.assertEqual(result['data']['title'], 'Stub Site')
+
+    def test_batch_dedupes_and_keeps_order(self):
+        routes_ = {p: (lambda r, p=p: (200, {'Content-Type': 'text/html'},
+                                       f'<head><title>{p}</title></head>'.encode()))
+                   for p in ('/a', '/b')}
+        with StubServer(routes_) as server:
+            urls = [server.base_url + '/a', server.base_url + '/b', server.base_url + '/a']
+            results = space_meta.fetch_many(urls)
+            self.assertEqual(len(server.hits('/a')), 1)
+        self.assertEqual([r['data']['title'] for r in results], ['/a', '/b', '/a'])
+
+    def test_batch_rejects_non_string_items(self):
+        with self.assertRaises(ValueError):
+            space_meta.fetch_many(['example.com', 42])
+        for urls in (['example.com', 42], [{'url': 'x'}], [None]):
+            status, body = routes.dispatch_post('/api/space/fetch_meta_batch', {}, {'urls': urls})
+            self.assertEqual(status, 400, body)
+        status, _ = routes.dispatch_post('/api/space/fetch_meta', {}, {'url': 42})
+        self.assertEqual(status, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import sw_versions
+
+def main():
+    parser = argparse.ArgumentParser(description="MAERS 缓存版本生成 (按内容哈希更新 maers-version-controller.js)")
+    parser.add_argument('--check', action='store_true', help="只检查版本表是否过期，过期时退出码为 1 (不写入)")
+    args = parser.parse_args()
+
+    print("========================================")
+    print("        MAERS 缓存版本生成")
+    print("========================================")
+    result, changed_groups, changed = sw_versions.update(write=not args.check)
+
+    for name, version in result['groups'].items():
+        files = len(result['precache'].get(name, {}).get('files', []))
+        mark = '*' if name in changed_groups else ' '
+        print(f"[{mark}] {name:<12} {version}   预缓存 {files} 个文件")
+    print(f"[{'*' if 'default' in changed_groups else ' '}] {'default':<12} {result['default']}")
+
+    if not changed:
+        print("[+] 版本表已是最新")
+    elif args.check:
+        print(f"[!] 版本表已过期: {', '.join(changed_groups) or 'PRECACHE'} (运行 update-versions.py 更新)")
+        sys.exit(1)
+    else:
+        print(f"[+] 已更新 {sw_versions.CONTROLLER_NAME}: {', '.join(changed_groups) or 'PRECACHE'}")
+
+if __name__ == '__main__':
+    main()
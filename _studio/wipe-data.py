@@ -3,6 +3,7 @@ import sqlite3
 import json
 import shutil
 import config
+from services import blob_store
 
 def wipe_all_data():
     print("========================================================")
@@ -121,6 +122,15 @@ def wipe_all_data():
             except Exception as e:
                 print(f"❌ 清理文件夹失败 {sub}: {e}")
 
+    # 5. 内容寻址存储 (_studio/cache/blobs/)
+    blob_dir = os.path.join(config.PROJECT_ROOT, blob_store.BLOB_DIR)
+    if os.path.exists(blob_dir):
+        try:
+            shutil.rmtree(blob_dir)
+            print(f"✅ 内容寻址存储已清空: {blob_store.BLOB_DIR}/")
+        except Exception as e:
+            print(f"❌ 清理内容寻址存储失败: {e}")
+
     print("========================================================")
     print("✨ 全量数据清空完成！您的系统已恢复至“出厂状态”。")
     print("========================================================")
@@ -75,6 +75,22 @@ function _interceptMdLinks(container, currentNode) {
     }, true); // capture phase — 在 Vditor 的默认行为之前拦截
 }
 
+// ─── 预渲染产物 ───
+// <note>.md.render.json 由 _studio/services/cms_render.py 在保存时生成，html 已按白名单清洗；
+// 含代码块或公式的笔记 (rich) 仍交给 Vditor.preview 渲染
+async function _loadRendered(node, path) {
+    try {
+        const res = await fetch(path + '.render.json?t=' + Date.now());
+        if (!res.ok) return false;
+        const artifact = await res.json();
+        if (typeof artifact.html !== 'string' || artifact.rich) return false;
+        node._renderedHtml = artifact.html;
+        return true;
+    } catch (e) {
+        return false;
+    }
+}
+
 // ─── 打开阅读器/编辑器 ───
 export async function open(node) {
     const layer = document.getElementById('immersive-reader');
@@ -91,13 +107,22 @@ export async function open(node) {
             document.body.style.overflow = 'hidden';
 
             const path = 'data/' + node.content;
-            const res = await fetch(path + '?t=' + Date.now());
-            if (res.ok) {
-                node._originalContent = await res.text();
-                node.content = node._originalContent;
-            } else {
-                console.error("Failed to load md:", path);
-                node.content = "> ⚠️ Error: Content file not found at " + path;
+            // 访客优先读取服务端预渲染产物，缺失时退回读取 .md 在客户端渲染
+            const rendered = !window.IS_ADMIN && await _loadRendered(node, path);
+            if (!rendered) {
+                // Admin 走内容缓存 API (ETag 协商)，访客直接读取静态 .md
+                const res = window.IS_ADMIN && Controller
+                    ? await fetch(`/api/cms/content?module=${Controller.CONFIG.CURRENT_MODULE}&id=${encodeURIComponent(node.id)}`)
+                    : await fetch(path + '?t=' + Date.now());
+                if (res.ok) {
+                    node._originalContent = window.IS_ADMIN && Controller
+                        ? (await res.json()).content
+                        : await res.text();
+                    node.content = node._originalContent;
+                } else {
+                    console.error("Failed to load md:", path);
+                    node.content = "> ⚠️ Error: Content file not found at " + path;
+                }
             }
         } catch (e) {
             console.error("Fetch error:", e);
@@ -288,7 +313,13 @@ function _renderVisitorReader(layer, node) {
     const isLight = document.documentElement.classList.contains('light-mode');
     const contentTheme = isLight ? 'light' : 'dark';
 
-    if (window.Vditor) {
+    if (node._renderedHtml) {
+        // 服务端预渲染产物：直接插入，无需 Vditor / marked 渲染
+        contentDiv.innerHTML = node._renderedHtml;
+        _interceptMdLinks(contentDiv, node);
+        _bindOutlineToggle();
+        _generateOutline();
+    } else if (window.Vditor) {
         Vditor.preview(contentDiv, node.content || "> No content.", {
             mode: isLight ? 'light' : 'dark',
             theme: {
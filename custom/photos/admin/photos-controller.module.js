@@ -116,10 +116,16 @@ export async function uploadFiles(files, tags = []) {
     }
 }
 
+// 衍生图在 photos-data.json 中不带扩展名 (studio 服务端按 Accept 协商编码)，
+// 补上默认编码，保证静态托管下同样可访问
+const DEFAULT_VARIANT_EXT = { thumbnails: '.webp', previews: '.avif' };
+
 export function fixPath(p, category, subDir = 'images') {
     if (!p) return p;
-    if (p.startsWith('photos/')) return p;
-    return `photos/${subDir}/${category || State.category}/${p}`;
+    if (!p.startsWith('photos/')) p = `photos/${subDir}/${category || State.category}/${p}`;
+    const variantDir = p.split('/')[1];
+    if (DEFAULT_VARIANT_EXT[variantDir] && !/\.(avif|webp|jpe?g|png)$/i.test(p)) p += DEFAULT_VARIANT_EXT[variantDir];
+    return p;
 }
 
 // 导出 Controller 对象（向后兼容）
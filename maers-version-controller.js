@@ -14,19 +14,13 @@
  * 
  * ===== 使用教学 =====
  * 
- * 【场景 1】改了 CMS 相关的几个 JS 文件
- *   → 找到下方 groups.cms.version，把数字加 1：
- *     version: '1'  改成  version: '2'
+ * 【日常发布】不再手动改版本号
+ *   → 运行 python _studio/update-versions.py
+ *     按内容哈希重新生成 default 与 groups.*.version，以及下方的 PRECACHE 预缓存清单
+ *     只有文件真正变化的分组会换版本，其余分组的缓存保持不变
  * 
- * 【场景 2】改了全站 CSS 样式
- *   → 找到下方 groups.styles.version，把数字加 1
- * 
- * 【场景 3】同时改了 CMS 和音乐模块
- *   → 分别把 groups.cms.version 和 groups.music.version 各加 1
- * 
- * 【场景 4】大版本发布（改了很多东西）
- *   → 直接修改最上面的 default 值，例如 '2026.0217-1700' 改成 '2026.0224-1200'
- *     这会让所有未被分组覆盖的文件全部刷新
+ * 【新增模块】在 groups 中加一个分组（写好 paths 前缀），再运行一次生成脚本
+ *   体积很大、不需要安装时预缓存的分组加上 precache: false（如 plugins）
  * 
  * 【场景 5】只改了一个文件要紧急修复
  *   → 在最下面的 files 中添加一行（注意引号！）：
@@ -36,75 +30,86 @@
 const VERSION_CONFIG = {
     // ════════════════════════════════════════════
     // 📅 全局默认版本（兜底，优先级最低）
-    // 大版本发布时修改这里
+    // 由 update-versions.py 按未分组文件的内容哈希生成
     // ════════════════════════════════════════════
-    default: '2026.0307-2000',
+    default: '0d128c85',
 
     // ════════════════════════════════════════════
     // 📦 分组版本（推荐日常使用 ⭐）
-    // 改了哪个模块就把对应的 version 数字 +1
+    // version 由 update-versions.py 按分组内文件的内容哈希生成
     // paths 是自动匹配的路径前缀，一般不需要修改
     // ════════════════════════════════════════════
     groups: {
         // 🎨 全局样式 (CSS)
         styles: {
-            version: '1',   // ← 改了 CSS？把这个数字 +1
+            version: 'db104292',
             paths: ['static-style/', 'custom/zmobile adaptation/']
         },
         // 📝 CMS 核心内容管理
         cms: {
-            version: '1',   // ← 改了 CMS？把这个数字 +1
+            version: '2dc52fc4',
             paths: ['custom/cms/']
         },
         // 📚 文学模块
         literature: {
-            version: '1',
+            version: '6080eb2c',
             paths: ['custom/literature/', 'data/literature-tree.json']
         },
         // 📓 笔记模块
         notes: {
-            version: '1',
+            version: 'ff92221c',
             paths: ['custom/notes/', 'data/notes-tree.json']
         },
         // 📅 记录模块
         record: {
-            version: '1',
+            version: '00825729',
             paths: ['custom/record/', 'data/record-tree.json']
         },
         // 🎮 游戏模块
         games: {
-            version: '1',
+            version: '324f912b',
             paths: ['custom/games/', 'data/games-tree.json']
         },
         // 🎵 音乐模块
         music: {
-            version: '1',
+            version: 'ad635add',
             paths: ['custom/music/', 'data/music-data.json']
         },
         // 🎬 影视模块
         videos: {
-            version: '1',
+            version: 'd9b85a82',
             paths: ['custom/videos/', 'data/videos-tree.json']
         },
         // 🖼️ 相册模块
         photos: {
-            version: '1',
+            version: '88543a59',
             paths: ['custom/photos/', 'custom/album/', 'data/photos-data.json', 'data/album-config.json']
         },
         // 🛠️ 基础设施 (shared + data-manage)
         shared: {
-            version: '1',
+            version: '433bdc90',
             paths: ['shared/', 'data-manage/']
         },
         // 🌌 空间模块
         space: {
-            version: '1',
+            version: 'a1946920',
             paths: ['custom/space/', 'data/space-tree.json']
         },
         // 🏠 首页
         index: {
-            version: '1',
+            version: '66cb41a0',
             paths: ['custom/index/', 'data/index-cards.json']
+        },
+        // 🧩 全站图标
+        ui: {
+            version: '90ca5427',
+            paths: ['ui/']
+        },
+        // 📦 第三方插件 (体积大，只按需缓存，不预缓存)
+        plugins: {
+            version: 'a7bc5220',
+            precache: false,
+            paths: ['plugins/']
         }
     },
 
@@ -129,12 +134,265 @@ const VERSION_CONFIG = {
     }
 };
 
+// <maers:precache> 由 _studio/update-versions.py 生成，请勿手动修改
+const PRECACHE = {
+    "styles": {
+        "cache": "db104292",
+        "files": [
+            "custom/zmobile adaptation/mobile-admin.css",
+            "custom/zmobile adaptation/mobile-album.css",
+            "custom/zmobile adaptation/mobile-cms.css",
+            "custom/zmobile adaptation/mobile-games.css",
+            "custom/zmobile adaptation/mobile-global.css",
+            "custom/zmobile adaptation/mobile-index.css",
+            "custom/zmobile adaptation/mobile-literature.css",
+            "custom/zmobile adaptation/mobile-literature.js",
+            "custom/zmobile adaptation/mobile-music.css",
+            "custom/zmobile adaptation/mobile-photos.css",
+            "custom/zmobile adaptation/mobile-photos.js",
+            "custom/zmobile adaptation/mobile-record.css",
+            "custom/zmobile adaptation/mobile-space.css",
+            "custom/zmobile adaptation/mobile-spatial-nav.css",
+            "static-style/admin-modal.css",
+            "static-style/components.css",
+            "static-style/drag.css",
+            "static-style/responsive.css",
+            "static-style/site-guide.css",
+            "static-style/spatial-nav.css",
+            "static-style/splash.css",
+            "static-style/style.css",
+            "static-style/theme.css",
+            "static-style/toast.css"
+        ]
+    },
+    "cms": {
+        "cache": "2dc52fc4",
+        "files": [
+            "custom/cms/admin-main.module.js",
+            "custom/cms/cms-adapter.module.js",
+            "custom/cms/main.module.js",
+            "custom/cms/admin/cms-controller.module.js",
+            "custom/cms/admin/cms-drag.module.js",
+            "custom/cms/admin/cms-editor.css",
+            "custom/cms/admin/cms-editor.module.js",
+            "custom/cms/admin/cms-tags-admin.module.js",
+            "custom/cms/admin/cms-tags-api.module.js",
+            "custom/cms/admin/tag-interactions.module.js",
+            "custom/cms/viewer/cms-admin.module.js",
+            "custom/cms/viewer/cms-base.css",
+            "custom/cms/viewer/cms-events.module.js",
+            "custom/cms/viewer/cms-lightbox.module.js",
+            "custom/cms/viewer/cms-recent.module.js",
+            "custom/cms/viewer/cms-render.module.js",
+            "custom/cms/viewer/cms-search.module.js",
+            "custom/cms/viewer/cms-state.module.js",
+            "custom/cms/viewer/cms-tags.module.js",
+            "custom/cms/viewer/cms-theme-default.css",
+            "custom/cms/viewer/cms-view.module.js",
+            "custom/cms/viewer/render/cms-render-grid.module.js",
+            "custom/cms/viewer/render/cms-render-nav.module.js",
+            "custom/cms/viewer/tags/cms-tags-drawer.module.js",
+            "custom/cms/viewer/tags/cms-tags-filter.module.js",
+            "custom/cms/viewer/tags/cms-tags-render.module.js",
+            "custom/cms/viewer/tags/cms-tags-ui.module.js"
+        ]
+    },
+    "literature": {
+        "cache": "7e318aa1",
+        "files": [
+            "custom/literature/main.module.js",
+            "custom/literature/viewer/literature-reset.css",
+            "custom/literature/viewer/literature-view.module.js",
+            "custom/literature/viewer/literature.css",
+            "custom/literature/viewer/flow/literature-flow-data.module.js",
+            "custom/literature/viewer/flow/literature-flow-engine.module.js",
+            "custom/literature/viewer/flow/literature-flow-render.module.js"
+        ]
+    },
+    "notes": {
+        "cache": "7bbc8642",
+        "files": [
+            "custom/notes/viewer/notes.css"
+        ]
+    },
+    "record": {
+        "cache": "bddb4c12",
+        "files": [
+            "custom/record/viewer/record.css"
+        ]
+    },
+    "games": {
+        "cache": "55cbbd6d",
+        "files": [
+            "custom/games/main.module.js",
+            "custom/games/viewer/games-reset.css",
+            "custom/games/viewer/games-view.module.js",
+            "custom/games/viewer/games.css",
+            "custom/games/viewer/linear-gallery.css"
+        ]
+    },
+    "music": {
+        "cache": "4d3dd9ae",
+        "files": [
+            "custom/music/admin-main.module.js",
+            "custom/music/main.module.js",
+            "custom/music/admin/music-admin.css",
+            "custom/music/admin/music-admin.module.js",
+            "custom/music/viewer/music-control.module.js",
+            "custom/music/viewer/music-player-core.module.js",
+            "custom/music/viewer/music-player-iframe.module.js",
+            "custom/music/viewer/music-player-pip.module.js",
+            "custom/music/viewer/music-render.module.js",
+            "custom/music/viewer/music-state.module.js",
+            "custom/music/viewer/music-ui.module.js",
+            "custom/music/viewer/music.css",
+            "custom/music/viewer/styles/music-controls.css",
+            "custom/music/viewer/styles/music-layout.css",
+            "custom/music/viewer/styles/music-playlist.css"
+        ]
+    },
+    "videos": {
+        "cache": "a69e967c",
+        "files": [
+            "custom/videos/main.module.js",
+            "custom/videos/viewer/videos.css"
+        ]
+    },
+    "photos": {
+        "cache": "0c7b1d72",
+        "files": [
+            "custom/album/admin-main.module.js",
+            "custom/album/main.module.js",
+            "custom/album/admin/album-admin.css",
+            "custom/album/admin/album-admin.module.js",
+            "custom/album/viewer/album-viewer.css",
+            "custom/photos/admin-main.module.js",
+            "custom/photos/main.module.js",
+            "custom/photos/admin/photos-admin.css",
+            "custom/photos/admin/photos-admin.module.js",
+            "custom/photos/admin/photos-cms-adapter.module.js",
+            "custom/photos/admin/photos-controller.module.js",
+            "custom/photos/viewer/photos-header-btn.css",
+            "custom/photos/viewer/photos-view.module.js",
+            "custom/photos/viewer/photos-viewer.css"
+        ]
+    },
+    "shared": {
+        "cache": "433bdc90",
+        "files": [
+            "data-manage/admin-base.module.js",
+            "data-manage/admin-modal.module.js",
+            "data-manage/api-client.module.js",
+            "data-manage/data-provider.module.js",
+            "data-manage/admin/admin-button-helper.module.js",
+            "data-manage/admin/admin-manager.module.js",
+            "data-manage/admin/admin-ui.module.js",
+            "shared/flash-guard.js",
+            "shared/layout.module.js",
+            "shared/module-config.module.js",
+            "shared/namespace.module.js",
+            "shared/simple-main.module.js",
+            "shared/spatial-nav.module.js",
+            "shared/style-injector.module.js",
+            "shared/templates.module.js",
+            "shared/theme.module.js",
+            "shared/toast.module.js",
+            "shared/utils.module.js",
+            "shared/theme/theme-core.module.js",
+            "shared/theme/theme-drag.module.js",
+            "shared/theme/theme-zoom.module.js"
+        ]
+    },
+    "space": {
+        "cache": "cdef3fe4",
+        "files": [
+            "custom/space/admin-main.module.js",
+            "custom/space/admin/space-admin.css",
+            "custom/space/admin/space-admin.module.js",
+            "custom/space/admin/space-cms-adapter.module.js",
+            "custom/space/viewer/space-render.module.js",
+            "custom/space/viewer/space-view.module.js",
+            "custom/space/viewer/space-viewer.css"
+        ]
+    },
+    "index": {
+        "cache": "b41e6431",
+        "files": [
+            "custom/index/admin/index-admin.module.js",
+            "custom/index/viewer/index-viewer.module.js",
+            "custom/index/viewer/index.css",
+            "custom/index/viewer/site-guide.js"
+        ]
+    },
+    "ui": {
+        "cache": "90ca5427",
+        "files": [
+            "ui/album-icon.svg",
+            "ui/cms-history.svg",
+            "ui/cms-pin-slash.svg",
+            "ui/cms-pin.svg",
+            "ui/games-icon.svg",
+            "ui/icon.ico",
+            "ui/icon.svg",
+            "ui/index.svg",
+            "ui/literature-icon.svg",
+            "ui/moon.svg",
+            "ui/music-class.svg",
+            "ui/music-collection.svg",
+            "ui/music-headphone.svg",
+            "ui/music-home.svg",
+            "ui/music-icon.svg",
+            "ui/music-singer.svg",
+            "ui/music.png",
+            "ui/notes-icon.svg",
+            "ui/placeholder.svg",
+            "ui/record-icon.svg",
+            "ui/set-up.svg",
+            "ui/space-icon.svg",
+            "ui/story.svg",
+            "ui/sun.svg"
+        ]
+    }
+};
+// </maers:precache>
+
 const CACHE_NAME = `maers-cache-${VERSION_CONFIG.default}`;
 
+// 本地管理后台 (server.py) 下不启用预缓存，改完文件刷新即可生效
+const USE_PRECACHE = !['localhost', '127.0.0.1'].includes(self.location.hostname);
+
+/**
+ * 分组缓存名：仅随该分组静态资源的内容哈希变化
+ */
+function groupCacheName(groupName) {
+    return `maers-${groupName}-${PRECACHE[groupName].cache}`;
+}
+
 // 监听安装事件
 self.addEventListener('install', (event) => {
     // 强制跳过等待，立即接管页面
     self.skipWaiting();
+
+    if (!USE_PRECACHE) return;
+
+    // 预缓存各分组的静态资源；已存在的分组缓存 (内容未变) 直接跳过
+    event.waitUntil(
+        caches.keys().then((existing) => Promise.all(
+            Object.keys(PRECACHE).map((groupName) => {
+                const cacheName = groupCacheName(groupName);
+                if (existing.includes(cacheName)) return null;
+                return caches.open(cacheName).then((cache) => Promise.allSettled(
+                    PRECACHE[groupName].files.map((path) => {
+                        const url = new URL(path, self.location.origin);
+                        url.searchParams.set('maers_ver', resolveVersion(url.pathname));
+                        return fetch(url).then((response) => {
+                            if (response.ok) return cache.put(`/${path}`, response);
+                        });
+                    })
+                ));
+            })
+        ))
+    );
 });
 
 // 监听激活事件
@@ -142,12 +400,16 @@ self.addEventListener('activate', (event) => {
     // 立即接管所有已打开的页面客户端
     event.waitUntil(clients.claim());
 
-    // 清理旧版本的缓存
+    // 只清理内容已变化的分组缓存，未变化的分组继续沿用
+    const keep = new Set([CACHE_NAME]);
+    if (USE_PRECACHE) {
+        Object.keys(PRECACHE).forEach((groupName) => keep.add(groupCacheName(groupName)));
+    }
     event.waitUntil(
         caches.keys().then((cacheNames) => {
             return Promise.all(
                 cacheNames.map((cacheName) => {
-                    if (cacheName !== CACHE_NAME) {
+                    if (!keep.has(cacheName)) {
                         return caches.delete(cacheName);
                     }
                 })
@@ -156,6 +418,18 @@ self.addEventListener('activate', (event) => {
     );
 });
 
+/**
+ * 返回路径所属的预缓存分组名 (不在预缓存清单中时为 null)
+ */
+function resolvePrecacheGroup(relativePath) {
+    for (const [groupName, group] of Object.entries(PRECACHE)) {
+        if (group.files.includes(relativePath)) {
+            return groupName;
+        }
+    }
+    return null;
+}
+
 /**
  * 根据请求路径确定版本号
  * 优先级: files > groups > default
@@ -169,8 +443,8 @@ function resolveVersion(pathname) {
     }
 
     // 2. 中优先级：分组前缀匹配
-    // 去掉开头的 / 以便与配置的相对路径匹配
-    const relativePath = pathname.startsWith('/') ? pathname.slice(1) : pathname;
+    // 去掉开头的 / 并解码 (如 %20) 以便与配置的相对路径匹配
+    const relativePath = decodeURIComponent(pathname.startsWith('/') ? pathname.slice(1) : pathname);
     for (const [groupName, group] of Object.entries(VERSION_CONFIG.groups)) {
         for (const prefix of group.paths) {
             if (relativePath.startsWith(prefix)) {
@@ -205,6 +479,21 @@ self.addEventListener('fetch', (event) => {
         const newUrl = new URL(url.toString());
         newUrl.searchParams.set('maers_ver', version);
 
+        // 预缓存的静态资源：缓存优先，未命中时回源并补入分组缓存
+        const relativePath = decodeURIComponent(url.pathname.slice(1));
+        const groupName = USE_PRECACHE && !url.search ? resolvePrecacheGroup(relativePath) : null;
+        if (groupName) {
+            event.respondWith(
+                caches.open(groupCacheName(groupName)).then((cache) =>
+                    cache.match(url.pathname).then((cached) => cached || fetch(newUrl).then((response) => {
+                        if (response.ok) cache.put(url.pathname, response.clone());
+                        return response;
+                    }))
+                ).catch(() => fetch(event.request))
+            );
+            return;
+        }
+
         event.respondWith(
             fetch(newUrl, {
                 method: event.request.method,